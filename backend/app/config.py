@@ -26,6 +26,13 @@ class Settings(BaseSettings):
     DATA_DIR: Path = Path(__file__).parent.parent / "data"
     DUCKDB_PATH: Path = DATA_DIR / "analytics.duckdb"
     PARQUET_DIR: Path = DATA_DIR
+    EVENTS_MANIFEST_PATH: Path = DATA_DIR / "events" / "consolidated" / "manifest.json"
+
+    # DOI index em memória para /search_dois (construído por worker ao carregar os dados)
+    DOI_INDEX_ENABLED: bool = True
+    # Bloom filter dos DOIs com eventos: buscas sem eventos não consultam o DuckDB
+    DOI_BLOOM_ENABLED: bool = True
+    DOI_BLOOM_FALSE_POSITIVE_RATE: float = 0.01
 
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = True
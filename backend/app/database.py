@@ -7,11 +7,34 @@ gerenciamento seguro de recursos.
 Padrão: Singleton + Dependency Injection
 """
 import duckdb
+import json
+import logging
+import threading
 from pathlib import Path
 from contextlib import contextmanager
-from typing import Generator
+from typing import TYPE_CHECKING, Generator, List, Optional
 from app.config import settings
 
+if TYPE_CHECKING:
+    from app.doi_index import DoiBloomFilter, DoiIndex
+
+
+# Chaves substitutas int64 usadas nos joins entre tabelas OpenAlex.
+# Normalmente já vêm gravadas nos parquets pelo sync (tools/run_data_sync.py);
+# se estiverem ausentes, a view calcula a chave a partir do sufixo numérico do ID.
+SURROGATE_KEYS = {
+    "oa_works": {"work_key": "id"},
+    "oa_works_locations": {"work_key": "work_id", "source_key": "source_id"},
+    "oa_works_topics": {"work_key": "work_id", "topic_key": "topic_id"},
+    "oa_topics": {"topic_key": "id", "field_key": "field"},
+    "oa_fields": {"field_key": "id"},
+    "oa_sources": {"source_key": "id"},
+}
+
+# Versão do schema consolidado de eventos suportada pelas queries
+# (gravada em manifest.json por tools/process_all_events.py)
+EVENTS_SCHEMA_VERSION = 2
+
 
 class DatabaseManager:
     """Manages DuckDB connections and table registration"""
@@ -22,6 +45,13 @@ class DatabaseManager:
         self._ensure_data_directory()
         self._ensure_database_exists()
         self._connection = None
+        self.events_manifest = None
+        # Manifesto de eventos lido por último (mtime_ns do arquivo e geração publicada)
+        self._manifest_mtime = None
+        self.events_generation = None
+        self._reload_lock = threading.Lock()
+        self.doi_index = None
+        self.doi_filter = None
 
     def _ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
@@ -65,9 +95,15 @@ class DatabaseManager:
         missing_files = []
 
         for table_name, pattern in tables.items():
+            # Events: files listed in the manifest (single consolidated file or partitions)
+            manifest_files = None
+            if table_name == "crossref_clean_events":
+                self.events_manifest = self._load_events_manifest()
+                manifest_files = self._manifest_event_files()
+
             # Check if parquet files exist (follow symlinks)
             matching_files = []
-            for file_path in self.parquet_dir.glob(pattern):
+            for file_path in [] if manifest_files is not None else self.parquet_dir.glob(pattern):
                 # Resolve symlinks to get actual file path
                 if file_path.is_symlink():
                     resolved = file_path.resolve()
@@ -78,14 +114,21 @@ class DatabaseManager:
                     matching_files.append(file_path)
                     logger.debug(f"Found file: {file_path}")
             
+            if manifest_files is not None:
+                matching_files = manifest_files
+
             if not matching_files:
                 missing_files.append(f"{table_name} ({pattern})")
                 logger.warning(f"No parquet files found for {table_name} with pattern {pattern}")
                 continue
-            
+
             try:
                 # Build file pattern for DuckDB
-                if len(matching_files) == 1:
+                if manifest_files:
+                    # Explicit file list from the manifest (partitions may live in other directories)
+                    file_pattern = str(manifest_files[0])
+                    logger.debug(f"Using manifest file list for {table_name}: {len(manifest_files)} file(s)")
+                elif len(matching_files) == 1:
                     # Single file - use direct path (resolved if symlink)
                     file_pattern = str(matching_files[0].absolute())
                     logger.debug(f"Using single file pattern for {table_name}: {file_pattern}")
@@ -94,10 +137,19 @@ class DatabaseManager:
                     file_pattern = str((self.parquet_dir / pattern).absolute())
                     logger.debug(f"Using glob pattern for {table_name}: {file_pattern}")
                 
+                key_columns = self._surrogate_key_columns(conn, table_name, file_pattern)
+                if key_columns:
+                    logger.warning(f"{table_name}: surrogate keys missing from parquet, computing at query time")
+
+                if manifest_files:
+                    parquet_source = "[" + ", ".join(f"'{f}'" for f in manifest_files) + "]"
+                else:
+                    parquet_source = f"'{file_pattern}'"
+
                 # Use CREATE TEMP VIEW which works in read-only mode
                 conn.execute(f"""
                     CREATE OR REPLACE TEMP VIEW {table_name} AS
-                    SELECT * FROM read_parquet('{file_pattern}')
+                    SELECT *{key_columns} FROM read_parquet({parquet_source})
                 """)
                 registered_views.append(table_name)
                 logger.info(f"Registered view: {table_name} from {len(matching_files)} file(s)")
@@ -111,6 +163,7 @@ class DatabaseManager:
         if not registered_views:
             raise RuntimeError("No parquet files found! Cannot create views.")
         
+        registered_views.extend(self._register_rollup_views(conn))
         logger.info(f"Successfully registered {len(registered_views)} views")
 
     def get_connection(self) -> duckdb.DuckDBPyConnection:
@@ -125,10 +178,58 @@ class DatabaseManager:
             self._connection.execute("PRAGMA memory_limit='512MB'")
 
             # Register parquet files as views
+            self._manifest_mtime = self._manifest_stat()
             self._register_parquet_tables(self._connection)
+            self.doi_index = self._build_doi_index(self._connection)
+            self.doi_filter = self._build_doi_filter(self._connection, self.doi_index)
+        elif self._manifest_stat() != self._manifest_mtime:
+            self._reload_events()
 
         return self._connection
 
+    def _manifest_stat(self) -> Optional[int]:
+        """mtime_ns of the events manifest (None when it does not exist)"""
+        try:
+            return settings.EVENTS_MANIFEST_PATH.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload_events(self):
+        """Re-register the views when tools/process_all_events.py publishes a new manifest generation
+
+        The ETL keeps replaced partitions on disk for a grace period
+        (EVENTS_RETIRED_GRACE_SECONDS), so queries still running on the previous views finish.
+        """
+        logger = logging.getLogger(__name__)
+
+        with self._reload_lock:
+            mtime = self._manifest_stat()
+            if mtime == self._manifest_mtime:
+                return
+            previous, previous_manifest = self.events_generation, self.events_manifest
+            try:
+                self._register_parquet_tables(self._connection)
+            except Exception as e:
+                # Keep the views of the previous generation (retired files are still on disk);
+                # the next request retries
+                self.events_generation, self.events_manifest = previous, previous_manifest
+                logger.error(f"Events manifest reload failed, keeping generation {previous}: {e}")
+                return
+            self._manifest_mtime = mtime
+
+            # Cached aggregates were computed on the previous generation
+            from app.queries import query_cache
+            if query_cache is not None:
+                query_cache.clear()
+
+            # DOI index and bloom filter follow the new events (a stale filter would answer
+            # "definitely absent" for newly published DOIs); both are swapped together
+            doi_index = self._build_doi_index(self._connection)
+            doi_filter = self._build_doi_filter(self._connection, doi_index)
+            self.doi_index, self.doi_filter = doi_index, doi_filter
+            logger.info(f"Events manifest generation {previous} -> {self.events_generation}: "
+                        f"views, DOI index and bloom filter rebuilt")
+
     @contextmanager
     def get_cursor(self) -> Generator[duckdb.DuckDBPyConnection, None, None]:
         """Context manager for query execution"""
@@ -144,6 +245,132 @@ class DatabaseManager:
         if self._connection:
             self._connection.close()
             self._connection = None
+        self.doi_index = None
+        self.doi_filter = None
+
+    def _load_events_manifest(self) -> Optional[dict]:
+        """Load the consolidated events manifest, refusing unsupported schema versions"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        manifest_path = settings.EVENTS_MANIFEST_PATH
+        if not manifest_path.exists():
+            logger.warning(f"Events manifest not found at {manifest_path}; assuming legacy untyped schema")
+            return None
+
+        manifest = json.loads(manifest_path.read_text())
+        version = manifest.get("schema_version")
+        if version != EVENTS_SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Events schema version {version} is not supported (expected {EVENTS_SCHEMA_VERSION}). "
+                "Re-run tools/process_all_events.py to rebuild the consolidated file."
+            )
+        self.events_generation = manifest.get("generation")
+        logger.info(f"Events schema version {version}, generation {self.events_generation} "
+                    f"({manifest.get('total_events', '?')} events)")
+        return manifest
+
+    def _manifest_event_files(self) -> Optional[List[Path]]:
+        """Event files listed in the manifest (None for legacy manifests without a file list)
+
+        A listed file that is missing raises instead of falling back to the
+        crossref_clean_events* glob, which could mix retired or unpublished partitions
+        with the current generation.
+        """
+        if not self.events_manifest or "files" not in self.events_manifest:
+            return None
+
+        manifest_dir = settings.EVENTS_MANIFEST_PATH.parent
+        files = [(manifest_dir / relative_path).resolve() for relative_path in self.events_manifest["files"]]
+        missing = [f for f in files if not f.is_file()]
+        if missing:
+            raise RuntimeError(
+                f"Events manifest generation {self.events_generation} lists {len(missing)} "
+                f"missing file(s), e.g. {missing[0]}"
+            )
+        return files
+
+    def _register_rollup_views(self, conn: duckdb.DuckDBPyConnection) -> List[str]:
+        """Register the time-series rollups listed in the events manifest (events_rollup_<granularity>)"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not self.events_manifest:
+            return []
+
+        manifest_dir = settings.EVENTS_MANIFEST_PATH.parent
+        views = []
+        for granularity, relative_paths in self.events_manifest.get("rollups", {}).items():
+            # One file, or one file per partition (queries SUM the events per period)
+            if isinstance(relative_paths, str):
+                relative_paths = [relative_paths]
+            rollup_files = [(manifest_dir / relative_path).absolute() for relative_path in relative_paths]
+            missing = [f for f in rollup_files if not f.exists()]
+            if missing or not rollup_files:
+                logger.warning(f"Rollup file not found: {missing[0] if missing else granularity}")
+                continue
+
+            view_name = f"events_rollup_{granularity}"
+            file_list = ", ".join(f"'{f}'" for f in rollup_files)
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP VIEW {view_name} AS
+                SELECT * FROM read_parquet([{file_list}])
+            """)
+            views.append(view_name)
+            logger.info(f"Registered view: {view_name}")
+
+        return views
+
+    def _build_doi_index(self, conn: duckdb.DuckDBPyConnection) -> Optional["DoiIndex"]:
+        """Build the in-memory DOI index used by /search_dois (SQL fallback when unavailable)"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not settings.DOI_INDEX_ENABLED:
+            return None
+
+        try:
+            from app.doi_index import DoiIndex
+            return DoiIndex(conn)
+        except Exception as e:
+            logger.warning(f"DOI index not built, /search_dois will query DuckDB: {e}")
+            return None
+
+    def _build_doi_filter(self, conn: duckdb.DuckDBPyConnection,
+                          doi_index: Optional["DoiIndex"] = None) -> Optional["DoiBloomFilter"]:
+        """Build the bloom filter of event DOIs (reuses the DOI index hashes when built)"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not settings.DOI_BLOOM_ENABLED:
+            return None
+
+        try:
+            from app.doi_index import DoiBloomFilter
+            fpp = settings.DOI_BLOOM_FALSE_POSITIVE_RATE
+            if doi_index is not None:
+                return DoiBloomFilter(doi_index.hashes, fpp)
+            return DoiBloomFilter.from_table(conn, false_positive_rate=fpp)
+        except Exception as e:
+            logger.warning(f"DOI bloom filter not built: {e}")
+            return None
+
+    def _surrogate_key_columns(self, conn: duckdb.DuckDBPyConnection, table_name: str, file_pattern: str) -> str:
+        """Build computed key columns for parquet files synced before surrogate keys existed"""
+        keys = SURROGATE_KEYS.get(table_name)
+        if not keys:
+            return ""
+
+        schema = conn.execute(f"DESCRIBE SELECT * FROM read_parquet('{file_pattern}')").fetchall()
+        columns = {row[0] for row in schema}
+
+        extra = []
+        for key_column, source_column in keys.items():
+            if key_column not in columns and source_column in columns:
+                extra.append(
+                    f", TRY_CAST(regexp_extract({source_column}, '(\\d+)$', 1) AS BIGINT) AS {key_column}"
+                )
+        return "".join(extra)
 
     def health_check(self) -> bool:
         """Verify database connectivity and table availability"""
@@ -0,0 +1,191 @@
+"""Índice de DOIs em memória para o endpoint /search_dois.
+
+Mantém, por worker, os hashes de 64 bits dos DOIs (ordenados) e as contagens de eventos
+pré-agregadas por fonte e por ano em arrays NumPy no formato CSR (offsets + valores).
+Uma busca em lote vira um searchsorted vetorizado, sem varrer crossref_clean_events.
+
+DoiBloomFilter é a alternativa compacta (~1,2 byte por DOI): responde "certamente sem
+eventos" sem tocar no DuckDB, inclusive quando o índice completo está desativado.
+
+Construídos uma vez por versão dos dados, quando o DatabaseManager registra as views.
+"""
+import logging
+import math
+from typing import Any, Dict, List, Optional
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+from pandas.util import hash_array
+
+logger = logging.getLogger(__name__)
+
+
+def _doi_expr(column: str = "id") -> str:
+    """DOI = id sem o prefixo 'https://doi.org/' (mesma regra da query SQL de search_dois)"""
+    return f"SUBSTRING({column} FROM 17)"
+
+
+def _hash_dois(dois) -> np.ndarray:
+    """Hash estável de 64 bits (independe de PYTHONHASHSEED) para DOIs já normalizados"""
+    return hash_array(np.asarray(dois, dtype=object))
+
+
+def _csr_offsets(positions: np.ndarray, size: int) -> np.ndarray:
+    """Offsets CSR a partir das posições (ordenadas) de cada linha agregada"""
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(positions, minlength=size), out=offsets[1:])
+    return offsets
+
+
+def _distinct_doi_hashes(conn: duckdb.DuckDBPyConnection, table_name: str) -> np.ndarray:
+    """Hashes dos DOIs distintos (normalizados) de uma tabela de eventos"""
+    dois = conn.execute(f"""
+        SELECT DISTINCT LOWER({_doi_expr()}) FROM {table_name} WHERE id IS NOT NULL
+    """).fetchnumpy()
+    return _hash_dois(next(iter(dois.values())))
+
+
+class DoiBloomFilter:
+    """Bloom filter over event DOIs: False means the DOI certainly has no events"""
+
+    def __init__(self, hashes: np.ndarray, false_positive_rate: float = 0.01):
+        n = max(len(hashes), 1)
+        self.num_bits = max(int(math.ceil(-n * math.log(false_positive_rate) / math.log(2) ** 2)), 64)
+        self.num_hashes = max(int(round(self.num_bits / n * math.log(2))), 1)
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+        for positions in self._positions(hashes):
+            np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+        logger.info(
+            f"DOI bloom filter built: {len(hashes):,} DOIs, {self.num_hashes} hashes "
+            f"({self.bits.nbytes / (1024 * 1024):.1f} MB)"
+        )
+
+    @classmethod
+    def from_table(cls, conn: duckdb.DuckDBPyConnection, table_name: str = "crossref_clean_events",
+                   false_positive_rate: float = 0.01) -> "DoiBloomFilter":
+        return cls(_distinct_doi_hashes(conn, table_name), false_positive_rate)
+
+    def _positions(self, hashes: np.ndarray):
+        # Double hashing (Kirsch-Mitzenmacher) sobre as metades do hash de 64 bits
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint64)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        for i in range(self.num_hashes):
+            yield ((low + np.uint64(i) * high) % np.uint64(self.num_bits)).astype(np.int64)
+
+    def might_contain(self, dois: List[str]) -> List[bool]:
+        """Vectorised membership test for a batch of DOIs (case-insensitive)"""
+        if not dois:
+            return []
+
+        hashes = _hash_dois([doi.lower() for doi in dois])
+        result = np.ones(len(dois), dtype=bool)
+        for positions in self._positions(hashes):
+            result &= (self.bits[positions >> 3] >> (positions & 7)) & 1 == 1
+        return result.tolist()
+
+
+class DoiIndex:
+    """Sorted DOI hashes with per-DOI event counts by source and year"""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, table_name: str = "crossref_clean_events"):
+        # Usa a conexão principal (as views TEMP só existem nela); roda antes das requisições
+        self._build(conn, table_name)
+
+    def _build(self, cursor: duckdb.DuckDBPyConnection, table_name: str):
+        # Mesmo DOI com grafias diferentes: MAX prefere a forma minúscula (canônica)
+        dois = cursor.execute(f"""
+            SELECT LOWER({_doi_expr()}) AS doi, MAX({_doi_expr()}) AS doi_original, COUNT(*) AS total
+            FROM {table_name}
+            WHERE id IS NOT NULL
+            GROUP BY 1
+        """).arrow()
+        if isinstance(dois, pa.RecordBatchReader):
+            dois = dois.read_all()
+
+        hashes = _hash_dois(dois.column("doi").to_numpy(zero_copy_only=False))
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.dois = dois.column("doi_original").take(pa.array(order)).combine_chunks()
+        self.totals = dois.column("total").to_numpy()[order].astype(np.int32)
+
+        # Posição de cada DOI no array ordenado, para agregar fonte/ano já alinhado aos hashes
+        positions = np.empty(len(order), dtype=np.int64)
+        positions[order] = np.arange(len(order))
+        cursor.register("doi_index_positions", pa.table({
+            "doi": dois.column("doi"),
+            "pos": positions,
+        }))
+        try:
+            self.sources, self.source_offsets, self.source_codes, self.source_counts = \
+                self._aggregate(cursor, table_name, "CAST(e.source_ AS VARCHAR)")
+            # Anos como texto: o frontend espera as chaves de events_by_year como string
+            self.years, self.year_offsets, self.year_codes, self.year_counts = \
+                self._aggregate(cursor, table_name, "CAST(e.year AS VARCHAR)")
+        finally:
+            cursor.unregister("doi_index_positions")
+
+        logger.info(
+            f"DOI index built: {len(self.hashes):,} DOIs, {int(self.totals.sum()):,} events "
+            f"({self.nbytes / (1024 * 1024):.1f} MB)"
+        )
+
+    def _aggregate(self, cursor: duckdb.DuckDBPyConnection, table_name: str, key_expr: str):
+        """Contagens (DOI, chave) em formato CSR: (vocabulário, offsets, códigos, contagens)"""
+        rows = cursor.execute(f"""
+            SELECT p.pos, {key_expr} AS key, COUNT(*) AS events
+            FROM {table_name} e
+            JOIN doi_index_positions p ON LOWER({_doi_expr('e.id')}) = p.doi
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+        """).fetchnumpy()
+
+        vocabulary, codes = np.unique(rows["key"].astype(str), return_inverse=True)
+        offsets = _csr_offsets(rows["pos"].astype(np.int64), len(self.hashes))
+        return vocabulary.tolist(), offsets, codes.astype(np.int16), rows["events"].astype(np.int32)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.hashes, self.totals, self.source_offsets, self.source_codes, self.source_counts,
+                  self.year_offsets, self.year_codes, self.year_counts)
+        return sum(a.nbytes for a in arrays) + self.dois.nbytes
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def lookup(self, dois: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Return aggregated events for each DOI (None when the DOI has no events)"""
+        if not dois or not len(self.hashes):
+            return [None] * len(dois)
+
+        normalized = [doi.lower() for doi in dois]
+        query_hashes = _hash_dois(normalized)
+        idx = np.searchsorted(self.hashes, query_hashes)
+        idx[idx == len(self.hashes)] = 0
+        hits = self.hashes[idx] == query_hashes
+
+        results = []
+        for doi, i, hit in zip(normalized, idx.tolist(), hits.tolist()):
+            original = self.dois[i].as_py() if hit else None
+            # Confere o DOI para descartar colisões de hash
+            if original is None or original.lower() != doi:
+                results.append(None)
+                continue
+
+            s0, s1 = self.source_offsets[i], self.source_offsets[i + 1]
+            y0, y1 = self.year_offsets[i], self.year_offsets[i + 1]
+            results.append({
+                "doi": original,
+                "total_events": int(self.totals[i]),
+                "events_by_source": {
+                    self.sources[c]: int(n)
+                    for c, n in zip(self.source_codes[s0:s1], self.source_counts[s0:s1])
+                },
+                "events_by_year": {
+                    self.years[c]: int(n)
+                    for c, n in zip(self.year_codes[y0:y1], self.year_counts[y0:y1])
+                },
+            })
+        return results
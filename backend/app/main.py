@@ -200,6 +200,29 @@ async def get_fields_source_events(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/events_timeseries")
+@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
+async def get_events_timeseries(
+    request: Request,
+    granularity: str = Query("year", pattern="^(year|month|week|day)$", description="Period size: year, month, week or day"),
+    source: Optional[str] = Query(None, description="Event source"),
+    ya: Optional[int] = Query(None, description="Start year"),
+    yb: Optional[int] = Query(None, description="End year"),
+    conn: duckdb.DuckDBPyConnection = Depends(get_db)
+) -> Dict[str, List[Any]]:
+    """Get event counts per period, optionally filtered by source and year range"""
+    try:
+        return queries.events_timeseries(conn, granularity, source, ya, yb)
+    except (duckdb.CatalogException, duckdb.IOException) as e:
+        # Rollup view not registered (no ETL run yet) or its files are gone
+        raise HTTPException(
+            status_code=503,
+            detail=f"Events time series unavailable (run tools/process_all_events.py): {e}"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/all_events_data_filter_years/{ya}/{yb}")
 @limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE_HEAVY}/minute")
 async def get_all_events_data_filtered(
@@ -283,7 +306,12 @@ async def search_dois_endpoint(
         if len(search_request.dois) > 100:
             raise HTTPException(status_code=400, detail="Máximo de 100 DOIs por consulta")
 
-        return queries.search_dois(conn, search_request.dois)
+        return queries.search_dois(
+            conn,
+            search_request.dois,
+            index=db_manager.doi_index,
+            doi_filter=db_manager.doi_filter
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -6,7 +6,7 @@ Cache opcional (TTLCache) para queries frequentes. Retorna dados em formato colu
 Padrão: Repository pattern com caching
 """
 import duckdb
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from cachetools import TTLCache
 from app.config import settings
 
@@ -138,9 +138,9 @@ def source_journals(conn: duckdb.DuckDBPyConnection, source: str) -> Dict[str, L
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_locations AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_sources AS d
-            ON c.source_id = d.id
+            ON c.source_key = d.source_key
         WHERE a.source_ = ?
         GROUP BY d.display_name
         ORDER BY events DESC
@@ -161,9 +161,9 @@ def events_journals(conn: duckdb.DuckDBPyConnection) -> Dict[str, List[Any]]:
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_locations AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_sources AS d
-            ON c.source_id = d.id
+            ON c.source_key = d.source_key
         GROUP BY d.display_name
         ORDER BY events DESC
     """
@@ -187,11 +187,11 @@ def fields_events(conn: duckdb.DuckDBPyConnection) -> Dict[str, List[Any]]:
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_topics AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_topics AS d
-            ON c.topic_id = d.id
+            ON c.topic_key = d.topic_key
         INNER JOIN oa_fields AS e
-            ON d.field = e.id
+            ON d.field_key = e.field_key
         WHERE c.score >= 0.95
         GROUP BY e.display_name
         ORDER BY events DESC
@@ -211,11 +211,11 @@ def fields_events_filtered(conn: duckdb.DuckDBPyConnection, year_a: int, year_b:
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_topics AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_topics AS d
-            ON c.topic_id = d.id
+            ON c.topic_key = d.topic_key
         INNER JOIN oa_fields AS e
-            ON d.field = e.id
+            ON d.field_key = e.field_key
         WHERE c.score >= 0.95 AND a.year >= ? AND a.year <= ?
         GROUP BY e.display_name
         ORDER BY events DESC
@@ -232,11 +232,11 @@ def fields_source_events(conn: duckdb.DuckDBPyConnection, source: str) -> Dict[s
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_topics AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_topics AS d
-            ON c.topic_id = d.id
+            ON c.topic_key = d.topic_key
         INNER JOIN oa_fields AS e
-            ON d.field = e.id
+            ON d.field_key = e.field_key
         WHERE a.source_ = ? AND c.score >= 0.95
         GROUP BY e.display_name
         ORDER BY events DESC
@@ -265,14 +265,14 @@ def all_events_data_filter_years_enriched(conn: duckdb.DuckDBPyConnection, year_
     sql = """
         WITH ranked_topics AS (
             SELECT 
-                work_id,
-                topic_id,
-                ROW_NUMBER() OVER (PARTITION BY work_id ORDER BY score DESC) AS rn
+                work_key,
+                topic_key,
+                ROW_NUMBER() OVER (PARTITION BY work_key ORDER BY score DESC) AS rn
             FROM oa_works_topics
             WHERE score >= 0.95
         ),
         primary_topics AS (
-            SELECT work_id, topic_id
+            SELECT work_key, topic_key
             FROM ranked_topics
             WHERE rn = 1
         )
@@ -290,15 +290,15 @@ def all_events_data_filter_years_enriched(conn: duckdb.DuckDBPyConnection, year_
         LEFT JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         LEFT JOIN oa_works_locations AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         LEFT JOIN oa_sources AS d
-            ON c.source_id = d.id
+            ON c.source_key = d.source_key
         LEFT JOIN primary_topics AS topic_rel
-            ON b.id = topic_rel.work_id
+            ON b.work_key = topic_rel.work_key
         LEFT JOIN oa_topics AS topic
-            ON topic_rel.topic_id = topic.id
+            ON topic_rel.topic_key = topic.topic_key
         LEFT JOIN oa_fields AS f
-            ON topic.field = f.id
+            ON topic.field_key = f.field_key
         WHERE a.year >= ? AND a.year <= ?
     """
     return _execute_query(conn, sql, (year_a, year_b))
@@ -317,11 +317,11 @@ def all_events_fields_events(conn: duckdb.DuckDBPyConnection) -> Dict[str, List[
         INNER JOIN oa_works AS b
             ON LOWER(SUBSTRING(a.id FROM 17)) = LOWER(b.doi)
         INNER JOIN oa_works_topics AS c
-            ON b.id = c.work_id
+            ON b.work_key = c.work_key
         INNER JOIN oa_topics AS d
-            ON c.topic_id = d.id
+            ON c.topic_key = d.topic_key
         INNER JOIN oa_fields AS e
-            ON d.field = e.id
+            ON d.field_key = e.field_key
         WHERE c.score >= 0.95
         GROUP BY e.display_name
         ORDER BY events DESC
@@ -334,10 +334,18 @@ def all_events_fields_events(conn: duckdb.DuckDBPyConnection) -> Dict[str, List[
 
 # QUERY ADICIONADA  -----------------------------------------------------------------------
 # Query 12: Search for specific DOIs with aggregated metrics
-def search_dois(conn: duckdb.DuckDBPyConnection, dois: List[str]) -> Dict[str, Any]:
+def search_dois(
+    conn: duckdb.DuckDBPyConnection,
+    dois: List[str],
+    index=None,
+    doi_filter=None
+) -> Dict[str, Any]:
     """
     Search for DOIs and aggregate events by source and year
     Returns structured data compatible with frontend DoiSearch component
+
+    DOIs rejected by the bloom filter are answered as not found without a lookup; the rest
+    use the in-memory DoiIndex when available, otherwise scan crossref_clean_events.
     """
     if not dois:
         return {
@@ -347,6 +355,12 @@ def search_dois(conn: duckdb.DuckDBPyConnection, dois: List[str]) -> Dict[str, A
             "results": []
         }
 
+    if doi_filter is not None:
+        return _search_dois_filtered(conn, dois, index, doi_filter)
+
+    if index is not None:
+        return _search_dois_index(index, dois)
+
     # Normaliza DOIs para lowercase para busca case-insensitive
     normalized_dois = [doi.lower() for doi in dois]
 
@@ -428,6 +442,101 @@ def search_dois(conn: duckdb.DuckDBPyConnection, dois: List[str]) -> Dict[str, A
     }
 
 
+def _search_dois_filtered(conn: duckdb.DuckDBPyConnection, dois: List[str], index, doi_filter) -> Dict[str, Any]:
+    """search_dois for the bloom filter candidates only; definite misses are not looked up"""
+    maybe = doi_filter.might_contain(dois)
+    candidates = [doi for doi, hit in zip(dois, maybe) if hit]
+    if not candidates:
+        results = iter([])
+        found_count = 0
+    else:
+        partial = search_dois(conn, candidates, index=index)
+        results = iter(partial['results'])
+        found_count = partial['found_count']
+
+    return {
+        'total_searched': len(dois),
+        'found_count': found_count,
+        'not_found_count': len(dois) - found_count,
+        'results': [next(results) if hit else {'doi': doi, 'found': False} for doi, hit in zip(dois, maybe)]
+    }
+
+
+def _search_dois_index(index, dois: List[str]) -> Dict[str, Any]:
+    """search_dois served from the DoiIndex (same response shape as the SQL path)"""
+    results = []
+    found = set()
+    for original_doi, entry in zip(dois, index.lookup(dois)):
+        if entry is None:
+            results.append({'doi': original_doi, 'found': False})
+            continue
+
+        found.add(original_doi.lower())
+        results.append({
+            'doi': entry['doi'],
+            'found': True,
+            'total_events': entry['total_events'],
+            'events_by_source': entry['events_by_source'],
+            'events_by_year': entry['events_by_year']
+        })
+
+    return {
+        'total_searched': len(dois),
+        'found_count': len(found),
+        'not_found_count': len(dois) - len(found),
+        'results': results
+    }
+
+
+# Query 13: Time series of events served from ETL rollups
+TIMESERIES_GRANULARITIES = ("year", "month", "week", "day")
+
+
+def events_timeseries(
+    conn: duckdb.DuckDBPyConnection,
+    granularity: str,
+    source: Optional[str] = None,
+    year_a: Optional[int] = None,
+    year_b: Optional[int] = None
+) -> Dict[str, List[Any]]:
+    """
+    Aggregate events per period (year, month, week or day)
+    Reads the pre-aggregated events_rollup_<granularity> views maintained by the ETL
+    """
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise ValueError(f"Invalid granularity: {granularity}")
+
+    cache_key = f"events_timeseries:{granularity}:{source}:{year_a}:{year_b}"
+    if query_cache and cache_key in query_cache:
+        return query_cache[cache_key]
+
+    conditions = []
+    params = []
+    if source is not None:
+        conditions.append("source_ = ?")
+        params.append(source)
+    if year_a is not None:
+        conditions.append("year >= ?")
+        params.append(year_a)
+    if year_b is not None:
+        conditions.append("year <= ?")
+        params.append(year_b)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+        SELECT period, SUM(events) AS events
+        FROM events_rollup_{granularity}
+        {where}
+        GROUP BY period
+        ORDER BY period
+    """
+    result = _execute_query(conn, sql, tuple(params))
+
+    if query_cache:
+        query_cache[cache_key] = result
+    return result
+
+
 # CSV Streaming Generator
 def generate_csv_streaming(conn: duckdb.DuckDBPyConnection, year_a: int, year_b: int):
     """
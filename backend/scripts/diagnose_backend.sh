@@ -9,23 +9,33 @@ echo "=== Últimos 50 logs do container ==="
 docker logs altmetria_api_duckdb --tail=50
 
 echo ""
-echo "=== Verificando arquivo crossref_clean_events.parquet ==="
-docker exec altmetria_api_duckdb ls -lh /app/data/crossref_clean_events.parquet || echo "Arquivo não encontrado"
+echo "=== Verificando manifesto de eventos ==="
+docker exec altmetria_api_duckdb ls -lh /app/data/events/consolidated/manifest.json || echo "Manifesto não encontrado (execute tools/process_all_events.py)"
 
 echo ""
-echo "=== Verificando link simbólico ==="
-docker exec altmetria_api_duckdb readlink -f /app/data/crossref_clean_events.parquet || echo "Link não encontrado"
-
-echo ""
-echo "=== Testando leitura DuckDB direta ==="
+echo "=== Testando leitura DuckDB das partições do manifesto ==="
 docker exec altmetria_api_duckdb python3 -c "
-import duckdb
+import duckdb, json
+from pathlib import Path
+manifest_path = Path('/app/data/events/consolidated/manifest.json')
 conn = duckdb.connect()
 try:
-    result = conn.execute('SELECT COUNT(*) FROM read_parquet(\"/app/data/events/consolidated/all_events.parquet\")').fetchone()
-    print(f'✓ Arquivo legível: {result[0]:,} eventos')
+    manifest = json.loads(manifest_path.read_text())
+    print(f'Geração {manifest.get(\"generation\", \"?\")}, schema v{manifest.get(\"schema_version\")}, criado em {manifest.get(\"created_at\")}')
+    for source, info in manifest.get('partitions', {}).items():
+        print(f'  {source}: {len(info[\"files\"])} partições, {info[\"events\"]:,} eventos')
+    retired = manifest.get('retired', [])
+    if retired:
+        print(f'  aposentadas aguardando remoção: {len(retired)}')
+    files = [str((manifest_path.parent / f).resolve()) for f in manifest['files']]
+    missing = [f for f in files if not Path(f).is_file()]
+    if missing:
+        print(f'✗ {len(missing)} partição(ões) ausente(s), ex.: {missing[0]}')
+    else:
+        result = conn.execute(f'SELECT COUNT(*) FROM read_parquet({files})').fetchone()
+        print(f'✓ Partições legíveis: {result[0]:,} eventos (manifesto: {manifest[\"total_events\"]:,})')
 except Exception as e:
-    print(f'✗ Erro ao ler arquivo: {e}')
+    print(f'✗ Erro ao ler eventos: {e}')
 finally:
     conn.close()
 "
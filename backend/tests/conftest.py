@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Os scripts de tools/ importam uns aos outros pelo nome (from config import Config)
+TOOLS_DIR = BACKEND_DIR / 'tools'
+sys.path.insert(0, str(TOOLS_DIR))
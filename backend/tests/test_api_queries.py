@@ -0,0 +1,215 @@
+"""
+Consultas da API sobre um conjunto mínimo de dados (OpenAlex, partição de eventos e rollups)
+
+Os parquets são gravados pelas mesmas funções do ETL (parquet_layout, write_event_rollups),
+então o teste cobre a escrita e a leitura na versão do DuckDB instalada.
+"""
+import importlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import duckdb
+import pytest
+
+from conftest import BACKEND_DIR
+from parquet_layout import copy_to_parquet
+from process_all_events import write_event_rollups
+
+EVENTS = [
+    # DOI, timestamp, fonte
+    ('10.1590/a1', '2020-03-01 10:00:00', 'wikipedia'),
+    ('10.1590/a1', '2020-03-02 10:00:00', 'wikipedia'),
+    ('10.1590/a1', '2020-07-01 10:00:00', 'wikipedia'),
+    ('10.1590/a1', '2021-01-05 10:00:00', 'crossref'),
+    ('10.1590/a1', '2021-02-05 10:00:00', 'crossref'),
+    ('10.1590/A2', '2021-04-01 10:00:00', 'bori'),
+    ('10.9999/zz', '2022-01-01 10:00:00', 'wikipedia'),
+]
+
+
+def _write_openalex(conn, directory):
+    conn.execute(f"""
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/W1', '10.1590/a1', 'Work 1', 2019),
+            ('https://openalex.org/W2', '10.1590/a2', 'Work 2', 2020)) t(id, doi, title, publication_year))
+        TO '{directory}/works_latam_000000000000.parquet';
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/W1', 'https://openalex.org/S1'),
+            ('https://openalex.org/W2', 'https://openalex.org/S2')) t(work_id, source_id))
+        TO '{directory}/works_locations_latam_000000000000.parquet';
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/S1', 'Journal 1'),
+            ('https://openalex.org/S2', 'Journal 2')) t(id, display_name))
+        TO '{directory}/sources_latam_000000000000.parquet';
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/W1', 'https://openalex.org/T1', 0.99),
+            ('https://openalex.org/W1', 'https://openalex.org/T2', 0.96),
+            ('https://openalex.org/W2', 'https://openalex.org/T2', 0.98)) t(work_id, topic_id, score))
+        TO '{directory}/works_topics_latam_000000000000.parquet';
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/T1', 'https://openalex.org/fields/10'),
+            ('https://openalex.org/T2', 'https://openalex.org/fields/11')) t(id, field))
+        TO '{directory}/topics_000000000000.parquet';
+        COPY (SELECT * FROM (VALUES
+            ('https://openalex.org/fields/10', 'Field 10'),
+            ('https://openalex.org/fields/11', 'Field 11')) t(id, display_name))
+        TO '{directory}/fields_000000000000.parquet';
+    """)
+
+
+def _write_events(conn, directory):
+    """Partição e rollups no formato do manifesto (schema v2), com caminhos relativos"""
+    partition_dir = directory / 'events' / 'processed' / 'crossref'
+    manifest_dir = directory / 'events' / 'consolidated'
+    partition_dir.mkdir(parents=True)
+    manifest_dir.mkdir(parents=True)
+
+    conn.execute("CREATE TABLE events (id VARCHAR, timestamp_ TIMESTAMP, year SMALLINT, source_ VARCHAR, prefix VARCHAR)")
+    conn.executemany(
+        "INSERT INTO events VALUES ('https://doi.org/' || ?, ?, year(CAST(? AS TIMESTAMP)), ?, split_part(?, '/', 1))",
+        [(doi, ts, ts, source, doi) for doi, ts, source in EVENTS]
+    )
+    partition = partition_dir / 'part-20260101T000000.parquet'
+    copy_to_parquet(conn, "SELECT * FROM events", partition, 'events')
+    rollups_dir = partition_dir / 'rollups'
+    write_event_rollups(conn, 'events', rollups_dir, name='part-20260101T000000')
+
+    relative = lambda path: os.path.relpath(path, manifest_dir)
+    manifest = {
+        'schema_version': 2,
+        'generation': 1,
+        'files': [relative(partition)],
+        'total_events': len(EVENTS),
+        'rollups': {granularity: [relative(p)] for granularity, p in
+                    ((g, rollups_dir / f'part-20260101T000000_{g}.parquet') for g in ('year', 'month', 'week', 'day'))},
+    }
+    manifest_file = manifest_dir / 'manifest.json'
+    manifest_file.write_text(json.dumps(manifest))
+    return manifest_file
+
+
+def _write_dataset(directory):
+    with duckdb.connect() as etl:
+        _write_openalex(etl, directory)
+        return _write_events(etl, directory)
+
+
+@contextmanager
+def _database(directory, manifest_file, cache=False):
+    """DatabaseManager da API com as configurações apontando para o conjunto de dados"""
+    env = {
+        'DATA_DIR': str(directory),
+        'PARQUET_DIR': str(directory),
+        'DUCKDB_PATH': str(directory / 'analytics.duckdb'),
+        'EVENTS_MANIFEST_PATH': str(manifest_file),
+        'CACHE_ENABLED': 'true' if cache else 'false',
+    }
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        # Configurações lidas do ambiente na importação
+        for module in ('app.config', 'app.queries', 'app.database'):
+            if module in sys.modules:
+                importlib.reload(sys.modules[module])
+        from app.database import DatabaseManager
+        manager = DatabaseManager()
+        try:
+            yield manager
+        finally:
+            manager.close()
+    finally:
+        sys.path.remove(str(BACKEND_DIR))
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _publish(manifest_file, **changes):
+    """Nova geração do manifesto (mtime sempre diferente, como no os.replace do ETL)"""
+    manifest = json.loads(manifest_file.read_text())
+    manifest.update(changes)
+    mtime = manifest_file.stat().st_mtime_ns
+    manifest_file.write_text(json.dumps(manifest))
+    os.utime(manifest_file, ns=(mtime + 10**9, mtime + 10**9))
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('data')
+    with _database(directory, _write_dataset(directory)) as manager:
+        yield manager.get_connection()
+
+
+def test_event_aggregates(conn):
+    from app import queries
+    assert queries.all_sources(conn) == {'source': ['wikipedia', 'crossref', 'bori'], 'events': [4, 2, 1]}
+    assert queries.all_events_years(conn) == {'year': [2020, 2021, 2022], 'events': [3, 3, 1]}
+
+
+def test_openalex_joins(conn):
+    from app import queries
+    # DOI em maiúsculas casa com o trabalho; o DOI fora do OpenAlex fica de fora
+    assert queries.events_journals(conn) == {'journal': ['Journal 1', 'Journal 2'], 'events': [5, 1]}
+    assert queries.source_journals(conn, 'wikipedia') == {'journal': ['Journal 1'], 'events': [3]}
+    assert queries.fields_events(conn) == {'field': ['Field 11', 'Field 10'], 'events': [6, 5]}
+    assert queries.fields_events_filtered(conn, 2021, 2022) == {'field': ['Field 11', 'Field 10'], 'events': [3, 2]}
+
+
+def test_search_dois(conn):
+    from app import queries
+    result = queries.search_dois(conn, ['10.1590/a1', '10.1590/none'])
+    assert (result['found_count'], result['not_found_count']) == (1, 1)
+    found = result['results'][0]
+    assert found['total_events'] == 5
+    assert found['events_by_source'] == {'crossref': 2, 'wikipedia': 3}
+    assert found['events_by_year'] == {'2020': 3, '2021': 2}
+
+
+def test_timeseries_from_rollups(conn):
+    from app import queries
+    assert queries.events_timeseries(conn, 'year')['events'] == [3, 3, 1]
+    monthly = queries.events_timeseries(conn, 'month', source='wikipedia')
+    assert [str(p) for p in monthly['period']] == ['2020-03-01', '2020-07-01', '2022-01-01']
+    assert monthly['events'] == [2, 1, 1]
+
+
+def test_csv_export(conn):
+    from app import queries
+    lines = ''.join(queries.generate_csv_streaming(conn, 2021, 2021)).splitlines()
+    assert lines[0] == 'DOI,Timestamp,Year,Source,Prefix,Title,Publication Year,Journal,Field'
+    assert sorted(line.split(',')[3] for line in lines[1:]) == ['bori', 'crossref', 'crossref']
+
+
+def test_new_generation_clears_the_query_cache(tmp_path):
+    manifest_file = _write_dataset(tmp_path)
+    with _database(tmp_path, manifest_file, cache=True) as manager:
+        from app import queries
+        manager.get_connection()
+        queries.query_cache['events_timeseries:year:None:None:None'] = {'period': [], 'events': []}
+
+        _publish(manifest_file, generation=2)
+        manager.get_connection()
+        assert manager.events_generation == 2
+        assert len(queries.query_cache) == 0
+
+
+def test_manifest_with_missing_file_keeps_the_previous_generation(tmp_path):
+    manifest_file = _write_dataset(tmp_path)
+    with _database(tmp_path, manifest_file) as manager:
+        from app import queries
+        conn = manager.get_connection()
+        # Partição fora do manifesto que o glob legado (crossref_clean_events*) encontraria
+        conn.execute(f"""
+            COPY (SELECT * FROM crossref_clean_events LIMIT 1)
+            TO '{tmp_path}/crossref_clean_events_retired.parquet'
+        """)
+
+        _publish(manifest_file, generation=2, files=['../processed/crossref/part-missing.parquet'])
+        conn = manager.get_connection()
+        assert manager.events_generation == 1
+        assert queries.all_sources(conn)['events'] == [4, 2, 1]
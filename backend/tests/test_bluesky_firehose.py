@@ -0,0 +1,73 @@
+import os
+import time
+from functools import partial
+
+import pyarrow.parquet as pq
+
+import bluesky_firehose
+from bluesky_firehose import FirehosePipeline, ParquetPostSink
+
+
+def _post(frame):
+    return {'urls': f'https://doi.org/10.1590/{frame}', 'text': frame, 'author_did': 'did:plc:x',
+            'timestamp': '2026-01-01T00:00:00Z', 'doi': f'10.1590/{frame}'}
+
+
+def _crashing_decoder(frames, posts, stats, domains, latam_filter):
+    """Um post por frame; no frame 'crash' o processo morre sem enviar a sentinela"""
+    while True:
+        frame = frames.get()
+        if frame is None:
+            break
+        posts.put(_post(frame))
+        if frame == 'crash':
+            posts.close()
+            posts.join_thread()
+            os._exit(1)
+    posts.put(None)
+
+
+def _stuck_decoder(frames, posts, stats, domains, latam_filter):
+    """Um post por frame e nunca termina"""
+    while True:
+        frame = frames.get()
+        if frame is not None:
+            posts.put(_post(frame))
+        else:
+            time.sleep(3600)
+
+
+def _saved_texts(directory):
+    return sorted(text for f in directory.glob('scientific_posts_*.parquet')
+                  for text in pq.read_table(f).column('text').to_pylist())
+
+
+def _run(decoder, output_dir, monkeypatch, frames):
+    monkeypatch.setattr(bluesky_firehose, 'decode_frames', decoder)
+    pipeline = FirehosePipeline(partial(ParquetPostSink, output_dir), [], output_dir, decoders=2,
+                                queue_size=100, stats_interval=3600)
+    pipeline.start()
+    for frame in frames:
+        pipeline.on_message(frame)
+
+    started = time.monotonic()
+    pipeline.stop()
+    return pipeline, time.monotonic() - started
+
+
+def test_stop_flushes_posts_when_a_decoder_crashed(tmp_path, monkeypatch):
+    pipeline, elapsed = _run(_crashing_decoder, tmp_path, monkeypatch, ['crash', 'a', 'b', 'c'])
+
+    assert elapsed < bluesky_firehose.PROCESS_STOP_TIMEOUT
+    assert _saved_texts(tmp_path) == ['a', 'b', 'c', 'crash']
+    assert sorted(p.exitcode for p in pipeline.processes) == [0, 0, 1]
+
+
+def test_stop_terminates_a_stuck_decoder(tmp_path, monkeypatch):
+    monkeypatch.setattr(bluesky_firehose, 'PROCESS_STOP_TIMEOUT', 1.0)
+    pipeline, elapsed = _run(_stuck_decoder, tmp_path, monkeypatch, ['a', 'b'])
+
+    assert elapsed < 10
+    assert _saved_texts(tmp_path) == ['a', 'b']
+    assert not any(p.is_alive() for p in pipeline.processes)
+    assert pipeline.processes[-1].exitcode == 0
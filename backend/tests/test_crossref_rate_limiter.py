@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from collect_crossref_events import RateLimiter
+
+RATE = 100.0
+THREADS = 8
+PER_THREAD = 15
+
+
+def _acquire_concurrently(limiter, per_thread=PER_THREAD):
+    start = threading.Barrier(THREADS + 1)
+    timestamps = []
+    lock = threading.Lock()
+
+    def worker():
+        start.wait()
+        for _ in range(per_thread):
+            limiter.acquire()
+            with lock:
+                timestamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.monotonic()
+    for thread in threads:
+        thread.join()
+    return began, sorted(timestamps)
+
+
+def test_threads_share_one_rate():
+    limiter = RateLimiter(RATE)
+    began, timestamps = _acquire_concurrently(limiter)
+
+    total = THREADS * PER_THREAD
+    assert limiter.requests == total
+    # Um token inicial e depois RATE por segundo para todas as threads juntas
+    assert timestamps[-1] - began >= (total - 1) / RATE * 0.95
+    # Em qualquer janela de um segundo cabem no máximo capacity + RATE requisições
+    window = [t for t in timestamps if t - timestamps[0] <= 1.0]
+    assert len(window) <= limiter.capacity + RATE
+
+
+def test_backoff_pauses_every_thread():
+    limiter = RateLimiter(RATE)
+    limiter.backoff(0.3)
+    assert limiter.rate == RATE / 2
+    assert limiter.throttled == 1
+
+    began, timestamps = _acquire_concurrently(limiter, per_thread=1)
+    assert timestamps[0] - began >= 0.3 * 0.95
+
+
+def test_rate_follows_advertised_limit():
+    limiter = RateLimiter(10.0)
+    limiter.update_from_headers({'x-rate-limit-limit': '50', 'x-rate-limit-interval': '1s'})
+    assert limiter.rate == pytest.approx(11.0)
+    assert limiter.ceiling == 50 * RateLimiter.HEADROOM
+    for _ in range(50):
+        limiter.update_from_headers({})
+    assert limiter.rate == limiter.ceiling
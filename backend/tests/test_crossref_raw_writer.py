@@ -0,0 +1,30 @@
+from collect_crossref_events import RawEventWriter
+from config import Config
+
+
+def test_discard_segments_keeps_window_shards_of_the_same_date(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CROSSREF_RAW_DIR', tmp_path)
+    writer = RawEventWriter('10.1590', '2026-01-01')
+    window = RawEventWriter('10.1590', '2026-01-01', window=('2020-01-01', '2020-12-31'))
+    names = [
+        'p10_1590_2026-01-01_0000.parquet',
+        'p10_1590_2026-01-01_0001.parquet',
+        'p10_1590_2026-01-01_0002.parquet.part',
+        'p10_1590_2026-01-01_w20200101-20201231_0000.parquet',
+        'p10_1590_2026-01-01_w20200101-20201231_0001.parquet.part',
+        'p10_1590_2026-01-01_backup.parquet',
+        'p10_1590_2026-01-02_0000.parquet',
+    ]
+    for name in names:
+        (tmp_path / name).touch()
+
+    writer.discard_segments(keep=1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(set(names) - {
+        'p10_1590_2026-01-01_0001.parquet', 'p10_1590_2026-01-01_0002.parquet.part'})
+
+    window.discard_segments()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'p10_1590_2026-01-01_0000.parquet',
+        'p10_1590_2026-01-01_backup.parquet',
+        'p10_1590_2026-01-02_0000.parquet',
+    ]
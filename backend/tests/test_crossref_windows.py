@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import collect_crossref_events
+from collect_crossref_events import split_windows
+from config import Config
+
+DAYS = 40
+EVENTS_PER_DAY = 10
+
+
+class FakeProbe:
+    """probe_total com EVENTS_PER_DAY eventos por dia, medindo as sondagens simultâneas"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prefix, since=None, window=None, session=None, limiter=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        first, last = (date.fromisoformat(d) for d in window)
+        return ((last - first).days + 1) * EVENTS_PER_DAY
+
+
+def _configure(monkeypatch):
+    probe = FakeProbe()
+    monkeypatch.setattr(collect_crossref_events, 'probe_total', probe)
+    monkeypatch.setattr(Config, 'CROSSREF_SHARD_EVENTS', 25)
+    start = date.today() + timedelta(days=1) - timedelta(days=DAYS - 1)
+    monkeypatch.setattr(Config, 'CROSSREF_SHARD_START_DATE', start.isoformat())
+    return probe, start
+
+
+def _check_windows(windows, start):
+    # Janelas contíguas do início ao fim, cada uma dentro do alvo
+    assert windows[0][0] == start.isoformat()
+    assert windows[-1][1] == (date.today() + timedelta(days=1)).isoformat()
+    for (_, end), (next_start, _) in zip(windows, windows[1:]):
+        assert date.fromisoformat(end) + timedelta(days=1) == date.fromisoformat(next_start)
+    for first, last in windows:
+        days = (date.fromisoformat(last) - date.fromisoformat(first)).days + 1
+        assert days * EVENTS_PER_DAY <= Config.CROSSREF_SHARD_EVENTS or days == 1
+
+
+def test_plans_share_one_probe_pool(monkeypatch):
+    probe, start = _configure(monkeypatch)
+    workers = 4
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=workers) as probes:
+        plans = [executor.submit(split_windows, f'10.{i}', None, DAYS * EVENTS_PER_DAY, None, None, probes)
+                 for i in range(workers)]
+        results = [plan.result() for plan in plans]
+
+    # Um pool por plano chegaria a workers² sondagens simultâneas
+    assert 1 < probe.max_active <= workers
+    for windows in results:
+        _check_windows(windows, start)
+
+
+def test_split_windows_without_a_shared_pool(monkeypatch):
+    probe, start = _configure(monkeypatch)
+    monkeypatch.setattr(Config, 'CROSSREF_WORKERS', 3)
+
+    _check_windows(split_windows('10.1590', None, DAYS * EVENTS_PER_DAY), start)
+    assert probe.max_active <= 3
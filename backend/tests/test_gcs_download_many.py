@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import threading
+import time
+
+import pytest
+from tenacity import wait_none
+
+import collect_data_gcp
+from collect_data_gcp import GCSDownloader
+from config import Config
+
+
+def _md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, delay):
+        self.status_code = status_code
+        self.headers = {'content-length': str(len(body))}
+        self.body = body
+        self.delay = delay
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            time.sleep(self.delay)
+            yield self.body[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise collect_data_gcp.requests.exceptions.HTTPError(str(self.status_code))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeBucket:
+    """GCS com Range, generation e conexões que podem cair no meio do objeto"""
+
+    def __init__(self, objects, delay=0.01):
+        self.objects = objects
+        self.delay = delay
+        self.truncate_once = set()
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, stream=False, headers=None, timeout=None):
+        name = url.rsplit('/', 1)[-1]
+        headers = headers or {}
+        with self._lock:
+            self.requests.append((name, dict(headers)))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            body = self.objects[name]
+            if headers.get('x-goog-if-generation-match') not in (None, '1'):
+                return FakeResponse(412, b'', 0)
+            offset = int(headers['Range'][len('bytes='):-1]) if 'Range' in headers else 0
+            body = body[offset:]
+            if name in self.truncate_once:
+                self.truncate_once.discard(name)
+                body = body[:len(body) // 2]
+            return FakeResponse(206 if offset else 200, body, self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'LOCAL_DOWNLOAD_PATH', str(tmp_path))
+    monkeypatch.setattr(Config, 'DOWNLOAD_CHUNK_SIZE', 1024)
+    monkeypatch.setattr(GCSDownloader.download_file.retry, 'wait', wait_none())
+    return GCSDownloader(workers=4)
+
+
+def _listing(objects, **overrides):
+    return [
+        {'name': f'openalex/{name}', 'size': str(len(data)), 'generation': '1', 'md5Hash': _md5(data),
+         **overrides.get(name, {})}
+        for name, data in objects.items()
+    ]
+
+
+def test_downloads_in_parallel_over_the_shared_session(downloader):
+    objects = {f'works_latam_{i:012d}.parquet': bytes([i]) * 8192 for i in range(8)}
+    bucket = FakeBucket(objects)
+    downloader.session.get = bucket.get
+
+    finished = []
+    downloaded, failed = downloader.download_many(_listing(objects), on_downloaded=finished.append)
+
+    assert failed == []
+    assert sorted(p.name for p in downloaded) == sorted(objects)
+    assert sorted(finished) == sorted(downloaded)
+    for name, data in objects.items():
+        assert (downloader.download_path / name).read_bytes() == data
+    assert not list(downloader.download_path.glob('*.part'))
+    assert 1 < bucket.max_active <= downloader.workers
+    assert all(h['x-goog-if-generation-match'] == '1' for _, h in bucket.requests)
+
+
+def test_interrupted_download_resumes_with_range(downloader):
+    data = bytes(range(256)) * 40
+    objects = {'sources_latam_000000000000.parquet': data}
+    bucket = FakeBucket(objects, delay=0)
+    bucket.truncate_once.add('sources_latam_000000000000.parquet')
+    downloader.session.get = bucket.get
+
+    downloaded, failed = downloader.download_many(_listing(objects))
+
+    assert failed == []
+    assert downloaded[0].read_bytes() == data
+    assert [h.get('Range') for _, h in bucket.requests] == [None, f'bytes={len(data) // 2}-']
+
+
+def test_failures_are_reported_without_stopping_the_batch(downloader):
+    objects = {
+        'works_latam_000000000000.parquet': b'a' * 4096,
+        'works_latam_000000000001.parquet': b'b' * 4096,
+        'works_latam_000000000002.parquet': b'c' * 4096,
+    }
+    bucket = FakeBucket(objects, delay=0)
+    downloader.session.get = bucket.get
+    listing = _listing(objects, **{
+        'works_latam_000000000001.parquet': {'md5Hash': _md5(b'other')},
+        'works_latam_000000000002.parquet': {'generation': '2'},
+    })
+
+    downloaded, failed = downloader.download_many(listing)
+
+    assert [p.name for p in downloaded] == ['works_latam_000000000000.parquet']
+    assert sorted(failed) == ['openalex/works_latam_000000000001.parquet', 'openalex/works_latam_000000000002.parquet']
+    assert not (downloader.download_path / 'works_latam_000000000001.parquet').exists()
+    assert not list(downloader.download_path.glob('*.part'))
+    # Hash divergente é refeito do zero até MAX_RETRIES; generation trocada não tem retry
+    names = [name for name, _ in bucket.requests]
+    assert names.count('works_latam_000000000001.parquet') == Config.MAX_RETRIES
+    assert names.count('works_latam_000000000002.parquet') == 1
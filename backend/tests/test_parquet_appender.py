@@ -0,0 +1,104 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from conftest import TOOLS_DIR
+from parquet_appender import RollingParquetWriter, recover_partial_files
+
+SCHEMA = pa.schema([('urls', pa.string()), ('text', pa.string())])
+
+# Grava 5 lotes de 50 linhas com row groups de 120: o kill chega com 240 linhas em
+# row groups do .partial (sem rodapé) e 10 ainda em memória
+WRITER_SCRIPT = textwrap.dedent('''
+    import sys, time
+    from pathlib import Path
+    import pyarrow as pa
+    sys.path.insert(0, sys.argv[1])
+    from parquet_appender import RollingParquetWriter
+
+    out = Path(sys.argv[2])
+    schema = pa.schema([('urls', pa.string()), ('text', pa.string())])
+    writer = RollingParquetWriter(lambda: out / 'posts_001.parquet', schema,
+                                  rotate_bytes=1 << 30, row_group_rows=120)
+    for batch in range(5):
+        rows = range(batch * 50, (batch + 1) * 50)
+        writer.write(pa.table({'urls': [f'https://doi.org/10.1590/{i}' for i in rows],
+                               'text': [f'post {i}' for i in rows]}))
+    print('ok', flush=True)
+    time.sleep(60)
+''')
+
+
+def _compression(path):
+    """Codecs das colunas do arquivo (layout 'raw' do parquet_layout: ZSTD)"""
+    metadata = pq.ParquetFile(path).metadata
+    return {metadata.row_group(i).column(j).compression
+            for i in range(metadata.num_row_groups) for j in range(metadata.num_columns)}
+
+
+def _batch(start, rows):
+    return pa.table({'urls': [f'https://doi.org/10.1590/{i}' for i in range(start, start + rows)],
+                     'text': [f'post {i}' for i in range(start, start + rows)]})
+
+
+def test_rotate_publishes_file_and_removes_journal(tmp_path):
+    writer = RollingParquetWriter(lambda: tmp_path / 'posts_001.parquet', SCHEMA,
+                                  rotate_bytes=1 << 30, row_group_rows=100)
+    writer.write(_batch(0, 50))
+    writer.write(_batch(50, 80))
+    assert (tmp_path / 'posts_001.parquet.partial').exists()
+    assert (tmp_path / 'posts_001.parquet.journal').exists()
+
+    final_file = writer.close()
+
+    assert final_file == tmp_path / 'posts_001.parquet'
+    assert pq.read_table(final_file).num_rows == 130
+    assert _compression(final_file) == {'ZSTD'}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['posts_001.parquet']
+
+
+def test_killed_writer_is_recovered_from_journal(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', WRITER_SCRIPT, str(TOOLS_DIR), str(tmp_path)],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().strip() == 'ok'
+        os.kill(process.pid, signal.SIGKILL)
+    finally:
+        process.wait(timeout=30)
+        process.stdout.close()
+    assert process.returncode == -signal.SIGKILL
+
+    # Sem rodapé, o .partial não é legível
+    partial = tmp_path / 'posts_001.parquet.partial'
+    assert partial.stat().st_size > 0
+
+    recovered = recover_partial_files(tmp_path)
+
+    final_file = tmp_path / 'posts_001.parquet'
+    assert recovered == [final_file]
+    table = pq.read_table(final_file)
+    assert table.column('text').to_pylist() == [f'post {i}' for i in range(250)]
+    assert _compression(final_file) == {'ZSTD'}
+    assert (tmp_path / 'posts_001.parquet.broken').exists()
+    assert not partial.exists()
+    assert not (tmp_path / 'posts_001.parquet.journal').exists()
+
+
+def test_truncated_journal_keeps_complete_batches(tmp_path):
+    writer = RollingParquetWriter(lambda: tmp_path / 'posts_001.parquet', SCHEMA,
+                                  rotate_bytes=1 << 30)
+    writer.write(_batch(0, 50))
+    writer.write(_batch(50, 50))
+    journal = tmp_path / 'posts_001.parquet.journal'
+    # Kill no meio da gravação do segundo lote
+    with open(journal, 'r+b') as f:
+        f.truncate(journal.stat().st_size - 40)
+
+    recover_partial_files(tmp_path)
+
+    assert pq.read_table(tmp_path / 'posts_001.parquet').num_rows == 50
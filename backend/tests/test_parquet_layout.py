@@ -0,0 +1,58 @@
+import duckdb
+import pytest
+
+import parquet_layout
+from parquet_layout import LAYOUTS, copy_to_parquet, row_group_pruning
+
+
+@pytest.fixture
+def small_row_groups(monkeypatch):
+    # Fora do múltiplo de 2048: o DuckDB grava row groups de 2048 linhas
+    monkeypatch.setattr(LAYOUTS['events'], 'row_group_size', 1000)
+    return LAYOUTS['events']
+
+
+def _write_events(path, rows):
+    conn = duckdb.connect()
+    conn.execute(f"""
+        CREATE TABLE events AS
+        SELECT 'https://doi.org/10.1590/s0100-' || lpad(i::VARCHAR, 10, '0') AS id,
+               ['crossref', 'bori', 'wikipedia'][i % 3 + 1] AS source_,
+               2015 + i % 10 AS year,
+               '10.1590' AS prefix
+        FROM range({rows}) r(i)
+    """)
+    copy_to_parquet(conn, "SELECT * FROM events", path, 'events')
+    return conn
+
+
+def test_every_row_group_has_a_doi_bloom_filter(tmp_path, small_row_groups):
+    path = tmp_path / 'part.parquet'
+    # DOIs todos distintos: o pior caso para o limite do dicionário
+    conn = _write_events(path, 5 * 2048)
+
+    chunks = conn.execute(f"""
+        SELECT encodings, dictionary_page_offset IS NOT NULL, bloom_filter_offset IS NOT NULL
+        FROM parquet_metadata('{path}') WHERE path_in_schema = 'id'
+    """).fetchall()
+
+    assert len(chunks) == 5
+    for encodings, has_dictionary, has_bloom_filter in chunks:
+        assert 'DICTIONARY' in encodings
+        assert has_dictionary and has_bloom_filter
+
+
+def test_events_are_sorted_for_row_group_pruning(tmp_path, small_row_groups):
+    path = tmp_path / 'part.parquet'
+    _write_events(path, 6 * 2048)
+
+    assert row_group_pruning(path, 'source_', 'bori') == (6, 4)
+    # Ordenado por fonte e depois ano: cada row group ainda cobre vários anos
+    assert row_group_pruning(path, 'year', 2030, 2040) == (6, 6)
+
+
+def test_dictionary_limit_covers_the_written_row_group(small_row_groups):
+    options = parquet_layout.copy_options('events')
+
+    assert "ROW_GROUP_SIZE 1000" in options
+    assert "DICTIONARY_SIZE_LIMIT 2048" in options
@@ -0,0 +1,88 @@
+import duckdb
+import pytest
+
+import process_all_events as etl
+from config import Config
+from event_processors import PROCESSORS
+
+
+@pytest.fixture
+def events_dir(tmp_path, monkeypatch):
+    """Fontes sem arquivos brutos, com partições, manifesto e estado no diretório temporário"""
+    monkeypatch.setattr(Config, 'ALL_EVENTS_MANIFEST', tmp_path / 'consolidated' / 'manifest.json')
+    monkeypatch.setattr(Config, 'ETL_TEMP_DIR', tmp_path / 'tmp')
+    monkeypatch.setattr(Config, 'COLLECTION_STATE_DB', tmp_path / 'logs' / 'collection_state.sqlite')
+    # Processadores no próprio processo (os monkeypatches não chegam aos filhos)
+    monkeypatch.setattr(Config, 'EVENT_PROCESSING_WORKERS', 1)
+    (tmp_path / 'raw').mkdir()
+    for source, processor in PROCESSORS.items():
+        monkeypatch.setattr(processor, 'raw_dir', tmp_path / 'raw')
+        monkeypatch.setattr(processor, 'partitions_dir', tmp_path / 'processed' / source)
+        monkeypatch.setattr(processor, 'legacy_file', None)
+        monkeypatch.setitem(etl.PARTITION_DIRS, source, tmp_path / 'processed' / source)
+    return tmp_path
+
+
+def _legacy_events(path, source, count):
+    """Arquivo *_clean_events.parquet anterior às partições"""
+    duckdb.execute(f"""
+        COPY (SELECT 'https://doi.org/10.1590/' || i AS id,
+                     TIMESTAMP '2024-01-01' + INTERVAL (i) DAY AS timestamp_,
+                     '{source}' AS source_, '10.1590' AS prefix
+              FROM range({count}) r(i))
+        TO '{path}'
+    """)
+    return path
+
+
+def test_failed_source_fails_the_run(events_dir, monkeypatch, capsys):
+    monkeypatch.setattr(PROCESSORS['crossref'], 'legacy_file',
+                        _legacy_events(events_dir / 'crossref_clean_events.parquet', 'crossref', 5))
+    broken = events_dir / 'bori_clean_events.parquet'
+    broken.write_bytes(b'not a parquet file')
+    monkeypatch.setattr(PROCESSORS['bori'], 'legacy_file', broken)
+
+    assert etl.process_all_events() is False
+
+    # As fontes sem erro são publicadas; a que falhou aparece no resumo
+    assert etl.read_events_manifest()['partitions']['crossref']['events'] == 5
+    output = capsys.readouterr().out
+    assert 'CONSOLIDAÇÃO INCOMPLETA' in output
+    assert '✗ bori:' in output
+
+
+def test_run_without_errors_succeeds(events_dir, monkeypatch):
+    monkeypatch.setattr(PROCESSORS['bori'], 'legacy_file',
+                        _legacy_events(events_dir / 'bori_clean_events.parquet', 'bori', 3))
+
+    assert etl.process_all_events() is True
+    assert etl.read_events_manifest()['total_events'] == 3
+
+
+def test_rebuilt_partition_is_removed_when_the_source_fails(events_dir, monkeypatch):
+    monkeypatch.setattr(PROCESSORS['bori'], 'legacy_file',
+                        _legacy_events(events_dir / 'bori_clean_events.parquet', 'bori', 3))
+    assert etl.process_all_events() is True
+
+    # Entradas novas, erro depois de a partição nova estar gravada
+    raw_file = _legacy_events(events_dir / 'raw' / 'bori.parquet', 'bori', 4)
+    monkeypatch.setattr(PROCESSORS['bori'], 'transform', lambda conn, raw, view: conn.execute(
+        f"CREATE OR REPLACE VIEW {view} AS SELECT id, timestamp_, source_, prefix FROM {raw}"))
+    monkeypatch.setattr(PROCESSORS['bori'], 'columns', ('id', 'timestamp_', 'source_', 'prefix'))
+    monkeypatch.setattr(PROCESSORS['bori'], 'pattern', raw_file.name)
+
+    def fail(partition_file):
+        raise OSError('disk error')
+    monkeypatch.setattr(etl, 'partition_events', fail)
+    assert etl.process_all_events() is False
+
+    # Só a partição publicada continua no diretório (com os seus rollups)
+    published = [f.split('/')[-1] for f in etl.read_events_manifest()['files']]
+    assert [p.name for p in etl.PARTITION_DIRS['bori'].glob('part-*.parquet')] == published
+    rollups = {p.name for p in (etl.PARTITION_DIRS['bori'] / 'rollups').iterdir()}
+    assert rollups == {f"{published[0][:-len('.parquet')]}_{g}.parquet" for g in etl.ROLLUP_GRANULARITIES}
+
+    # A publicação seguinte não soma a partição da execução que falhou
+    monkeypatch.setattr(PROCESSORS['bori'], 'raw_dir', events_dir / 'missing')
+    assert etl.process_all_events() is True
+    assert etl.read_events_manifest()['total_events'] == 3
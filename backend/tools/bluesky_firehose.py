@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Pipeline multiprocesso do Firehose do Bluesky: recepção, decodificação e gravação separadas
+
+A thread do websocket só enfileira os frames recebidos numa fila limitada
+(BLUESKY_QUEUE_SIZE); BLUESKY_DECODERS processos fazem o parse do commit, a
+decodificação do CAR (uma vez por commit, não por operação) e o filtro de conteúdo
+científico (scientific_matcher) e o filtro de prefixes LATAM
+(latam_prefix_filter); um único processo de gravação recebe os posts aceitos e os entrega ao
+sink (parquet, estado, upload). O processamento pesado sai da thread do websocket, que é
+o que derrubava o coletor nos picos de tráfego.
+
+Nenhum frame é descartado: com a fila cheia a thread do websocket espera (contrapressão;
+o TCP reduz o envio do relay) e cada FRAME_PUT_TIMEOUT segundos de espera é contado em
+stalled. Se o relay encerrar a conexão de um consumidor lento, a reconexão retoma do
+seq do último frame enfileirado (cursor), sem lacuna.
+
+Profundidade das filas, atraso (agora - horário do último commit decodificado) e
+contadores são registrados no log e em <output_dir>/firehose_stats.json a cada
+BLUESKY_STATS_INTERVAL segundos.
+
+O coletor completo (upload, estado, log de coleta) é collect_bluesky_events.py, fora do
+repositório (.gitignore); como script, este módulo roda o pipeline com ParquetPostSink,
+que só grava os posts aceitos em BLUESKY_RAW_DIR:
+    python bluesky_firehose.py
+
+Com --sample, grava N registros de post do Firehose antes de qualquer filtro (.jsonl com
+text e facets), o corpus do microbenchmark de scientific_matcher.py:
+    python bluesky_firehose.py --sample 200000 firehose_sample.jsonl
+"""
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+import pyarrow as pa
+from config import Config
+from latam_prefix_filter import LatamPrefixFilter
+from parquet_appender import RollingParquetWriter, recover_partial_files
+from scientific_matcher import ScientificMatcher
+
+logger = logging.getLogger(__name__)
+
+POST_COLLECTION = 'app.bsky.feed.post/'
+
+# Contadores locais dos decodificadores são somados aos compartilhados a cada N frames
+COUNTER_FLUSH_FRAMES = 500
+
+# Espera máxima por vez da thread do websocket com a fila de frames cheia (segundos)
+FRAME_PUT_TIMEOUT = 1.0
+
+# Espera máxima no encerramento por etapa (decodificadores, depois o gravador); quem não
+# terminar no prazo é encerrado com terminate() (segundos)
+PROCESS_STOP_TIMEOUT = 30.0
+
+# Enviado ao gravador por stop() depois que todos os decodificadores terminaram: um
+# decodificador morto (OOM, segfault) não envia a sua sentinela None
+DECODERS_EXITED = 'decoders-exited'
+
+
+def _commit_time(value: str) -> float:
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+class PipelineStats:
+    """Contadores compartilhados entre os processos do pipeline"""
+
+    COUNTERS = ('received', 'stalled', 'decoded', 'checked', 'matched', 'non_latam', 'saved')
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, mp.Value('q', 0))
+        # Horário (epoch) do commit mais recente decodificado, para o atraso
+        self.last_commit_time = mp.Value('d', 0.0)
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            if value:
+                counter = getattr(self, name)
+                with counter.get_lock():
+                    counter.value += value
+
+    def mark_commit(self, timestamp: float):
+        with self.last_commit_time.get_lock():
+            if timestamp > self.last_commit_time.value:
+                self.last_commit_time.value = timestamp
+
+    def snapshot(self) -> dict:
+        stats = {name: getattr(self, name).value for name in self.COUNTERS}
+        last = self.last_commit_time.value
+        stats['lag_seconds'] = round(time.time() - last, 1) if last else None
+        return stats
+
+
+def _queue_depth(q) -> Optional[int]:
+    try:
+        return q.qsize()
+    except NotImplementedError:  # macOS
+        return None
+
+
+def decode_frames(frames, posts, stats: PipelineStats, domains: List[str],
+                  latam_filter: LatamPrefixFilter):
+    """Processo decodificador: frame -> commit -> CAR -> posts científicos"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # O encerramento vem pela fila
+    from atproto import CAR, parse_subscribe_repos_message
+    matcher = ScientificMatcher(domains)
+
+    counts = dict.fromkeys(('decoded', 'checked', 'matched', 'non_latam'), 0)
+    pending = 0
+    while True:
+        frame = frames.get()
+        if frame is None:
+            break
+
+        pending += 1
+        if pending >= COUNTER_FLUSH_FRAMES:
+            stats.add(**counts)
+            counts = dict.fromkeys(counts, 0)
+            pending = 0
+
+        try:
+            commit = parse_subscribe_repos_message(frame)
+        except (KeyError, AttributeError, ValueError):
+            # Tipos sem posts (#identity, #account, #handle...)
+            continue
+
+        ops = getattr(commit, 'ops', None)
+        if not ops:
+            continue
+        counts['decoded'] += 1
+        stats.mark_commit(_commit_time(commit.time))
+
+        car = None
+        for op in ops:
+            if op.action != 'create' or not op.path.startswith(POST_COLLECTION):
+                continue
+            counts['checked'] += 1
+            try:
+                if car is None:
+                    car = CAR.from_bytes(commit.blocks)
+                record = car.blocks.get(op.cid)
+                if not record:
+                    continue
+
+                found = matcher.match(record)
+                if not found:
+                    continue
+
+                counts['matched'] += 1
+                post = latam_filter.apply({
+                    'urls': found['urls'],
+                    'text': record.get('text', ''),
+                    'author_did': commit.repo,
+                    'timestamp': record.get('createdAt', ''),
+                    'doi': found['doi'],
+                    'tip': found['tip']
+                })
+                if post is None or post.get('latam') == 'false':
+                    counts['non_latam'] += 1
+                if post is not None:
+                    posts.put(post)
+            except Exception as e:
+                logger.debug(f'Erro ao processar commit: {e}')
+
+    stats.add(**counts)
+    posts.put(None)
+
+
+def write_posts(posts, stats: PipelineStats, sink_factory: Callable, decoders: int,
+                buffer_size: int, flush_seconds: float):
+    """
+    Processo de gravação: agrupa os posts em lotes e os entrega ao sink
+
+    sink_factory() é chamado aqui, então arquivos, estado e uploads pertencem só a este
+    processo. O sink implementa write(posts, checked) e close(checked), com checked =
+    posts checados na sessão.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sink = sink_factory()
+    buffer = []
+    last_flush = time.monotonic()
+    finished = 0
+
+    def flush():
+        nonlocal buffer, last_flush
+        if buffer:
+            sink.write(buffer, checked=stats.checked.value)
+            stats.add(saved=len(buffer))
+            buffer = []
+        last_flush = time.monotonic()
+
+    parent = mp.parent_process()
+    while finished < decoders:
+        try:
+            post = posts.get(timeout=1)
+        except queue.Empty:
+            post = False
+            if parent is not None and not parent.is_alive():
+                logger.error('Processo principal encerrado: gravando os posts recebidos')
+                break
+        if post is None:
+            finished += 1
+        elif post == DECODERS_EXITED:
+            # Todos os decodificadores já saíram: os posts deles estão antes deste aviso
+            break
+        elif post:
+            buffer.append(post)
+
+        # Lote cheio ou parado há muito tempo (pouco volume ainda chega ao arquivo)
+        if len(buffer) >= buffer_size or time.monotonic() - last_flush >= flush_seconds:
+            flush()
+
+    flush()
+    # Os decodificadores somam os contadores antes da sentinela: aqui já são os finais
+    sink.close(checked=stats.checked.value)
+
+
+class FirehosePipeline:
+    """Recepção do Firehose na thread do websocket, decodificadores e gravador em processos"""
+
+    def __init__(
+        self,
+        sink_factory: Callable,
+        domains: List[str],
+        output_dir: Path,
+        decoders: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        buffer_size: int = 50,
+        stats_interval: Optional[float] = None
+    ):
+        self.decoders = decoders or Config.BLUESKY_DECODERS or max((os.cpu_count() or 2) - 1, 1)
+        self.queue_size = queue_size or Config.BLUESKY_QUEUE_SIZE
+        self.stats_interval = stats_interval or Config.BLUESKY_STATS_INTERVAL
+        self.stats_file = Path(output_dir) / 'firehose_stats.json'
+
+        self.frames = mp.Queue(self.queue_size)
+        # Posts aceitos são poucos (<1% dos frames); a fila só precisa absorver rajadas
+        self.posts = mp.Queue(self.queue_size)
+        self.stats = PipelineStats()
+        # Carregado uma vez aqui; os decodificadores recebem o conjunto pronto
+        self.latam_filter = LatamPrefixFilter()
+        self._stopping = threading.Event()
+        # seq do último frame enfileirado: cursor da reconexão
+        self.cursor: Optional[int] = None
+
+        self.processes = [
+            mp.Process(target=decode_frames, name=f'firehose-decoder-{i}',
+                       args=(self.frames, self.posts, self.stats, domains, self.latam_filter))
+            for i in range(self.decoders)
+        ]
+        self.processes.append(mp.Process(
+            target=write_posts, name='firehose-writer',
+            args=(self.posts, self.stats, sink_factory, self.decoders, buffer_size, self.stats_interval)
+        ))
+
+    def on_message(self, message):
+        """
+        Callback do websocket: só enfileira (o pickle roda na thread da própria fila)
+
+        Com a fila cheia espera os decodificadores em vez de descartar o frame; a
+        leitura do websocket para enquanto isso.
+        """
+        self.stats.received.value += 1  # Só esta thread escreve
+        while True:
+            try:
+                self.frames.put(message, timeout=FRAME_PUT_TIMEOUT)
+                break
+            except queue.Full:
+                self.stats.stalled.value += 1
+                if not any(p.is_alive() for p in self.processes[:self.decoders]):
+                    raise RuntimeError('Nenhum decodificador ativo: fila de frames parada')
+                logger.warning(f'Fila de frames cheia ({self.queue_size}): leitura do Firehose em espera')
+
+        seq = getattr(message, 'body', None) and message.body.get('seq')
+        if seq:
+            self.cursor = seq
+
+    def snapshot(self) -> dict:
+        stats = self.stats.snapshot()
+        stats['frame_queue'] = _queue_depth(self.frames)
+        stats['post_queue'] = _queue_depth(self.posts)
+        stats['queue_size'] = self.queue_size
+        stats['decoders'] = self.decoders
+        stats['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return stats
+
+    def _report(self):
+        previous = self.stats.snapshot()
+        while not self._stopping.wait(self.stats_interval):
+            stats = self.snapshot()
+            stats['frames_per_second'] = round(
+                (stats['received'] - previous['received']) / self.stats_interval, 1)
+            stats['posts_per_second'] = round(
+                (stats['checked'] - previous['checked']) / self.stats_interval, 1)
+            previous = stats
+
+            lag = f"{stats['lag_seconds']:.0f}s" if stats['lag_seconds'] is not None else '-'
+            logger.info(
+                f"Firehose: {stats['frames_per_second']:.0f} frames/s, {stats['posts_per_second']:.0f} posts/s | "
+                f"fila {stats['frame_queue']}/{self.queue_size}, posts {stats['post_queue']} | "
+                f"atraso {lag} | checados {stats['checked']}, salvos {stats['saved']}, "
+                f"fora LATAM {stats['non_latam']}, "
+                f"espera da fila {stats['stalled'] * FRAME_PUT_TIMEOUT:.0f}s"
+            )
+            try:
+                tmp = self.stats_file.with_suffix('.json.tmp')
+                tmp.write_text(json.dumps(stats, indent=2))
+                os.replace(tmp, self.stats_file)
+            except OSError as e:
+                logger.warning(f'Erro ao gravar {self.stats_file.name}: {e}')
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        threading.Thread(target=self._report, name='firehose-stats', daemon=True).start()
+        logger.info(f'Pipeline iniciado: {self.decoders} decodificadores, fila de {self.queue_size} frames')
+
+    def stop(self):
+        """
+        Esvazia o pipeline: sentinelas seguem os frames já enfileirados até o gravador
+
+        Cada etapa espera até PROCESS_STOP_TIMEOUT segundos. Com os decodificadores
+        encerrados (inclusive os que morreram sem enviar a sentinela), o gravador recebe
+        DECODERS_EXITED, grava o buffer e fecha o sink.
+        """
+        self._stopping.set()
+        decoders, writer = self.processes[:self.decoders], self.processes[-1]
+        deadline = time.monotonic() + PROCESS_STOP_TIMEOUT
+        sent = 0
+        while sent < len(decoders) and any(p.is_alive() for p in decoders) and time.monotonic() < deadline:
+            try:
+                self.frames.put(None, timeout=FRAME_PUT_TIMEOUT)
+                sent += 1
+            except queue.Full:
+                pass
+        self._join(decoders)
+        try:
+            self.posts.put(DECODERS_EXITED, timeout=FRAME_PUT_TIMEOUT)
+        except queue.Full:
+            pass
+        self._join([writer])
+        logger.info(f'Pipeline finalizado: {self.snapshot()}')
+
+    @staticmethod
+    def _join(processes: List[mp.Process]):
+        deadline = time.monotonic() + PROCESS_STOP_TIMEOUT
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.error(f'{process.name} não terminou em {PROCESS_STOP_TIMEOUT:.0f}s: encerrando')
+                process.terminate()
+                process.join()
+            elif process.exitcode:
+                logger.error(f'{process.name} terminou com código {process.exitcode}')
+
+    def run(self, client_factory: Optional[Callable] = None):
+        """
+        Conecta ao Firehose com reconexão automática até Ctrl+C
+
+        client_factory(params) recebe {'cursor': seq} depois do primeiro frame, para a
+        reconexão retomar de onde a fila parou.
+        """
+        if client_factory is None:
+            from atproto import FirehoseSubscribeReposClient
+            client_factory = FirehoseSubscribeReposClient
+
+        retry_delays = [5, 10, 30, 60, 300]
+        retry_count = 0
+        self.start()
+        try:
+            while True:
+                try:
+                    logger.info('Conectando ao Firehose do Bluesky...')
+                    params = {'cursor': self.cursor} if self.cursor else None
+                    client_factory(params).start(self.on_message)
+                    retry_count = 0
+                except KeyboardInterrupt:
+                    raise
+                except Exception as e:
+                    delay = retry_delays[min(retry_count, len(retry_delays) - 1)]
+                    logger.warning(f'Conexão perdida: {e}')
+                    logger.warning(f'Tentando reconectar em {delay} segundos... (tentativa {retry_count + 1})')
+                    time.sleep(delay)
+                    retry_count += 1
+        except KeyboardInterrupt:
+            logger.info('Interrupção manual detectada (Ctrl+C), esvaziando o pipeline...')
+        finally:
+            self.stop()
+
+
+def record_sample(output_file: Path, limit: int, client_factory: Optional[Callable] = None) -> int:
+    """
+    Grava os próximos limit posts do Firehose em .jsonl, sem filtro ({'text', 'facets'} por linha)
+
+    Amostra do tráfego real: a maioria dos posts não é científica, como na entrada dos
+    decodificadores. Decodifica na thread do websocket (gravação pontual, não a coleta).
+    Retorna o número de posts gravados.
+    """
+    from atproto import CAR, parse_subscribe_repos_message
+    if client_factory is None:
+        from atproto import FirehoseSubscribeReposClient
+        client_factory = FirehoseSubscribeReposClient
+
+    client = client_factory(None)
+    written = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        def on_message(message):
+            nonlocal written
+            if written >= limit:
+                return
+            try:
+                commit = parse_subscribe_repos_message(message)
+            except (KeyError, AttributeError, ValueError):
+                return
+            car = None
+            for op in getattr(commit, 'ops', None) or []:
+                if op.action != 'create' or not op.path.startswith(POST_COLLECTION):
+                    continue
+                if car is None:
+                    car = CAR.from_bytes(commit.blocks)
+                record = car.blocks.get(op.cid)
+                if not record:
+                    continue
+                f.write(json.dumps({'text': record.get('text', ''), 'facets': record.get('facets') or []},
+                                   ensure_ascii=False, default=str) + '\n')
+                written += 1
+                if written >= limit:
+                    client.stop()
+                    return
+
+        client.start(on_message)
+    return written
+
+
+class ParquetPostSink:
+    """Sink mínimo do pipeline: posts aceitos em scientific_posts_*.parquet, sem upload nem estado"""
+
+    COLUMNS = ['urls', 'text', 'author_did', 'timestamp', 'doi']
+    ROTATE_BYTES = 50 * 1024 * 1024
+    ROTATE_SECONDS = 15 * 60
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.columns = self.COLUMNS + (['latam'] if Config.BLUESKY_LATAM_FILTER.lower() == 'tag' else [])
+        self.file_index = 0
+
+        for recovered in recover_partial_files(self.output_dir):
+            logger.info(f'Recuperado de execução anterior: {recovered.name}')
+        self.writer = RollingParquetWriter(
+            self._new_file,
+            pa.schema([(col, pa.string()) for col in self.columns]),
+            rotate_bytes=self.ROTATE_BYTES,
+            rotate_seconds=self.ROTATE_SECONDS
+        )
+
+    def _new_file(self) -> Path:
+        self.file_index += 1
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return self.output_dir / f'scientific_posts_{timestamp}_{self.file_index:03d}.parquet'
+
+    def write(self, posts: List[dict], checked: int):
+        self.writer.write(pa.table({col: [p.get(col, '') for p in posts] for col in self.columns}))
+
+    def close(self, checked: int):
+        self.writer.close()
+        logger.info(f'Posts checados na sessão: {checked}')
+
+
+if __name__ == "__main__":
+    import sys
+    from functools import partial
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    if len(sys.argv) > 1:
+        if len(sys.argv) != 4 or sys.argv[1] != '--sample':
+            print("Uso: python bluesky_firehose.py [--sample N arquivo.jsonl]")
+            sys.exit(1)
+        count = record_sample(Path(sys.argv[3]), int(sys.argv[2]))
+        print(f"{count:,} posts sem filtro gravados em {sys.argv[3]}")
+        sys.exit(0)
+
+    config_file = Path(__file__).parent / 'config.json'
+    domains = json.loads(config_file.read_text()).get('scientific_domains', []) if config_file.exists() else []
+    output_dir = Config.BLUESKY_RAW_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    FirehosePipeline(partial(ParquetPostSink, output_dir), domains, output_dir).run()
@@ -3,69 +3,164 @@
 Coleta eventos da API Crossref Event Data
 Adaptado do código legado para integração com sistema atual
 Suporta coleta incremental baseada em datas anteriores
+
+Vários prefixes são coletados em paralelo (CROSSREF_WORKERS) sobre uma sessão HTTP
+compartilhada; um único RateLimiter (token bucket) controla o ritmo de todas as threads,
+seguindo os headers x-rate-limit-* da API e recuando quando ela responde 429.
 """
+import os
+import re
 import requests
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import glob
 import logging
 from tqdm import tqdm
 from config import Config
+from collection_state import CollectionStateStore
+from polling_schedule import PollingScheduler
+from parquet_layout import parquet_writer_options
 
 logger = logging.getLogger(__name__)
 
+# Fontes no CollectionStateStore: prefix inteiro e janelas de datas de um prefix grande
+SOURCE = 'crossref'
+WINDOW_SOURCE = 'crossref_window'
+
+
+class CrossrefAPIError(requests.exceptions.RequestException):
+    """A API não respondeu a página após as tentativas (o prefix fica para ser retomado)"""
+
+# Schema fixo dos parquets brutos: apenas os campos do evento usados no processamento
+# (process_crossref_events.py) e na identificação/deduplicação do evento
+RAW_EVENT_SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('obj_id', pa.string()),
+    ('subj_id', pa.string()),
+    ('source_id', pa.string()),
+    ('relation_type_id', pa.string()),
+    ('occurred_at', pa.string()),
+    ('timestamp', pa.string()),
+])
+
+
+class RateLimiter:
+    """Token bucket compartilhado pelas threads de coleta, adaptado aos headers da API"""
+
+    # Fração do limite anunciado pela API que a coleta usa (folga para outros clientes)
+    HEADROOM = 0.9
+    # Crescimento da taxa a cada resposta bem-sucedida, até o limite anunciado
+    GROWTH = 1.1
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.ceiling = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> float:
+        # Rajada de até um segundo de requisições
+        return max(self.rate, 1.0)
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now > self.updated:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.requests += 1
+                    return
+                # Durante uma pausa (429) updated fica no futuro
+                wait = max(self.updated - now, 0) + (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
-def read_last_collection() -> pd.DataFrame:
-    """Lê datas da última coleta para cada prefix"""
-    if not Config.CROSSREF_COLLECTION_LOG.exists():
-        logger.info("Nenhuma coleta anterior encontrada. Iniciando do zero.")
-        return pd.DataFrame(columns=['prefix', 'date'], dtype=str)
+    def update_from_headers(self, headers):
+        """Aproxima a taxa do limite anunciado (x-rate-limit-limit por x-rate-limit-interval)"""
+        limit = headers.get('x-rate-limit-limit')
+        interval = headers.get('x-rate-limit-interval')
+
+        with self._lock:
+            if limit and interval:
+                try:
+                    self.ceiling = float(limit) / float(interval.rstrip('s')) * self.HEADROOM
+                except ValueError:
+                    logger.debug(f"Headers de rate limit inválidos: {limit}/{interval}")
+            self.rate = min(self.ceiling, self.rate * self.GROWTH)
+
+    def backoff(self, retry_after: float):
+        """429: pausa todas as threads por retry_after segundos e reduz a taxa pela metade"""
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.rate / 2, 0.1)
+            self.tokens = 0.0
+            self.updated = max(self.updated, time.monotonic() + retry_after)
+        logger.warning(f"Rate limit excedido. Pausando coleta por {retry_after}s (nova taxa: {self.rate:.1f} req/s)")
+
+
+def create_session(workers: int) -> requests.Session:
+    """Sessão compartilhada entre as threads: reaproveita conexões TCP/TLS com a API"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def read_last_collection(state: Optional[CollectionStateStore] = None) -> Dict[str, str]:
+    """Lê a data da última coleta de cada prefix (prefix -> data)"""
+    if state is None:
+        with CollectionStateStore() as state:
+            return state.last_dates(SOURCE)
+    return state.last_dates(SOURCE)
+
+
+def _query_params(prefix: str, since: Optional[str] = None, window: Optional[Tuple[str, str]] = None) -> dict:
+    """Parâmetros da consulta de um prefix (coleta incremental e janela de datas opcionais)"""
+    params = {
+        "mailto": Config.CROSSREF_MAILTO or "marcelo@markdev.dev",
+        "rows": str(Config.CROSSREF_ROWS_PER_REQUEST),
+        "obj-id.prefix": prefix,
+    }
     
-    try:
-        df = pd.read_csv(Config.CROSSREF_COLLECTION_LOG, names=['prefix', 'date'], header=None)
-        # Pegar última data por prefix
-        latest = df.groupby('prefix')['date'].max().reset_index()
-        latest.columns = ['prefix', 'last_date']
-        return latest
-    except Exception as e:
-        logger.error(f"Erro ao ler log de coleta: {e}")
-        return pd.DataFrame(columns=['prefix', 'last_date'], dtype=str)
-
-
-def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_progress: bool = False) -> List[dict]:
-    """Coleta eventos para um prefix específico com tratamento de rate limits"""
-    events = []
-    cursor = None
+    if since:
+        params["from-collected-date"] = since
+    if window:
+        params["from-occurred-date"], params["until-occurred-date"] = window
+    return params
+
+
+def _fetch_page(prefix: str, params: dict, session: requests.Session, limiter: RateLimiter) -> dict:
+    """
+    Executa uma requisição à API com tratamento de rate limits e retries
+
+    Retorna o campo "message" da resposta. Levanta CrossrefAPIError quando desiste da página.
+    """
     max_retries = 5
     retry_count = 0
     
-    params_names = ["mailto", "rows", "obj-id.prefix"]
-    params_values = [
-        Config.CROSSREF_MAILTO or "marcelo@markdev.dev",
-        str(Config.CROSSREF_ROWS_PER_REQUEST),
-        prefix
-    ]
-    
-    if since:
-        params_names.append("from-collected-date")
-        params_values.append(since)
-    
-    iteration = 0
-    
     while True:
-        params = "?" + '&'.join([f"{name}={value}" for name, value in zip(params_names, params_values)])
-        
-        if cursor:
-            params += f"&cursor={cursor}"
-        
         try:
-            url = Config.CROSSREF_API_BASE_URL + params
-            logger.debug(f"Request: {url}")
+            # Respeita o ritmo global (compartilhado por todos os prefixes em coleta)
+            limiter.acquire()
+            logger.debug(f"Request: {Config.CROSSREF_API_BASE_URL} {params}")
             
-            response = requests.get(url, timeout=Config.REQUEST_TIMEOUT)
+            response = session.get(Config.CROSSREF_API_BASE_URL, params=params, timeout=Config.REQUEST_TIMEOUT)
             
             # Tratamento de erro 429 (Rate Limit Exceeded)
             if response.status_code == 429:
@@ -74,11 +169,11 @@ def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_pro
                 
                 if retry_count < max_retries:
                     retry_count += 1
-                    time.sleep(retry_after)
+                    limiter.backoff(retry_after)
                     continue  # Tentar novamente a mesma requisição
                 else:
                     logger.error(f"Limite de retries atingido para {prefix} após {max_retries} tentativas")
-                    break
+                    raise CrossrefAPIError(f"Rate limit persistente para {prefix}")
             
             # Outros erros HTTP
             if response.status_code != 200:
@@ -91,45 +186,26 @@ def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_pro
                         logger.warning(f"Erro do servidor. Aguardando {wait_time}s antes de tentar novamente...")
                         time.sleep(wait_time)
                         continue
-                break
+                raise CrossrefAPIError(f"HTTP {response.status_code} ao coletar {prefix}")
             
-            # Sucesso - resetar contador de retries
-            retry_count = 0
-            
-            # Ler headers de rate limit para monitoramento
+            # Ajustar o limitador aos headers de rate limit
             rate_limit = response.headers.get('x-rate-limit-limit')
             rate_interval = response.headers.get('x-rate-limit-interval')
             rate_remaining = response.headers.get('x-rate-limit-remaining')
+            limiter.update_from_headers(response.headers)
             
             if rate_limit and rate_interval:
-                logger.debug(f"Rate limit: {rate_limit} req/{rate_interval}s")
+                logger.debug(f"Rate limit: {rate_limit} req/{rate_interval} (coletando a {limiter.rate:.1f} req/s)")
                 if rate_remaining:
                     remaining = int(rate_remaining)
                     if remaining < 10:
                         logger.warning(f"Atenção: Apenas {remaining} requisições restantes no intervalo atual")
             
-            data = response.json()
-            batch = data.get("message", {}).get("events", [])
-            
-            if not batch:
-                break
-            
-            events.extend(batch)
-            cursor = data.get("message", {}).get("next-cursor")
-            
-            iteration += 1
-            logger.info(f"Prefix {prefix}: coletados {len(batch)} eventos (iteração {iteration})")
+            return response.json().get("message", {})
             
-            if show_progress:
-                print(f"    [{iteration}] {len(batch)} eventos", end='', flush=True)
-            
-            if not cursor:
-                break
-            
-            # Delay entre requisições (respeitando rate limits)
-            time.sleep(Config.CROSSREF_REQUEST_DELAY)
-            
-        except requests.exceptions.Timeout:
+        except CrossrefAPIError:
+            raise
+        except requests.exceptions.Timeout as e:
             logger.error(f"Timeout ao coletar eventos para {prefix}")
             if retry_count < max_retries:
                 retry_count += 1
@@ -137,7 +213,7 @@ def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_pro
                 logger.warning(f"Aguardando {wait_time}s antes de tentar novamente...")
                 time.sleep(wait_time)
                 continue
-            break
+            raise CrossrefAPIError(f"Timeout persistente ao coletar {prefix}") from e
         except Exception as e:
             logger.error(f"Erro ao coletar eventos para {prefix}: {e}")
             if retry_count < max_retries:
@@ -146,7 +222,79 @@ def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_pro
                 logger.warning(f"Erro inesperado. Aguardando {wait_time}s antes de tentar novamente...")
                 time.sleep(wait_time)
                 continue
+            raise CrossrefAPIError(f"Erro persistente ao coletar {prefix}: {e}") from e
+
+
+def iter_event_pages(
+    prefix: str,
+    since: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None,
+    cursor: Optional[str] = None,
+    window: Optional[Tuple[str, str]] = None
+) -> Iterator[Tuple[List[dict], Optional[str]]]:
+    """
+    Percorre as páginas de eventos de um prefix (ou de uma janela de datas dele)
+
+    Gera (eventos da página, next-cursor); cursor retoma a partir de uma página já confirmada.
+    Levanta CrossrefAPIError quando desiste de uma página.
+    """
+    session = session or create_session(1)
+    limiter = limiter or RateLimiter(1.0 / Config.CROSSREF_REQUEST_DELAY)
+    base_params = _query_params(prefix, since, window)
+    iteration = 0
+    
+    while True:
+        params = dict(base_params)
+        
+        if cursor:
+            params["cursor"] = cursor
+        
+        message = _fetch_page(prefix, params, session, limiter)
+        batch = message.get("events", [])
+        
+        if not batch:
+            break
+        
+        cursor = message.get("next-cursor")
+        
+        iteration += 1
+        logger.info(f"Prefix {prefix}: coletados {len(batch)} eventos (iteração {iteration})")
+        yield batch, cursor
+        
+        if not cursor:
             break
+
+
+def probe_total(
+    prefix: str,
+    since: Optional[str] = None,
+    window: Optional[Tuple[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None
+) -> int:
+    """Total de eventos da consulta (requisição com rows=0, sem baixar eventos)"""
+    session = session or create_session(1)
+    limiter = limiter or RateLimiter(1.0 / Config.CROSSREF_REQUEST_DELAY)
+    params = _query_params(prefix, since, window)
+    params["rows"] = "0"
+    return int(_fetch_page(prefix, params, session, limiter).get("total-results", 0))
+
+
+def collect_events_for_prefix(
+    prefix: str,
+    since: Optional[str] = None,
+    show_progress: bool = False,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None
+) -> List[dict]:
+    """Coleta todos os eventos de um prefix em memória (uso pontual; a coleta grava em streaming)"""
+    events = []
+    
+    for iteration, (batch, _) in enumerate(iter_event_pages(prefix, since, session, limiter), start=1):
+        events.extend(batch)
+        if show_progress:
+            print(f"    [{iteration}] {len(batch)} eventos", end='', flush=True)
     
     if show_progress and events:
         print(f" → Total: {len(events):,} eventos ✓")
@@ -156,26 +304,343 @@ def collect_events_for_prefix(prefix: str, since: Optional[str] = None, show_pro
     return events
 
 
+class RawEventWriter:
+    """
+    Grava as páginas de um prefix em parquet à medida que chegam (um row group por página)
+
+    Cada página é convertida para RAW_EVENT_SCHEMA, então a memória fica limitada a uma
+    página. Os eventos vão para segmentos p<prefix>_<data>_<n>.parquet: cada segmento é
+    escrito como .part e só ganha o nome final em commit(), o ponto em que o cursor da
+    coleta pode ser registrado no checkpoint. Janelas de datas de um prefix grande usam
+    p<prefix>_<data>_w<início>-<fim>_<n>.parquet, somando-se aos arquivos do prefix.
+    """
+
+    def __init__(self, prefix: str, collection_date: Optional[str] = None,
+                 segment: int = 0, rows: int = 0, row_groups: int = 0,
+                 window: Optional[Tuple[str, str]] = None):
+        self.prefix = prefix
+        self.collection_date = collection_date or datetime.today().strftime('%Y-%m-%d')
+        self.window = window
+        self.segment = segment
+        self.rows = rows
+        self.row_groups = row_groups
+        self._writer = None
+
+    @property
+    def stem(self) -> str:
+        stem = f"p{self.prefix.replace('.', '_')}_{self.collection_date}"
+        if self.window:
+            stem += f"_w{self.window[0].replace('-', '')}-{self.window[1].replace('-', '')}"
+        return stem
+
+    def segment_path(self, segment: int) -> Path:
+        return Config.CROSSREF_RAW_DIR / f"{self.stem}_{segment:04d}.parquet"
+
+    @property
+    def part_path(self) -> Path:
+        path = self.segment_path(self.segment)
+        return path.with_name(path.name + '.part')
+
+    def write_page(self, events: List[dict]):
+        if not events:
+            return
+        if self._writer is None:
+            Config.CROSSREF_RAW_DIR.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.part_path, RAW_EVENT_SCHEMA, **parquet_writer_options('raw'))
+        # Campos fora do schema são descartados; ausentes viram nulos
+        self._writer.write_table(pa.Table.from_pylist(events, schema=RAW_EVENT_SCHEMA))
+        self.rows += len(events)
+        self.row_groups += 1
+
+    def commit(self) -> Optional[Path]:
+        """Fecha o segmento atual (grava o rodapé), força a escrita em disco e o renomeia atomicamente"""
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+
+        part_path, path = self.part_path, self.segment_path(self.segment)
+        with open(part_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(part_path, path)
+        self.segment += 1
+        return path
+
+    def close(self) -> Optional[Path]:
+        """Confirma o último segmento; None se não havia eventos pendentes"""
+        return self.commit()
+
+    def abort(self):
+        """Descarta o segmento não confirmado (sem rodapé ele não é legível)"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.part_path.unlink(missing_ok=True)
+
+    def discard_segments(self, keep: int = 0):
+        """
+        Remove segmentos (e .part) desta coleta a partir do índice keep
+
+        Só nomes <stem>_<n>.parquet[.part]: as janelas (<stem>_w...) da mesma data têm o
+        stem do prefix como início do nome e não são segmentos desta coleta.
+        """
+        pattern = re.compile(rf"{re.escape(self.stem)}_(\d+)\.parquet(\.part)?")
+        for path in Config.CROSSREF_RAW_DIR.glob(f"{self.stem}_*.parquet*"):
+            match = pattern.fullmatch(path.name)
+            if match and int(match.group(1)) >= keep:
+                path.unlink(missing_ok=True)
+
+    def confirmed_row_groups(self) -> Optional[int]:
+        """Row groups dos segmentos confirmados (None se algum segmento sumiu ou está ilegível)"""
+        total = 0
+        for segment in range(self.segment):
+            try:
+                total += pq.ParquetFile(self.segment_path(segment)).metadata.num_row_groups
+            except (OSError, pa.ArrowInvalid):
+                return None
+        return total
+
+
+def _resume_writer(prefix: str, checkpoint: dict,
+                   window: Optional[Tuple[str, str]] = None) -> Optional[RawEventWriter]:
+    """Writer posicionado após o último segmento confirmado, se os arquivos batem com o checkpoint"""
+    writer = RawEventWriter(
+        prefix,
+        checkpoint['collection_date'],
+        segment=checkpoint['segments'],
+        rows=checkpoint['rows'],
+        row_groups=checkpoint['row_groups'],
+        window=window
+    )
+    written = writer.confirmed_row_groups()
+    if written != checkpoint['row_groups']:
+        logger.warning(
+            f"Prefix {prefix}: checkpoint aponta {checkpoint['row_groups']} row groups, "
+            f"encontrados {written}; coleta reiniciada"
+        )
+        return None
+
+    # Segmentos confirmados depois do último checkpoint são refeitos a partir do cursor
+    writer.discard_segments(keep=writer.segment)
+    return writer
+
+
+def collect_prefix_to_parquet(
+    prefix: str,
+    since: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None,
+    state: Optional[CollectionStateStore] = None,
+    window: Optional[Tuple[str, str]] = None,
+    collection_date: Optional[str] = None
+) -> Tuple[int, str]:
+    """
+    Coleta um prefix gravando cada página no parquet bruto; retorna (eventos, data da coleta)
+
+    A cada CROSSREF_CHECKPOINT_PAGES páginas o segmento é confirmado e o next-cursor
+    registrado no checkpoint do prefix. Uma coleta interrompida (falha, erro da API ou
+    processo morto) é retomada da última página confirmada na próxima execução.
+    Com window, coleta apenas a janela de datas (occurred) de um prefix grande.
+    """
+    state = state or CollectionStateStore()
+    source, key = (WINDOW_SOURCE, _window_key(prefix, window)) if window else (SOURCE, prefix)
+    checkpoint = state.load_checkpoint(source, key)
+    writer = _resume_writer(prefix, checkpoint, window) if checkpoint else None
+    cursor = None
+
+    if writer:
+        since, cursor = checkpoint['since'], checkpoint['cursor']
+        logger.info(f"Prefix {key}: retomando após {writer.row_groups} páginas ({writer.rows} eventos)")
+    else:
+        writer = RawEventWriter(prefix, collection_date, window=window)
+        # Sobras de uma coleta anterior no mesmo dia seriam duplicadas
+        writer.discard_segments()
+        state.clear_checkpoint(source, key)
+
+    pages = 0
+    try:
+        for batch, next_cursor in iter_event_pages(prefix, since, session, limiter, cursor, window):
+            writer.write_page(batch)
+            pages += 1
+            if next_cursor and pages % Config.CROSSREF_CHECKPOINT_PAGES == 0:
+                writer.commit()
+                state.save_checkpoint(source, key, next_cursor, {
+                    'since': since,
+                    'collection_date': writer.collection_date,
+                    'segments': writer.segment,
+                    'row_groups': writer.row_groups,
+                    'rows': writer.rows,
+                })
+    except BaseException:
+        writer.abort()
+        raise
+
+    writer.close()
+    if window:
+        # A conclusão da janela fica registrada no plano do prefix
+        state.delete(source, key)
+    if writer.rows:
+        logger.info(f"Salvos {writer.rows} eventos de {key} em {writer.segment} segmento(s) "
+                    f"({writer.row_groups} row groups)")
+    return writer.rows, writer.collection_date
+
+
+def observed_span_days(prefix: str, collection_date: str) -> Optional[float]:
+    """
+    Dias entre o evento mais antigo (occurred_at) dos arquivos da coleta e a data da coleta
+
+    Base da taxa inicial do prefix: a primeira coleta traz o histórico inteiro, então a
+    taxa é o total sobre o período observado, não um lote tratado como alguns dias.
+    """
+    oldest = None
+    for path in Config.CROSSREF_RAW_DIR.glob(f"{RawEventWriter(prefix, collection_date).stem}_*.parquet"):
+        try:
+            value = pc.min(pq.read_table(path, columns=['occurred_at']).column('occurred_at')).as_py()
+        except (OSError, pa.ArrowInvalid, KeyError) as e:
+            logger.warning(f"Prefix {prefix}: occurred_at ilegível em {path.name}: {e}")
+            continue
+        if value and (oldest is None or value < oldest):
+            oldest = value
+    if not oldest:
+        return None
+    try:
+        first_day = date.fromisoformat(oldest[:10])
+    except ValueError:
+        return None
+    return max((date.fromisoformat(collection_date) - first_day).days, 1)
+
+
+def _window_key(prefix: str, window: Tuple[str, str]) -> str:
+    return f"{prefix}@{window[0]}..{window[1]}"
+
+
+def split_windows(
+    prefix: str,
+    since: Optional[str],
+    total: int,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None,
+    probes: Optional[ThreadPoolExecutor] = None
+) -> List[Tuple[str, str]]:
+    """
+    Divide o período do prefix em janelas de datas (occurred) com até CROSSREF_SHARD_EVENTS eventos
+
+    O tamanho das janelas segue a densidade observada: cada intervalo é repartido em
+    ceil(eventos / alvo) pedaços iguais, e só os pedaços ainda grandes demais (medidos por
+    probe_total, em paralelo a cada nível) são repartidos de novo. Intervalos sem eventos
+    são descartados.
+
+    probes: pool das sondagens compartilhado pelos planos de todos os prefixes (em
+    collect_all_events); sem ele, um pool próprio de CROSSREF_WORKERS threads.
+    """
+    if probes is None:
+        with ThreadPoolExecutor(max_workers=Config.CROSSREF_WORKERS) as own_probes:
+            return split_windows(prefix, since, total, session, limiter, own_probes)
+
+    target = Config.CROSSREF_SHARD_EVENTS
+    level = [(date.fromisoformat(Config.CROSSREF_SHARD_START_DATE), date.today() + timedelta(days=1), total)]
+    windows = []
+
+    while level:
+        pieces_to_probe = []
+        for first, last, count in level:
+            if count == 0:
+                continue
+            days = (last - first).days + 1
+            if count <= target or days == 1:
+                windows.append((first.isoformat(), last.isoformat()))
+                continue
+
+            pieces = min(-(-count // target), days)
+            step = days / pieces
+            for i in range(pieces):
+                start = first + timedelta(days=int(i * step))
+                end = first + timedelta(days=int((i + 1) * step) - 1) if i < pieces - 1 else last
+                pieces_to_probe.append((start, end))
+
+        counts = probes.map(
+            lambda piece: probe_total(prefix, since, (piece[0].isoformat(), piece[1].isoformat()),
+                                      session, limiter),
+            pieces_to_probe
+        )
+        level = [(start, end, count) for (start, end), count in zip(pieces_to_probe, counts)]
+
+    return sorted(windows)
+
+
+def plan_prefix(
+    prefix: str,
+    since: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    limiter: Optional[RateLimiter] = None,
+    state: Optional[CollectionStateStore] = None,
+    probes: Optional[ThreadPoolExecutor] = None
+) -> Tuple[Optional[str], Optional[str], List[Optional[Tuple[str, str]]]]:
+    """
+    Decide como coletar o prefix: retorna (since, data da coleta, janelas pendentes)
+
+    [None] significa um único cursor sobre o prefix inteiro. Prefixes sem histórico ou com
+    muitos eventos na última coleta são medidos (probe_total); acima de CROSSREF_SHARD_EVENTS
+    são divididos em janelas coletadas em paralelo. O plano fica no checkpoint do prefix,
+    e uma coleta interrompida retoma só as janelas que faltam.
+    """
+    state = state or CollectionStateStore()
+    checkpoint = state.load_checkpoint(SOURCE, prefix)
+    if checkpoint and 'windows' in checkpoint:
+        done = {tuple(window) for window in checkpoint['done']}
+        remaining = [tuple(window) for window in checkpoint['windows'] if tuple(window) not in done]
+        return checkpoint['since'], checkpoint['collection_date'], remaining
+
+    history = state.get(SOURCE, prefix)
+    is_large = not history or not history['last_date'] or history['last_events'] >= Config.CROSSREF_SHARD_EVENTS
+    if checkpoint or Config.CROSSREF_SHARD_EVENTS <= 0 or not is_large:
+        return since, None, [None]
+
+    total = probe_total(prefix, since, session=session, limiter=limiter)
+    if total <= Config.CROSSREF_SHARD_EVENTS:
+        return since, None, [None]
+
+    windows = split_windows(prefix, since, total, session, limiter, probes)
+    collection_date = datetime.today().strftime('%Y-%m-%d')
+    # Plano novo: descarta os segmentos de uma coleta sem janelas do mesmo dia (arquivos de
+    # janelas já gravados ficam; eventos repetidos saem no índice de deduplicação)
+    RawEventWriter(prefix, collection_date).discard_segments()
+    state.save_checkpoint(SOURCE, prefix, None, {
+        'since': since,
+        'collection_date': collection_date,
+        'windows': windows,
+        'done': [],
+        'rows': 0,
+    })
+    logger.info(f"Prefix {prefix}: {total:,} eventos divididos em {len(windows)} janelas de datas")
+    return since, collection_date, windows
+
+
+def _complete_window(state: CollectionStateStore, prefix: str, window: Tuple[str, str], rows: int) -> dict:
+    """Marca a janela como concluída no plano do prefix; retorna o checkpoint atualizado"""
+    checkpoint = state.load_checkpoint(SOURCE, prefix)
+    checkpoint.pop('cursor', None)
+    checkpoint['done'].append(list(window))
+    checkpoint['rows'] += rows
+    state.save_checkpoint(SOURCE, prefix, None, checkpoint)
+    return checkpoint
+
+
 def save_raw_events(events: List[dict], prefix: str):
-    """Salva eventos brutos em Parquet usando json_normalize"""
-    Config.CROSSREF_RAW_DIR.mkdir(parents=True, exist_ok=True)
-    
+    """Salva eventos brutos (já em memória) em Parquet com o schema fixo RAW_EVENT_SCHEMA"""
     if not events:
         logger.warning(f"Nenhum evento para salvar para prefix {prefix}")
         return
     
-    # Normalizar JSON (como no código legado)
-    events_table = pd.json_normalize(events)
+    writer = RawEventWriter(prefix)
+    writer.discard_segments()
+    for start in range(0, len(events), Config.CROSSREF_ROWS_PER_REQUEST):
+        writer.write_page(events[start:start + Config.CROSSREF_ROWS_PER_REQUEST])
+    filepath = writer.close()
     
-    current_date = datetime.today().strftime('%Y-%m-%d')
-    filename = f"p{prefix.replace('.', '_')}_{current_date}.parquet"
-    filepath = Config.CROSSREF_RAW_DIR / filename
-    
-    events_table.to_parquet(filepath, index=False)
-    
-    # Registrar coleta no log
-    with open(Config.CROSSREF_COLLECTION_LOG, 'a') as f:
-        f.write(f"{prefix},{current_date}\n")
+    # Registrar coleta (base da coleta incremental)
+    with CollectionStateStore() as state:
+        state.record_collection(SOURCE, prefix, writer.collection_date, len(events))
     
     logger.info(f"Salvos {len(events)} eventos em {filepath}")
 
@@ -204,12 +669,33 @@ def load_prefixes() -> List[str]:
     return prefixes
 
 
-def collect_all_events(prefixes: Optional[List[str]] = None):
-    """Coleta eventos para todos os prefixes"""
+def collect_all_events(prefixes: Optional[List[str]] = None, workers: Optional[int] = None,
+                       schedule: Optional[bool] = None):
+    """
+    Coleta eventos para todos os prefixes (CROSSREF_WORKERS prefixes em paralelo)
+    
+    Com schedule (padrão quando prefixes não é informado e CROSSREF_ADAPTIVE_POLLING está
+    ativo), só entram os prefixes vencidos pelo PollingScheduler, dentro do orçamento de
+    requisições CROSSREF_REQUEST_BUDGET.
+    """
+    if schedule is None:
+        schedule = prefixes is None and Config.CROSSREF_ADAPTIVE_POLLING
     if prefixes is None:
         prefixes = load_prefixes()
     
-    last_collection = read_last_collection()
+    state = CollectionStateStore()
+    since_by_prefix = read_last_collection(state)
+    
+    plan = None
+    if schedule:
+        plan = PollingScheduler().plan(prefixes, state.all(SOURCE))
+        prefixes = plan['selected']
+    
+    workers = workers or Config.CROSSREF_WORKERS
+    # Conexões das threads de coleta e do pool de sondagens dos planos
+    session = create_session(2 * workers)
+    limiter = RateLimiter(1.0 / Config.CROSSREF_REQUEST_DELAY)
+    started = time.monotonic()
     
     total_prefixes = len(prefixes)
     total_events = 0
@@ -222,34 +708,58 @@ def collect_all_events(prefixes: Optional[List[str]] = None):
     print(f"{'='*70}")
     print(f"Total de prefixes: {total_prefixes:,}")
     print(f"Diretório de saída: {Config.CROSSREF_RAW_DIR}")
+    print(f"Prefixes em paralelo: {workers}")
+    if plan is not None:
+        budget = Config.CROSSREF_REQUEST_BUDGET
+        print(f"Agendamento adaptativo: {len(plan['not_due']):,} prefixes fora do intervalo, "
+              f"{len(plan['over_budget']):,} acima do orçamento "
+              f"({f'{budget:,} requisições' if budget else 'sem limite'})")
+    resumable = state.pending_checkpoints(SOURCE)
+    if resumable:
+        print(f"Coletas interrompidas a retomar: {resumable}")
     
-    if not last_collection.empty:
-        incremental_count = len(last_collection)
+    if since_by_prefix:
+        incremental_count = len(since_by_prefix)
         print(f"Coleta incremental: Sim ({incremental_count} prefixes com histórico)")
     else:
         print(f"Coleta incremental: Não (primeira coleta)")
     
     print(f"{'='*70}\n")
     
-    # Barra de progresso geral
-    with tqdm(total=total_prefixes, desc="Progresso", unit="prefix", ncols=100) as pbar:
-        for prefix in prefixes:
-            pbar.set_description(f"Processando {prefix}")
-            
-            logger.info(f"Iniciando coleta para prefix: {prefix}")
-            
-            # Verificar se há coleta anterior
-            since = None
-            if not last_collection.empty and prefix in last_collection['prefix'].values:
-                since = last_collection[last_collection['prefix'] == prefix]['last_date'].iloc[0]
-                logger.info(f"Coleta incremental desde: {since}")
+    # Barra de progresso geral; cada thread grava os arquivos do seu prefix (ou janela)
+    # e a thread principal registra as coletas concluídas no CollectionStateStore
+    # Sondagens dos planos (split_windows) num pool à parte, compartilhado pelos prefixes:
+    # no pool dos prefixes elas esperariam atrás dos próprios planos que as aguardam, e um
+    # pool por plano chegaria a workers² threads
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe') as probes, \
+            tqdm(total=total_prefixes, desc="Progresso", unit="prefix", ncols=100) as pbar:
+        running = {}
+        # Prefixes divididos em janelas: janelas pendentes e falhas
+        sharded = {}
+        
+        def finish(prefix: str, collected: int = 0, collection_date: Optional[str] = None,
+                   error: Optional[BaseException] = None):
+            nonlocal total_events, successful_prefixes, empty_prefixes, failed_prefixes
+            pbar.set_description(f"Concluído {prefix}")
             
-            try:
-                events = collect_events_for_prefix(prefix, since, show_progress=True)
+            if error is not None:
+                logger.error(f"Erro ao coletar {prefix}: {error}", exc_info=error)
+                failed_prefixes += 1
+                pbar.set_postfix({
+                    'eventos': f"{total_events:,}",
+                    'erros': failed_prefixes
+                })
+            else:
+                # Coleta completa (inclusive sem eventos): nova data base e checkpoint descartado;
+                # na primeira, a taxa inicial vem do período coberto pelos eventos
+                span_days = None
+                if collected and prefix not in since_by_prefix:
+                    span_days = observed_span_days(prefix, collection_date)
+                state.record_collection(SOURCE, prefix, collection_date, collected, span_days)
                 
-                if events:
-                    save_raw_events(events, prefix)
-                    total_events += len(events)
+                if collected:
+                    total_events += collected
                     successful_prefixes += 1
                     pbar.set_postfix({
                         'eventos': f"{total_events:,}",
@@ -262,15 +772,62 @@ def collect_all_events(prefixes: Optional[List[str]] = None):
                         'eventos': f"{total_events:,}",
                         'vazios': empty_prefixes
                     })
-            except Exception as e:
-                logger.error(f"Erro ao coletar {prefix}: {e}", exc_info=True)
-                failed_prefixes += 1
-                pbar.set_postfix({
-                    'eventos': f"{total_events:,}",
-                    'erros': failed_prefixes
-                })
             
             pbar.update(1)
+        
+        for prefix in prefixes:
+            since = since_by_prefix.get(prefix)
+            if since:
+                logger.info(f"Prefix {prefix}: coleta incremental desde {since}")
+            future = executor.submit(plan_prefix, prefix, since, session, limiter, state, probes)
+            running[future] = (prefix, 'plan')
+        
+        while running:
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                prefix, task = running.pop(future)
+                
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if task in ('plan', None):
+                        finish(prefix, error=e)
+                    else:
+                        shard = sharded[prefix]
+                        shard['pending'] -= 1
+                        shard['error'] = e
+                        if not shard['pending']:
+                            finish(prefix, error=shard['error'])
+                    continue
+                
+                if task == 'plan':
+                    since, collection_date, windows = result
+                    if windows == [None]:
+                        future = executor.submit(collect_prefix_to_parquet, prefix, since, session, limiter, state)
+                        running[future] = (prefix, None)
+                    elif not windows:
+                        # Todas as janelas já concluídas (interrupção antes do registro)
+                        finish(prefix, state.load_checkpoint(SOURCE, prefix)['rows'], collection_date)
+                    else:
+                        sharded[prefix] = {'pending': len(windows), 'error': None}
+                        for window in windows:
+                            future = executor.submit(collect_prefix_to_parquet, prefix, since, session, limiter,
+                                                     state, window, collection_date)
+                            running[future] = (prefix, window)
+                elif task is None:
+                    finish(prefix, *result)
+                else:
+                    collected, collection_date = result
+                    checkpoint = _complete_window(state, prefix, task, collected)
+                    shard = sharded[prefix]
+                    shard['pending'] -= 1
+                    if not shard['pending']:
+                        if shard['error'] is None:
+                            finish(prefix, checkpoint['rows'], collection_date)
+                        else:
+                            finish(prefix, error=shard['error'])
+    
+    state.close()
     
     # Resumo final
     print(f"\n{'='*70}")
@@ -281,6 +838,9 @@ def collect_all_events(prefixes: Optional[List[str]] = None):
     print(f"  ⚠ Sem eventos: {empty_prefixes:,}")
     print(f"  ✗ Com erros: {failed_prefixes:,}")
     print(f"\nTotal de eventos coletados: {total_events:,}")
+    elapsed = time.monotonic() - started
+    print(f"Requisições: {limiter.requests:,} em {elapsed:.0f}s "
+          f"({limiter.requests / max(elapsed, 1e-9):.1f} req/s, {limiter.throttled} respostas 429)")
     print(f"Arquivos salvos em: {Config.CROSSREF_RAW_DIR}")
     print(f"{'='*70}\n")
 
@@ -9,11 +9,16 @@ Versão: 1.0 Interactive
 
 import os
 import sys
+import json
+import base64
+import hashlib
 import logging
 import shutil
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 import requests
@@ -27,6 +32,14 @@ try:
 except ImportError:
     HAS_COLORLOG = False
 
+# google-crc32c (requirements.txt) verifica objetos sem md5Hash (objetos compostos);
+# sem ele esses downloads falham em vez de serem aceitos sem verificação
+try:
+    import google_crc32c
+    HAS_CRC32C = True
+except ImportError:
+    HAS_CRC32C = False
+
 # Importação condicional de pymysql (apenas se MySQL estiver habilitado)
 try:
     import pymysql
@@ -56,7 +69,8 @@ try:
 except ImportError:
     HAS_BORI_SCRIPTS = False
 
-from config import Config, EXPECTED_TABLES
+from config import Config, EXPECTED_TABLES, EXPECTED_SCHEMAS, SURROGATE_KEYS
+from parquet_layout import copy_options
 
 
 # ========================================
@@ -176,32 +190,73 @@ def confirm_action(message: str) -> bool:
 # Download de Arquivos do GCS
 # ========================================
 
+class IncompleteDownloadError(requests.exceptions.RequestException):
+    """Conexão encerrada antes do fim do objeto (o .part é retomado no próximo retry)"""
+
+
+class ChecksumMismatchError(requests.exceptions.RequestException):
+    """Hash do arquivo baixado difere do objeto no GCS (o .part é descartado)"""
+
+
+class ChecksumUnavailableError(Exception):
+    """Objeto sem hash verificável neste ambiente (sem retry: o .part é mantido)"""
+
+
+class GenerationChangedError(Exception):
+    """Objeto substituído no bucket depois da listagem (sem retry: refeito na próxima execução)"""
+
+
 class GCSDownloader:
     """Classe para download de arquivos do Google Cloud Storage público"""
 
-    def __init__(self):
-        self.base_url = f"https://storage.googleapis.com/storage/v1/b/{Config.GCS_BUCKET_NAME}/o"
+    def __init__(self, workers: Optional[int] = None):
+        self.base_url = f"{Config.GCS_API_BASE_URL}/b/{Config.GCS_BUCKET_NAME}/o"
+        self.download_base_url = f"{Config.GCS_DOWNLOAD_BASE_URL}/{Config.GCS_BUCKET_NAME}"
         self.download_path = Path(Config.LOCAL_DOWNLOAD_PATH)
         self.download_path.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or Config.DOWNLOAD_WORKERS
+
+        # Sessão compartilhada entre as threads: reaproveita conexões TCP/TLS com o GCS
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     @retry(
         stop=stop_after_attempt(Config.MAX_RETRIES),
         wait=wait_exponential(multiplier=Config.RETRY_BACKOFF),
         retry=retry_if_exception_type(requests.exceptions.RequestException)
     )
+    def _list_page(self, params: Dict) -> Dict:
+        """Busca uma página da listagem de objetos do bucket"""
+        response = self.session.get(self.base_url, params=params, timeout=Config.REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
     def list_parquet_files(self) -> List[Dict]:
-        """Lista todos os arquivos .parquet no bucket"""
+        """Lista todos os arquivos .parquet no bucket (seguindo nextPageToken)"""
         logger.info(f"Listando arquivos em gs://{Config.GCS_BUCKET_NAME}/{Config.GCS_FOLDER_PREFIX}...")
 
-        params = {}
+        params = {
+            'maxResults': Config.GCS_PAGE_SIZE,
+            'fields': 'items(name,size,generation,md5Hash,crc32c),nextPageToken',
+        }
         if Config.GCS_FOLDER_PREFIX:
             params['prefix'] = Config.GCS_FOLDER_PREFIX
 
-        response = requests.get(self.base_url, params=params, timeout=Config.REQUEST_TIMEOUT)
-        response.raise_for_status()
+        items = []
+        pages = 0
+        while True:
+            data = self._list_page(params)
+            items.extend(data.get('items', []))
+            pages += 1
+
+            page_token = data.get('nextPageToken')
+            if not page_token:
+                break
+            params['pageToken'] = page_token
 
-        data = response.json()
-        items = data.get('items', [])
+        logger.debug(f"Listagem: {len(items)} objetos em {pages} página(s)")
 
         parquet_files = [
             item for item in items
@@ -216,33 +271,210 @@ class GCSDownloader:
         wait=wait_exponential(multiplier=Config.RETRY_BACKOFF),
         retry=retry_if_exception_type(requests.exceptions.RequestException)
     )
-    def download_file(self, file_name: str, show_progress: bool = True) -> Path:
-        """Baixa um arquivo do GCS"""
-        download_url = f"https://storage.googleapis.com/{Config.GCS_BUCKET_NAME}/{file_name}"
+    def download_file(
+        self,
+        file_name: str,
+        show_progress: bool = True,
+        on_chunk=None,
+        force: bool = False,
+        expected_md5: Optional[str] = None,
+        expected_size: Optional[int] = None,
+        expected_crc32c: Optional[str] = None,
+        validator: Optional['ParquetFooterValidator'] = None,
+        generation: Optional[str] = None
+    ) -> Path:
+        """
+        Baixa um arquivo do GCS
+
+        O download é gravado em <arquivo>.<generation>.part e retomado com HTTP Range após falhas
+        (o retry reaproveita o que já foi baixado). Ao final, o .part é conferido contra
+        o md5/crc32c do objeto e renomeado atomicamente para o nome definitivo.
+
+        on_chunk: callback chamado com o número de bytes de cada chunk (progresso agregado)
+        force: baixa novamente mesmo que o arquivo já exista (objeto alterado no bucket)
+        expected_md5 / expected_crc32c: hashes em base64 da listagem do GCS
+        expected_size: tamanho do objeto em bytes
+        validator: confere o rodapé do .part antes do rename; reprovado vai para a
+        quarentena (ValueError) e o arquivo anterior, se houver, continua no lugar
+        generation: generation do objeto na listagem; todo request (inclusive a retomada
+        com Range) exige essa generation (x-goog-if-generation-match) e o .part leva a
+        generation no nome, então bytes de versões diferentes do objeto nunca se misturam
+        """
+        download_url = f"{self.download_base_url}/{file_name}"
         destination = self.download_path / Path(file_name).name
+        part_file = self.part_path(destination, generation)
 
-        if destination.exists():
+        if destination.exists() and not force:
             logger.debug(f"Arquivo já existe: {destination.name}")
             return destination
 
-        logger.debug(f"Baixando {file_name}...")
+        # .part de outras generations do objeto (substituído no bucket desde a tentativa anterior)
+        for stale in destination.parent.glob(f"{destination.name}.*part"):
+            if stale != part_file:
+                stale.unlink(missing_ok=True)
 
-        response = requests.get(download_url, stream=True, timeout=Config.REQUEST_TIMEOUT)
-        response.raise_for_status()
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        if expected_size is not None and offset > expected_size:
+            part_file.unlink()
+            offset = 0
+
+        if expected_size is None or offset < expected_size:
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            if generation:
+                headers['x-goog-if-generation-match'] = str(generation)
+            if offset:
+                logger.info(f"Retomando {destination.name} a partir de {offset / (1024 * 1024):.2f} MB")
+            else:
+                logger.debug(f"Baixando {file_name}...")
+
+            with self.session.get(download_url, stream=True, headers=headers,
+                                  timeout=Config.REQUEST_TIMEOUT) as response:
+                if response.status_code == 416:
+                    # Range fora do objeto: o .part já está completo (ou inválido, o hash decide)
+                    response.close()
+                elif response.status_code == 412:
+                    # Objeto substituído depois da listagem: o .part é de outra versão
+                    part_file.unlink(missing_ok=True)
+                    raise GenerationChangedError(
+                        f"{destination.name}: generation {generation} não é mais a atual no GCS"
+                    )
+                else:
+                    response.raise_for_status()
 
-        total_size = int(response.headers.get('content-length', 0))
+                    # 200 = servidor ignorou o Range: recomeça do zero
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    if mode == 'wb':
+                        offset = 0
 
-        with open(destination, 'wb') as f:
+                    total_size = offset + int(response.headers.get('content-length', 0))
+                    self._write_stream(response, part_file, mode, destination.name,
+                                       show_progress, on_chunk, offset, total_size)
+
+        self._verify_download(part_file, expected_md5, expected_size, expected_crc32c)
+        if validator is not None:
+            validator.check_part(part_file, destination)
+        os.replace(part_file, destination)
+        return destination
+
+    @staticmethod
+    def part_path(destination: Path, generation: Optional[str] = None) -> Path:
+        """<arquivo>.<generation>.part (ou <arquivo>.part sem generation)"""
+        suffix = f".{generation}.part" if generation else '.part'
+        return destination.with_name(destination.name + suffix)
+
+    def _write_stream(self, response, part_file: Path, mode: str, name: str,
+                      show_progress: bool, on_chunk, offset: int, total_size: int):
+        """Grava o corpo da resposta no .part em blocos de DOWNLOAD_CHUNK_SIZE"""
+        with open(part_file, mode, buffering=Config.DOWNLOAD_CHUNK_SIZE) as f:
             if show_progress and total_size > 0:
-                with tqdm(total=total_size, unit='B', unit_scale=True, desc=destination.name) as pbar:
+                with tqdm(total=total_size, initial=offset, unit='B', unit_scale=True, desc=name) as pbar:
                     for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
                         f.write(chunk)
                         pbar.update(len(chunk))
             else:
                 for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
                     f.write(chunk)
+                    if on_chunk:
+                        on_chunk(len(chunk))
+
+    def _verify_download(self, part_file: Path, expected_md5: Optional[str],
+                         expected_size: Optional[int], expected_crc32c: Optional[str]):
+        """
+        Confere tamanho e hash do .part
+
+        Download incompleto mantém o .part (o próximo retry continua de onde parou);
+        hash divergente descarta o .part (o próximo retry recomeça do zero). Sem md5 nem
+        crc32c verificável (google-crc32c ausente) o download falha: nada é aceito sem hash.
+        """
+        size = part_file.stat().st_size
+        if expected_size is not None and size < expected_size:
+            raise IncompleteDownloadError(
+                f"{part_file.name}: {size} de {expected_size} bytes recebidos"
+            )
 
-        return destination
+        if expected_md5:
+            digest = hashlib.md5()
+            expected, algorithm = expected_md5, 'md5'
+        elif expected_crc32c and HAS_CRC32C:
+            digest = google_crc32c.Checksum()
+            expected, algorithm = expected_crc32c, 'crc32c'
+        elif expected_crc32c:
+            raise ChecksumUnavailableError(
+                f"{part_file.name}: objeto sem md5Hash e google-crc32c não instalado "
+                f"(pip install -r requirements.txt)"
+            )
+        else:
+            raise ChecksumUnavailableError(f"{part_file.name}: objeto sem md5Hash nem crc32c na listagem")
+
+        with open(part_file, 'rb') as f:
+            for block in iter(lambda: f.read(Config.DOWNLOAD_CHUNK_SIZE), b''):
+                digest.update(block)
+        actual = base64.b64encode(digest.digest()).decode()
+
+        if actual != expected:
+            part_file.unlink()
+            raise ChecksumMismatchError(
+                f"{part_file.name}: {algorithm} {actual} difere do objeto no GCS ({expected})"
+            )
+
+    def download_many(self, files: List[Dict], force: bool = False, on_downloaded=None,
+                      validator: Optional['ParquetFooterValidator'] = None) -> Tuple[List[Path], List[str]]:
+        """
+        Baixa vários arquivos em paralelo (Config.DOWNLOAD_WORKERS threads)
+
+        Exibe uma barra de progresso agregada e registra a vazão média ao final.
+        on_downloaded: callback chamado com o Path de cada arquivo assim que ele termina.
+        validator: rodapé de cada .part conferido na thread do download, antes do rename
+        (reprovados entram nas falhas).
+        Retorna (arquivos baixados, nomes dos arquivos que falharam).
+        """
+        if not files:
+            return [], []
+
+        total_bytes = sum(int(f.get('size', 0)) for f in files)
+        # Bytes já presentes em .part de execuções anteriores (serão retomados)
+        resumed_bytes = sum(
+            part.stat().st_size for part in
+            (self.part_path(self.download_path / Path(f['name']).name, f.get('generation')) for f in files)
+            if part.exists()
+        )
+        downloaded, failed = [], []
+        start = time.time()
+
+        logger.info(f"Baixando {len(files)} arquivo(s) ({total_bytes / (1024 * 1024):.2f} MB) "
+                    f"com {self.workers} conexões simultâneas...")
+
+        with tqdm(total=total_bytes, initial=resumed_bytes, unit='B', unit_scale=True, desc="Download") as pbar, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(
+                    self.download_file, f['name'], False, pbar.update, force,
+                    f.get('md5Hash'), int(f['size']) if f.get('size') else None, f.get('crc32c'),
+                    validator, f.get('generation')
+                ): f['name']
+                for f in files
+            }
+            for future in as_completed(futures):
+                file_name = futures[future]
+                try:
+                    local_path = future.result()
+                except Exception as e:
+                    failed.append(file_name)
+                    logger.error(f"Erro ao baixar {file_name}: {e}")
+                    continue
+
+                downloaded.append(local_path)
+                if on_downloaded:
+                    on_downloaded(local_path)
+
+        elapsed = max(time.time() - start, 1e-6)
+        transferred = sum(p.stat().st_size for p in downloaded)
+        logger.info(f"✓ {len(downloaded)} arquivo(s), {transferred / (1024 * 1024):.2f} MB em {elapsed:.1f}s "
+                    f"({transferred / (1024 * 1024) / elapsed:.2f} MB/s)")
+        if failed:
+            logger.warning(f"{len(failed)} arquivo(s) falharam no download")
+
+        return downloaded, failed
 
     def download_all(self, interactive: bool = True) -> Dict[str, List[Path]]:
         """Baixa todos os arquivos e organiza por tabela"""
@@ -270,13 +502,11 @@ class GCSDownloader:
         logger.info(f"Iniciando download de {len(files)} arquivos...")
 
         files_by_table = defaultdict(list)
+        downloaded, _ = self.download_many(files)
 
-        for file_info in files:
-            file_name = file_info['name']
-            local_path = self.download_file(file_name)
-
+        for local_path in downloaded:
             # Extrair nome da tabela
-            table_name = Path(file_name).stem
+            table_name = local_path.stem
             table_name = table_name.rsplit('_', 1)[0] if table_name[-1].isdigit() else table_name
 
             files_by_table[table_name].append(local_path)
@@ -285,6 +515,163 @@ class GCSDownloader:
         return dict(files_by_table)
 
 
+# ========================================
+# Manifesto de Sincronização
+# ========================================
+
+class SyncManifest:
+    """
+    Estado persistido da sincronização: metadados do GCS de cada arquivo baixado
+
+    Indexado pelo nome local do arquivo; guarda object name, generation, size, md5Hash
+    e crc32c da listagem. A comparação é sempre contra o manifesto (e não contra o
+    arquivo local), pois os parquets são reescritos localmente com as chaves substitutas.
+    """
+
+    FIELDS = ('name', 'generation', 'size', 'md5Hash', 'crc32c')
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or Config.SYNC_MANIFEST_FILE)
+        self.entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding='utf-8')).get('objects', {})
+
+    @staticmethod
+    def local_name(file_info: Dict) -> str:
+        return Path(file_info['name']).name
+
+    def is_current(self, file_info: Dict) -> bool:
+        """True se o objeto do bucket é o mesmo registrado na última sincronização"""
+        entry = self.entries.get(self.local_name(file_info))
+        if not entry:
+            return False
+        if file_info.get('generation') and entry.get('generation') != file_info['generation']:
+            return False
+        return entry.get('md5Hash') == file_info.get('md5Hash') and entry.get('size') == file_info.get('size')
+
+    def record(self, file_info: Dict):
+        entry = {field: file_info.get(field) for field in self.FIELDS}
+        entry['synced_at'] = datetime.now().isoformat()
+        self.entries[self.local_name(file_info)] = entry
+
+    def record_validation(self, local_name: str, footer: Dict):
+        """Guarda linhas/row groups lidos do rodapé (arquivo validado)"""
+        entry = self.entries.get(local_name)
+        if entry is not None:
+            entry['num_rows'] = footer['num_rows']
+            entry['num_row_groups'] = footer['num_row_groups']
+
+    def unvalidated(self) -> List[str]:
+        """Arquivos registrados que ainda não passaram pela validação do rodapé"""
+        return [name for name, entry in self.entries.items() if 'num_rows' not in entry]
+
+    def remove(self, local_name: str):
+        self.entries.pop(local_name, None)
+
+    def save(self):
+        """Grava o manifesto de forma atômica (arquivo temporário + rename)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({
+            'bucket': Config.GCS_BUCKET_NAME,
+            'prefix': Config.GCS_FOLDER_PREFIX,
+            'updated_at': datetime.now().isoformat(),
+            'objects': self.entries,
+        }, indent=2, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+# ========================================
+# Validação de Parquets (rodapé)
+# ========================================
+
+def table_name_from_path(file_path: Path) -> str:
+    """Nome da tabela sem o sufixo numérico do particionamento (works_latam_000000000000 -> works_latam)"""
+    table_name = file_path.stem
+    return table_name.rsplit('_', 1)[0] if table_name[-1].isdigit() else table_name
+
+
+class ParquetFooterValidator:
+    """
+    Valida parquets em um pool de threads enquanto os demais downloads continuam
+
+    Lê apenas o rodapé (metadados) de cada arquivo: confirma que o parquet é legível,
+    confere as colunas obrigatórias de EXPECTED_SCHEMAS e registra linhas/row groups.
+    Downloads são conferidos ainda como .part (check_part), antes do rename: só arquivos
+    aprovados chegam ao diretório de dados.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers or Config.VALIDATION_WORKERS)
+        self.futures = {}
+        # Resultado de check_part por destino: rodapé (aprovado) ou (quarentena, motivo)
+        self.parts = {}
+
+    @staticmethod
+    def validate_footer(file_path: Path, table_name: Optional[str] = None) -> Dict:
+        """Lê o rodapé e retorna {table, num_rows, num_row_groups}; ValueError se inválido"""
+        import pyarrow.parquet as pq
+
+        try:
+            metadata = pq.read_metadata(file_path)
+        except Exception as e:
+            raise ValueError(f"rodapé parquet ilegível: {e}")
+
+        table_name = table_name or table_name_from_path(file_path)
+        columns = set(metadata.schema.names)
+        missing = [c for c in EXPECTED_SCHEMAS.get(table_name, []) if c not in columns]
+        if missing:
+            raise ValueError(f"colunas obrigatórias ausentes em {table_name}: {', '.join(missing)}")
+
+        return {
+            'table': table_name,
+            'num_rows': metadata.num_rows,
+            'num_row_groups': metadata.num_row_groups,
+        }
+
+    def check_part(self, part_file: Path, destination: Path) -> Dict:
+        """Valida o .part de um download; reprovado vai para a quarentena com o nome definitivo"""
+        try:
+            footer = self.validate_footer(part_file, table_name_from_path(destination))
+        except ValueError as e:
+            self.parts[destination] = (self.quarantine(part_file, destination.name), str(e))
+            raise
+        self.parts[destination] = footer
+        return footer
+
+    def rejected_parts(self) -> Dict[Path, Tuple[Path, str]]:
+        """Downloads reprovados em check_part: destino -> (arquivo na quarentena, motivo)"""
+        return {dest: result for dest, result in self.parts.items() if isinstance(result, tuple)}
+
+    def submit(self, file_path: Path):
+        self.futures[file_path] = self.executor.submit(self.validate_footer, file_path)
+
+    def wait(self) -> Tuple[Dict[Path, Dict], Dict[Path, str]]:
+        """
+        Aguarda as validações pendentes. Retorna (válidos, inválidos -> motivo)
+
+        Os válidos incluem os downloads aprovados em check_part; os reprovados ali já
+        estão na quarentena (rejected_parts) e não entram nos inválidos.
+        """
+        valid = {dest: footer for dest, footer in self.parts.items() if isinstance(footer, dict)}
+        invalid = {}
+        for file_path, future in self.futures.items():
+            try:
+                valid[file_path] = future.result()
+            except Exception as e:
+                invalid[file_path] = str(e)
+        self.executor.shutdown(wait=True)
+        return valid, invalid
+
+    @staticmethod
+    def quarantine(file_path: Path, name: Optional[str] = None) -> Path:
+        """Move um arquivo reprovado para Config.QUARANTINE_DIR (fora do alcance da API)"""
+        Config.QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+        target = Config.QUARANTINE_DIR / (name or file_path.name)
+        os.replace(file_path, target)
+        return target
+
+
 # ========================================
 # Gerenciamento de Arquivos Locais
 # ========================================
@@ -424,6 +811,74 @@ class DuckDBProcessor:
     def __init__(self):
         self.file_manager = LocalFileManager()
 
+    @staticmethod
+    def surrogate_key_expr(column: str) -> str:
+        """Expressão SQL que extrai a chave int64 do sufixo numérico de um ID OpenAlex"""
+        return f"TRY_CAST(regexp_extract({column}, '(\\d+)$', 1) AS BIGINT)"
+
+    def _surrogate_key_columns(self, duck_conn, table_name: str, file_pattern: str) -> str:
+        """Retorna colunas extras (", expr AS chave") para as chaves ainda ausentes na tabela"""
+        keys = SURROGATE_KEYS.get(table_name)
+        if not keys:
+            return ""
+
+        schema = duck_conn.execute(f"DESCRIBE SELECT * FROM read_parquet({file_pattern})").fetchall()
+        columns = {row[0] for row in schema}
+
+        extra = [
+            f"{self.surrogate_key_expr(source_column)} AS {key_column}"
+            for key_column, source_column in keys.items()
+            if key_column not in columns and source_column in columns
+        ]
+        return "".join(f", {col}" for col in extra)
+
+    def add_surrogate_keys(self, table_name: str, parquet_files: List[Path]) -> int:
+        """
+        Reescreve os parquets de uma tabela adicionando as chaves substitutas int64
+
+        Arquivos que já possuem as chaves são ignorados, então a operação é idempotente
+        e pode rodar a cada sincronização. Retorna o número de arquivos reescritos.
+        """
+        if table_name not in SURROGATE_KEYS:
+            return 0
+
+        duck_conn = duckdb.connect(':memory:')
+        updated = 0
+
+        try:
+            for file_path in parquet_files:
+                key_columns = self._surrogate_key_columns(duck_conn, table_name, f"'{file_path}'")
+                if not key_columns:
+                    continue
+
+                temp_file = file_path.with_suffix('.parquet.tmp')
+                duck_conn.execute(f"""
+                    COPY (SELECT *{key_columns} FROM read_parquet('{file_path}'))
+                    TO '{temp_file}' ({copy_options('openalex')})
+                """)
+                os.replace(temp_file, file_path)
+                updated += 1
+                logger.info(f"Chaves substitutas adicionadas: {file_path.name}")
+        finally:
+            duck_conn.close()
+
+        return updated
+
+    def add_surrogate_keys_all(self, files_by_table: Dict[str, List[Path]]) -> int:
+        """Adiciona chaves substitutas em todas as tabelas OpenAlex que as utilizam nos joins"""
+        updated = 0
+        for table_name, files in files_by_table.items():
+            # Arquivos concatenados (merged/) já são gerados com as chaves
+            partitioned = [f for f in files if f.parent.name != 'merged']
+            try:
+                updated += self.add_surrogate_keys(table_name, partitioned)
+            except Exception as e:
+                logger.error(f"Erro ao adicionar chaves substitutas em {table_name}: {e}")
+
+        if updated:
+            logger.info(f"✓ Chaves substitutas adicionadas em {updated} arquivo(s)")
+        return updated
+
     def analyze_table(self, table_name: str, parquet_files: List[Path]):
         """Analisa uma tabela usando DuckDB"""
         print(f"\n📊 Analisando tabela: {table_name}")
@@ -485,11 +940,12 @@ class DuckDBProcessor:
             print(f"  Destino: {output_file}")
 
             file_pattern = f"[{','.join(repr(str(f)) for f in parquet_files)}]"
+            key_columns = self._surrogate_key_columns(duck_conn, table_name, file_pattern)
 
-            # Usar DuckDB para ler todos e salvar como um único parquet
+            # Usar DuckDB para ler todos e salvar como um único parquet (com chaves int64)
             merge_query = f"""
-                COPY (SELECT * FROM read_parquet({file_pattern}))
-                TO '{output_file}' (FORMAT PARQUET)
+                COPY (SELECT *{key_columns} FROM read_parquet({file_pattern}))
+                TO '{output_file}' ({copy_options('openalex')})
             """
 
             with tqdm(desc="Concatenando", unit=" linhas") as pbar:
@@ -831,6 +1287,7 @@ def run_full_pipeline():
         print("ETAPA 2: Análise dos dados (DuckDB)")
         print("=" * 70)
         print(f"✓ {len(files_by_table)} tabelas prontas")
+        DuckDBProcessor().add_surrogate_keys_all(files_by_table)
 
         # 3. Import MySQL (opcional)
         if include_mysql:
@@ -979,15 +1436,15 @@ def main():
                         print(f"\n📊 Estatísticas da Coleta:")
                         print(f"   Prefixes a processar: {len(prefixes):,}")
                         
-                        if not last_collection.empty:
+                        if last_collection:
                             incremental_count = len(last_collection)
                             print(f"   Coleta incremental: Sim ({incremental_count} prefixes com histórico)")
                             print(f"   Prefixes novos: {len(prefixes) - incremental_count:,}")
                         else:
                             print(f"   Coleta incremental: Não (primeira coleta)")
                         
-                        # Estimar tempo (aproximado: ~2 segundos por prefix)
-                        estimated_minutes = (len(prefixes) * 2) / 60
+                        # Estimar tempo (aproximado: ~2 segundos por prefix, CROSSREF_WORKERS em paralelo)
+                        estimated_minutes = (len(prefixes) * 2) / 60 / Config.CROSSREF_WORKERS
                         print(f"   Tempo estimado: ~{estimated_minutes:.1f} minutos")
                         print(f"   Diretório de saída: {Config.CROSSREF_RAW_DIR}")
                         
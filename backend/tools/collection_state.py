@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Estado das coletas de eventos (Crossref, Bluesky, BORI) em um SQLite local
+
+Substitui os logs CSV (crossref_collection_log.csv, bluesky_collection_log.csv,
+bori_collection_log.csv), que eram relidos inteiros a cada coleta. Cada linha é
+indexada por (fonte, chave) - a chave é o prefix no Crossref - e guarda a última
+data de coleta, o checkpoint da coleta em andamento e estatísticas acumuladas, incluindo
+a taxa de eventos por dia (média móvel exponencial) usada pelo agendamento das coletas.
+Atualizações são transações do SQLite, seguras entre as threads do coletor.
+
+A tabela processed_files é a marca d'água do processamento: cada arquivo bruto já
+transformado, com tamanho/mtime e a partição limpa em que seus eventos foram gravados.
+
+Os logs CSV existentes são importados uma única vez, na primeira abertura.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collection_state (
+    source TEXT NOT NULL,
+    key TEXT NOT NULL,
+    last_date TEXT,
+    cursor TEXT,
+    checkpoint TEXT,
+    last_events INTEGER NOT NULL DEFAULT 0,
+    total_events INTEGER NOT NULL DEFAULT 0,
+    runs INTEGER NOT NULL DEFAULT 0,
+    event_rate REAL,
+    last_yield TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (source, key)
+);
+CREATE TABLE IF NOT EXISTS processed_files (
+    source TEXT NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    partition TEXT NOT NULL,
+    processed_at TEXT,
+    PRIMARY KEY (source, file)
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT
+);
+"""
+
+
+# Colunas acrescentadas depois da criação do schema (bancos existentes recebem ALTER TABLE)
+ADDED_COLUMNS = {
+    "event_rate": "REAL",
+    "last_yield": "TEXT",
+}
+
+# Peso da coleta mais recente na média móvel da taxa de eventos
+RATE_SMOOTHING = 0.3
+# Eventos por dia observados numa coleta incremental (dias desde a coleta anterior, mínimo 1)
+OBSERVED_RATE = "(excluded.last_events / MAX(julianday(excluded.last_date) - julianday(last_date), 1))"
+
+
+class CollectionStateStore:
+    """Estado das coletas indexado por (fonte, chave), com checkpoint e estatísticas"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or Config.COLLECTION_STATE_DB)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Uma conexão compartilhada pelas threads do coletor, serializada pelo lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(collection_state)")}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE collection_state ADD COLUMN {column} {definition}")
+
+        self._migrate_csv_logs()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _now(self) -> str:
+        return datetime.now().isoformat(timespec='seconds')
+
+    def get(self, source: str, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM collection_state WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def last_dates(self, source: str) -> Dict[str, str]:
+        """Última data de coleta de cada chave da fonte (base da coleta incremental)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, last_date FROM collection_state WHERE source = ? AND last_date IS NOT NULL",
+                (source,)
+            ).fetchall()
+        return {row['key']: row['last_date'] for row in rows}
+
+    def all(self, source: str) -> Dict[str, dict]:
+        """Estado de todas as chaves da fonte (uma consulta)"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM collection_state WHERE source = ?", (source,)).fetchall()
+        return {row['key']: dict(row) for row in rows}
+
+    def record_collection(self, source: str, key: str, collection_date: str, events: int,
+                          span_days: Optional[float] = None):
+        """
+        Registra uma coleta concluída e descarta o checkpoint da chave
+
+        Atualiza a taxa de eventos por dia: eventos desta coleta divididos pelos dias desde a
+        anterior, suavizados com RATE_SMOOTHING. A primeira coleta (histórico inteiro) usa
+        span_days, os dias entre o evento mais antigo coletado e a coleta; sem ele (ou sem
+        eventos), CROSSREF_POLL_MAX_DAYS. Chaves importadas dos logs CSV ficam sem taxa
+        (NULL) até a primeira coleta.
+        """
+        first_rate = events / max(span_days or Config.CROSSREF_POLL_MAX_DAYS, 1)
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO collection_state
+                    (source, key, last_date, last_events, total_events, runs, event_rate, last_yield, updated_at)
+                VALUES (?, ?, ?, ?, ?, 1, ?, CASE WHEN ? > 0 THEN ? END, ?)
+                ON CONFLICT (source, key) DO UPDATE SET
+                    last_date = MAX(COALESCE(last_date, ''), excluded.last_date),
+                    cursor = NULL,
+                    checkpoint = NULL,
+                    last_events = excluded.last_events,
+                    total_events = total_events + excluded.last_events,
+                    runs = runs + 1,
+                    event_rate = CASE
+                        WHEN last_date IS NULL THEN excluded.event_rate
+                        ELSE COALESCE(? * {observed} + ? * event_rate, {observed})
+                    END,
+                    last_yield = COALESCE(excluded.last_yield, last_yield),
+                    updated_at = excluded.updated_at
+            """.format(observed=OBSERVED_RATE), (source, key, collection_date, events, events, first_rate,
+                                                events, collection_date, self._now(),
+                                                RATE_SMOOTHING, 1 - RATE_SMOOTHING))
+
+    def save_checkpoint(self, source: str, key: str, cursor: Optional[str], checkpoint: dict):
+        """Grava o cursor (e o estado do writer) da coleta em andamento"""
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO collection_state (source, key, cursor, checkpoint, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source, key) DO UPDATE SET
+                    cursor = excluded.cursor,
+                    checkpoint = excluded.checkpoint,
+                    updated_at = excluded.updated_at
+            """, (source, key, cursor, json.dumps(checkpoint), self._now()))
+
+    def load_checkpoint(self, source: str, key: str) -> Optional[dict]:
+        """Checkpoint da coleta interrompida (com o cursor), ou None"""
+        state = self.get(source, key)
+        if not state or not state['checkpoint']:
+            return None
+        checkpoint = json.loads(state['checkpoint'])
+        checkpoint['cursor'] = state['cursor']
+        return checkpoint
+
+    def clear_checkpoint(self, source: str, key: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE collection_state SET cursor = NULL, checkpoint = NULL WHERE source = ? AND key = ?",
+                (source, key)
+            )
+
+    def delete(self, source: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM collection_state WHERE source = ? AND key = ?", (source, key))
+
+    def pending_checkpoints(self, source: str) -> int:
+        """Quantas coletas da fonte foram interrompidas e podem ser retomadas"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM collection_state WHERE source = ? AND checkpoint IS NOT NULL", (source,)
+            ).fetchone()
+        return row[0]
+
+    def processed_files(self, source: str) -> Dict[str, dict]:
+        """Arquivos brutos já processados da fonte: {arquivo: {size, mtime_ns, partition}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file, size, mtime_ns, partition FROM processed_files WHERE source = ?", (source,)
+            ).fetchall()
+        return {row['file']: dict(row) for row in rows}
+
+    def record_processed(self, source: str, partition: str, files: Dict[str, Tuple[int, int]]):
+        """Registra os arquivos ({arquivo: (size, mtime_ns)}) gravados na partição, numa transação"""
+        now = self._now()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("""
+                    INSERT INTO processed_files (source, file, size, mtime_ns, partition, processed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source, file) DO UPDATE SET
+                        size = excluded.size,
+                        mtime_ns = excluded.mtime_ns,
+                        partition = excluded.partition,
+                        processed_at = excluded.processed_at
+                """, [(source, name, size, mtime_ns, partition, now) for name, (size, mtime_ns) in files.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def forget_partitions(self, source: str, partitions: Iterable[str]):
+        """Remove da marca d'água os arquivos das partições descartadas (voltam a ser processados)"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM processed_files WHERE source = ? AND partition = ?",
+                [(source, partition) for partition in partitions]
+            )
+
+    def _migrate_csv_logs(self):
+        """Importa os logs CSV legados (uma única vez por arquivo)"""
+        legacy_logs = {
+            'crossref': Config.CROSSREF_COLLECTION_LOG,  # prefix,data
+            'bluesky': Config.BLUESKY_COLLECTION_LOG,    # data,posts salvos,total acumulado
+            'bori': Config.BORI_COLLECTION_LOG,          # data[,eventos]
+        }
+        for source, log_file in legacy_logs.items():
+            name = f"csv:{log_file.name}"
+            with self._lock:
+                applied = self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone()
+            if applied or not log_file.exists():
+                continue
+
+            imported = self._import_csv_log(source, log_file)
+            with self._lock:
+                self._conn.execute("INSERT INTO migrations VALUES (?, ?)", (name, self._now()))
+            logger.info(f"Log {log_file.name} importado para {self.path.name}: {imported} linhas")
+
+    def _import_csv_log(self, source: str, log_file: Path) -> int:
+        rows = []
+        with open(log_file) as f:
+            for line in f:
+                fields = [field.strip() for field in line.strip().split(',')]
+                if not fields or not fields[0]:
+                    continue
+                if source == 'crossref' and len(fields) >= 2:
+                    rows.append((fields[0], fields[1], 0))
+                elif source != 'crossref':
+                    events = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 0
+                    rows.append(('firehose' if source == 'bluesky' else 'uploads', fields[0], events))
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, collection_date, events in rows:
+                    self._conn.execute("""
+                        INSERT INTO collection_state (source, key, last_date, last_events, total_events, runs, updated_at)
+                        VALUES (?, ?, ?, ?, ?, 1, ?)
+                        ON CONFLICT (source, key) DO UPDATE SET
+                            last_date = MAX(COALESCE(last_date, ''), excluded.last_date),
+                            last_events = excluded.last_events,
+                            total_events = total_events + excluded.last_events,
+                            runs = runs + 1
+                    """, (source, key, collection_date, events, events, self._now()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with CollectionStateStore() as store:
+        for source in ('crossref', 'bluesky', 'bori'):
+            dates = store.last_dates(source)
+            print(f"{source}: {len(dates):,} chaves, {store.pending_checkpoints(source)} coletas a retomar")
@@ -17,6 +17,10 @@ class Config:
     # Google Cloud Storage - Bucket Público
     GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "altmetria_latam_ibict_tables")
     GCS_FOLDER_PREFIX = os.getenv("GCS_FOLDER_PREFIX", "")
+    # Endpoints do GCS (sobrescrevíveis para apontar para um servidor HTTP local em testes)
+    GCS_API_BASE_URL = os.getenv("GCS_API_BASE_URL", "https://storage.googleapis.com/storage/v1")
+    GCS_DOWNLOAD_BASE_URL = os.getenv("GCS_DOWNLOAD_BASE_URL", "https://storage.googleapis.com")
+    GCS_PAGE_SIZE = int(os.getenv("GCS_PAGE_SIZE", "1000"))  # Objetos por página na listagem
 
     # Local de salvamento dos parquets.
     # Prioridade:
@@ -39,15 +43,37 @@ class Config:
 
     LOCAL_DOWNLOAD_PATH = get_download_path()
 
+    # Manifesto da sincronização com o GCS (generation/size/md5 de cada objeto baixado)
+    SYNC_MANIFEST_FILE = Path(LOCAL_DOWNLOAD_PATH) / "sync_manifest.json"
+    # Arquivos reprovados na validação do rodapé (fora do diretório lido pela API)
+    QUARANTINE_DIR = Path(LOCAL_DOWNLOAD_PATH) / "quarantine"
+
     # ========================================
     # Estrutura de Diretórios para Eventos
     # ========================================
     # Base directory para eventos (raw, processed, consolidated)
     EVENTS_BASE_DIR = Path(LOCAL_DOWNLOAD_PATH) / "events"
+    # Estado das coletas (Crossref, Bluesky, BORI): última data, checkpoint e estatísticas
+    # Substitui os logs CSV *_collection_log.csv, importados na primeira abertura
+    COLLECTION_STATE_DB = EVENTS_BASE_DIR / "logs" / "collection_state.sqlite"
+    # Processos do process_all_events.py (0 = um processo por fonte registrada)
+    EVENT_PROCESSING_WORKERS = int(os.getenv("EVENT_PROCESSING_WORKERS", "0"))
+    # DuckDB do ETL de eventos: memória por processo, diretório de spill e threads (0 = todos os núcleos)
+    ETL_MEMORY_LIMIT = os.getenv("ETL_MEMORY_LIMIT", "2GB")
+    ETL_TEMP_DIR = Path(os.getenv("ETL_TEMP_DIR") or EVENTS_BASE_DIR / "tmp")
+    ETL_THREADS = int(os.getenv("ETL_THREADS", "0"))
 
     # Configurações de performance
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "50000"))  # Linhas por batch no insert
-    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", "8192"))  # Bytes por chunk no download
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", "1048576"))  # Bytes por chunk no download (1 MB)
+    DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))  # Downloads simultâneos do GCS
+    VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "4"))  # Leitores de rodapé parquet em paralelo
+
+    # Layout dos parquets gravados pelo ETL (ver parquet_layout.py)
+    PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "3"))  # Nível ZSTD (1-22)
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "122880"))  # Linhas por row group
+    PARQUET_BLOOM_FILTERS = os.getenv("PARQUET_BLOOM_FILTERS", "true").lower() == "true"  # Bloom filter no DOI
+    PARQUET_BLOOM_FILTER_FPP = float(os.getenv("PARQUET_BLOOM_FILTER_FPP", "0.01"))  # Taxa de falso positivo
 
     # Retry e timeout
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
@@ -70,19 +96,43 @@ class Config:
     # ========================================
 
     # API Configuration
-    CROSSREF_API_BASE_URL = "https://api.eventdata.crossref.org/v1/events"
+    # Sobrescrevível para apontar para um servidor Event Data local em testes
+    CROSSREF_API_BASE_URL = os.getenv("CROSSREF_API_BASE_URL", "https://api.eventdata.crossref.org/v1/events")
     CROSSREF_MAILTO = os.getenv("CROSSREF_MAILTO", "marcelo@markdev.dev")  # Email para API (recomendado)
     CROSSREF_ROWS_PER_REQUEST = int(os.getenv("CROSSREF_ROWS_PER_REQUEST", "200"))
-    CROSSREF_REQUEST_DELAY = float(os.getenv("CROSSREF_REQUEST_DELAY", "1.0"))  # Segundos entre requests
+    # Intervalo inicial entre requests; depois o limitador segue os headers x-rate-limit-* da API
+    CROSSREF_REQUEST_DELAY = float(os.getenv("CROSSREF_REQUEST_DELAY", "1.0"))
+    CROSSREF_WORKERS = int(os.getenv("CROSSREF_WORKERS", "8"))  # Prefixes coletados em paralelo
 
     # Crossref Event Data - Diretórios
     CROSSREF_RAW_DIR = EVENTS_BASE_DIR / "raw" / "crossref"
-    CROSSREF_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "crossref_clean_events.parquet"
-    CROSSREF_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "crossref_collection_log.csv"
+    CROSSREF_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "crossref_clean_events.parquet"  # Legado
+    # Eventos limpos em partições (uma por execução do processamento, só com os arquivos brutos novos)
+    CROSSREF_PARTITIONS_DIR = EVENTS_BASE_DIR / "processed" / "crossref"
+    CROSSREF_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "crossref_collection_log.csv"  # Legado (importado)
+    # Páginas por segmento: ao confirmar um segmento o cursor vai para o checkpoint
+    CROSSREF_CHECKPOINT_PAGES = int(os.getenv("CROSSREF_CHECKPOINT_PAGES", "50"))  # Páginas por segmento
+    # Prefixes com mais eventos que isso são divididos em janelas de datas coletadas em paralelo
+    CROSSREF_SHARD_EVENTS = int(os.getenv("CROSSREF_SHARD_EVENTS", "20000"))  # 0 desativa
+    CROSSREF_SHARD_START_DATE = os.getenv("CROSSREF_SHARD_START_DATE", "1990-01-01")  # Início da 1ª janela
+    # Agendamento adaptativo: intervalo de consulta de cada prefix conforme sua taxa de eventos
+    CROSSREF_ADAPTIVE_POLLING = os.getenv("CROSSREF_ADAPTIVE_POLLING", "true").lower() == "true"
+    CROSSREF_POLL_MIN_DAYS = int(os.getenv("CROSSREF_POLL_MIN_DAYS", "1"))    # Prefixes mais ativos
+    CROSSREF_POLL_MAX_DAYS = int(os.getenv("CROSSREF_POLL_MAX_DAYS", "30"))   # Prefixes dormentes (só com orçamento)
+    CROSSREF_REQUEST_BUDGET = int(os.getenv("CROSSREF_REQUEST_BUDGET", "0"))  # Requisições por execução (0 = sem limite)
     
-    # Manter compatibilidade: arquivo consolidado (usado pelo backend)
-    # Pode conter eventos de múltiplas fontes após consolidação
+    # Legado: arquivo consolidado único (hoje a API lê as partições listadas no manifesto)
     ALL_EVENTS_FILE = EVENTS_BASE_DIR / "consolidated" / "all_events.parquet"
+
+    # Manifesto do consolidado: partições de cada fonte, rollups e impressão digital das entradas;
+    # a API confere schema_version antes de registrar a view
+    ALL_EVENTS_MANIFEST = EVENTS_BASE_DIR / "consolidated" / "manifest.json"
+    # v1: timestamp_ texto, year INTEGER, source_/prefix VARCHAR
+    # v2: timestamp_ TIMESTAMP, year SMALLINT, source_/prefix ENUM (dicionário no parquet)
+    EVENTS_SCHEMA_VERSION = 2
+    # Partições substituídas ficam no disco por este tempo depois de saírem do manifesto:
+    # workers da API abertos ainda as leem até recarregar o manifesto (nova geração)
+    EVENTS_RETIRED_GRACE_SECONDS = int(os.getenv("EVENTS_RETIRED_GRACE_SECONDS", "3600"))
     
     # Compatibilidade: manter referência ao nome antigo para backend
     CROSSREF_CLEAN_FILE = ALL_EVENTS_FILE  # Aponta para arquivo consolidado
@@ -93,20 +143,29 @@ class Config:
     
     # Bluesky - Diretórios
     BLUESKY_RAW_DIR = EVENTS_BASE_DIR / "raw" / "bluesky"
-    BLUESKY_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "bluesky_clean_events.parquet"
-    BLUESKY_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "bluesky_collection_log.csv"
+    BLUESKY_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "bluesky_clean_events.parquet"  # Legado
+    BLUESKY_PARTITIONS_DIR = EVENTS_BASE_DIR / "processed" / "bluesky"  # Partições de eventos limpos
+    BLUESKY_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "bluesky_collection_log.csv"  # Legado (importado)
     
     # Configurações do Bluesky (se necessário)
     BLUESKY_OUTPUT_DIR = os.getenv("BLUESKY_OUTPUT_DIR", "")  # Diretório onde código Bluesky salva (se diferente)
 
+    # Pipeline do Firehose: a thread do websocket só enfileira; decodificação em processos
+    BLUESKY_DECODERS = int(os.getenv("BLUESKY_DECODERS", "0"))  # Processos decodificadores (0 = núcleos - 1)
+    BLUESKY_QUEUE_SIZE = int(os.getenv("BLUESKY_QUEUE_SIZE", "20000"))  # Frames em espera (cheia = leitura do websocket espera)
+    BLUESKY_STATS_INTERVAL = int(os.getenv("BLUESKY_STATS_INTERVAL", "60"))  # Segundos entre relatórios de fila/atraso
+    # Posts sem DOI de prefix LATAM (prefixes_latam): drop (não grava), tag (coluna latam) ou off
+    BLUESKY_LATAM_FILTER = os.getenv("BLUESKY_LATAM_FILTER", "drop")
+
     # ========================================
     # BORI Event Data
     # ========================================
     
     # BORI - Diretórios
     BORI_RAW_DIR = EVENTS_BASE_DIR / "raw" / "BORI"
-    BORI_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "bori_clean_events.parquet"
-    BORI_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "bori_collection_log.csv"
+    BORI_PROCESSED_FILE = EVENTS_BASE_DIR / "processed" / "bori_clean_events.parquet"  # Legado
+    BORI_PARTITIONS_DIR = EVENTS_BASE_DIR / "processed" / "bori"  # Partições de eventos limpos
+    BORI_COLLECTION_LOG = EVENTS_BASE_DIR / "logs" / "bori_collection_log.csv"  # Legado (importado)
 
     # ========================================
     # Funcionalidades Opcionais
@@ -176,3 +235,28 @@ EXPECTED_TABLES = [
     "prefixes_latam",
     "prefixes_sources_latam"
 ]
+
+# Colunas obrigatórias por tabela, conferidas no rodapé de cada parquet baixado
+# (apenas as usadas pela API e pelo ETL; tabelas ausentes só precisam de um rodapé legível)
+EXPECTED_SCHEMAS = {
+    "works_latam": ["id", "doi", "title", "publication_year"],
+    "works_locations_latam": ["work_id", "source_id"],
+    "works_topics_latam": ["work_id", "topic_id", "score"],
+    "topics": ["id", "field"],
+    "fields": ["id", "display_name"],
+    "sources_latam": ["id", "display_name"],
+    "prefixes_latam": ["prefix"],
+}
+
+
+# Chaves substitutas inteiras (int64) derivadas do sufixo numérico dos IDs OpenAlex
+# (ex: https://openalex.org/W2741809807 -> 2741809807, https://openalex.org/fields/17 -> 17).
+# Formato: tabela -> {coluna_chave: coluna_id_original}
+SURROGATE_KEYS = {
+    "works_latam": {"work_key": "id"},
+    "works_locations_latam": {"work_key": "work_id", "source_key": "source_id"},
+    "works_topics_latam": {"work_key": "work_id", "topic_key": "topic_id"},
+    "topics": {"topic_key": "id", "field_key": "field"},
+    "fields": {"field_key": "id"},
+    "sources_latam": {"source_key": "id"},
+}
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Índice persistente de deduplicação de eventos
+
+Guarda um hash de 64 bits de cada evento já publicado por uma fonte (md5_number_lower do
+DuckDB, estável entre versões), num parquet ordenado por partição:
+processed/<fonte>/dedup/<partição>.parquet. Lotes novos são filtrados por um anti-join
+contra esses arquivos, lidos em streaming pelo DuckDB (a tabela de hash fica do lado do
+lote, que é o menor), sem carregar o histórico em memória.
+
+Chaves: Crossref usa o id do evento; Bluesky usa o conteúdo do post (autor, data e texto).
+
+Uso como script (tamanho do índice de cada fonte):
+    python dedup_index.py
+"""
+import logging
+import os
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import List
+from parquet_layout import copy_to_parquet
+
+logger = logging.getLogger(__name__)
+
+
+class DedupIndex:
+    """Hashes dos eventos já publicados de uma fonte, um arquivo por partição"""
+
+    def __init__(self, partitions_dir: Path):
+        self.directory = Path(partitions_dir) / "dedup"
+
+    def files(self) -> List[Path]:
+        return sorted(self.directory.glob('part-*.parquet'))
+
+    def filter_new(self, conn, source_view: str, output_file: Path, key_expr: str) -> int:
+        """
+        Grava em output_file as linhas inéditas de source_view (mais a coluna event_hash)
+
+        Descarta as repetições dentro do lote e os eventos já presentes no índice, num COPY
+        em streaming (a deduplicação do lote pode ir para o temp_directory do DuckDB).
+        Retorna o número de linhas descartadas.
+        """
+        index_files = self.files()
+        anti_join = ""
+        if index_files:
+            file_list = ','.join([f"'{f.absolute()}'" for f in index_files])
+            anti_join = f"ANTI JOIN read_parquet([{file_list}]) published ON batch.event_hash = published.event_hash"
+
+        # row_number em vez de DISTINCT ON: a janela vai para disco acima do memory_limit,
+        # o agregado com colunas texto (first/any_value) não
+        copy_to_parquet(conn, f"""
+            SELECT batch.*
+            FROM (SELECT *, md5_number_lower({key_expr}) AS event_hash FROM {source_view}) batch
+            {anti_join}
+            QUALIFY row_number() OVER (PARTITION BY batch.event_hash) = 1
+        """, output_file, 'raw')
+        total = conn.execute(f"SELECT COUNT(*) FROM {source_view}").fetchone()[0]
+        return total - pq.ParquetFile(output_file).metadata.num_rows
+
+    def write(self, conn, table_name: str, partition_file: Path):
+        """Grava os hashes do lote (coluna event_hash de table_name) como índice da partição"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_file = self.directory / Path(partition_file).name
+        temp_file = index_file.with_suffix('.parquet.tmp')
+        copy_to_parquet(conn, f"SELECT DISTINCT event_hash FROM {table_name}", temp_file, 'dedup')
+        os.replace(temp_file, index_file)
+
+    def delete(self, partition: str):
+        (self.directory / partition).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    from process_all_events import PARTITION_DIRS
+
+    for source, partitions_dir in PARTITION_DIRS.items():
+        files = DedupIndex(partitions_dir).files()
+        hashes = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+        size_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+        print(f"{source}: {hashes:,} hashes em {len(files)} arquivos ({size_mb:.1f} MB)")
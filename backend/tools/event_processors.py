@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Registro dos processadores de eventos por fonte
+
+Cada fonte altmétrica é um EventProcessor: onde ficam os arquivos brutos e as partições,
+a transformação SQL dos eventos brutos em eventos limpos (id, timestamp_, source_, prefix),
+as colunas brutas que ela usa e o modo de atualização. As transformações só definem views:
+os dados passam em streaming do read_parquet dos arquivos brutos ao COPY da partição. Com chave de deduplicação o processador é incremental (marca
+d'água + índice de deduplicação); sem ela, a fonte é refeita por inteiro quando a
+impressão digital das entradas muda.
+
+process_all_events.py roda cada processador num processo próprio. Para acrescentar uma
+fonte basta escrever a transformação e registrá-la em PROCESSORS.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+from config import Config
+
+
+class EventProcessor:
+    """Fonte de eventos: arquivos brutos, transformação e modo de atualização"""
+
+    def __init__(
+        self,
+        raw_dir: Path,
+        pattern: str,
+        transform: Callable,
+        columns: Sequence[str],
+        partitions_dir: Path,
+        dedup_key: Optional[str] = None,
+        legacy_file: Optional[Path] = None
+    ):
+        self.raw_dir = raw_dir
+        self.pattern = pattern
+        # transform(conn, view bruta, view de eventos): define a view, não materializa
+        self.transform = transform
+        # Colunas brutas lidas (projeção: o resto dos arquivos brutos nem é lido)
+        self.columns = tuple(columns)
+        self.partitions_dir = partitions_dir
+        # Expressão SQL sobre as colunas brutas; None = fonte refeita por inteiro
+        self.dedup_key = dedup_key
+        # Arquivo *_clean_events.parquet anterior às partições
+        self.legacy_file = legacy_file
+
+    @property
+    def incremental(self) -> bool:
+        return self.dedup_key is not None
+
+    def raw_files(self):
+        return sorted(self.raw_dir.glob(self.pattern))
+
+
+def transform_crossref_events(conn, raw_view: str, view_name: str):
+    """Eventos limpos a partir dos eventos brutos (estrutura normalizada do pandas)"""
+    # SQL que replica a lógica do BigQuery
+    # Estrutura real: source_id contém nome da fonte, obj_id contém URL completa do DOI
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        SELECT 
+            TRIM(obj_id, '"') AS id,
+            TRIM(occurred_at, '"') AS timestamp_,
+            source_id AS source_,
+            SPLIT_PART(
+                SUBSTR(TRIM(obj_id, '"'), 17),
+                '/',
+                1
+            ) AS prefix
+        FROM {raw_view}
+        WHERE obj_id IS NOT NULL
+          AND occurred_at IS NOT NULL
+          AND source_id IS NOT NULL;
+    """)
+
+
+def transform_bluesky_events(conn, raw_view: str, view_name: str):
+    """Eventos Bluesky (DOI declarado e DOIs extraídos das URLs dos posts)"""
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        WITH bluesky_events_from_doi AS (
+            SELECT 
+                'https://doi.org/' || TRIM(doi) AS id,
+                timestamp AS timestamp_,
+                'bluesky' AS source_,
+                SPLIT_PART(TRIM(doi), '/', 1) AS prefix
+            FROM {raw_view}
+            WHERE doi IS NOT NULL 
+              AND doi != ''
+              AND timestamp IS NOT NULL
+              AND doi LIKE '10.%'
+        ),
+        bluesky_with_dois AS (
+            SELECT 
+                timestamp,
+                UNNEST(SPLIT(urls, '|')) AS url
+            FROM {raw_view}
+            WHERE urls IS NOT NULL 
+              AND urls != ''
+              AND timestamp IS NOT NULL
+        ),
+        bluesky_events_from_urls AS (
+            SELECT 
+                'https://doi.org/' || TRIM(doi_part) AS id,
+                timestamp AS timestamp_,
+                'bluesky' AS source_,
+                SPLIT_PART(TRIM(doi_part), '/', 1) AS prefix
+            FROM (
+                SELECT 
+                    timestamp,
+                    CASE 
+                        WHEN url LIKE '%doi.org/10.%' THEN
+                            SUBSTR(url, POSITION('doi.org/' IN url) + 8)
+                        WHEN url LIKE '%/10.%' THEN
+                            SUBSTR(
+                                url,
+                                POSITION('/10.' IN url) + 1,
+                                CASE 
+                                    WHEN POSITION('?' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
+                                        POSITION('?' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
+                                    WHEN POSITION('#' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
+                                        POSITION('#' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
+                                    WHEN POSITION(' ' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
+                                        POSITION(' ' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
+                                    ELSE LENGTH(url) - POSITION('/10.' IN url)
+                                END
+                            )
+                        ELSE NULL
+                    END AS doi_part
+                FROM bluesky_with_dois
+                WHERE url LIKE '%/10.%'
+            )
+            WHERE doi_part IS NOT NULL
+              AND doi_part LIKE '10.%'
+              AND LENGTH(doi_part) > 5
+        )
+        SELECT DISTINCT
+            id,
+            timestamp_,
+            source_,
+            prefix
+        FROM (
+            SELECT * FROM bluesky_events_from_doi
+            UNION ALL
+            SELECT * FROM bluesky_events_from_urls
+        );
+    """)
+
+
+def transform_bori_events(conn, raw_view: str, view_name: str):
+    """Eventos BORI a partir da coluna 'labelDOI'"""
+    # labelDOI contém DOI no formato "10.xxxx/xxxx" (sem https://doi.org/)
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        SELECT 
+            'https://doi.org/' || TRIM("labelDOI") AS id,
+            "datePublished" AS timestamp_,
+            'bori' AS source_,
+            SPLIT_PART(TRIM("labelDOI"), '/', 1) AS prefix
+        FROM {raw_view}
+        WHERE "labelDOI" IS NOT NULL 
+          AND "labelDOI" != ''
+          AND "datePublished" IS NOT NULL
+          AND "labelDOI" LIKE '10.%'
+          AND LENGTH(TRIM("labelDOI")) > 5;
+    """)
+
+
+PROCESSORS: Dict[str, EventProcessor] = {
+    # Chave: o id do evento no Crossref (eventos antigos sem id: pelo conteúdo)
+    'crossref': EventProcessor(
+        Config.CROSSREF_RAW_DIR, 'p*_*.parquet', transform_crossref_events,
+        ('id', 'obj_id', 'subj_id', 'occurred_at', 'source_id'), Config.CROSSREF_PARTITIONS_DIR,
+        dedup_key="COALESCE(id, concat_ws('|', obj_id, subj_id, occurred_at, source_id))",
+        legacy_file=Config.CROSSREF_PROCESSED_FILE
+    ),
+    # Posts Bluesky não têm id nos arquivos brutos: a chave é o conteúdo (autor, data e texto)
+    'bluesky': EventProcessor(
+        Config.BLUESKY_RAW_DIR, 'scientific_posts_*.parquet', transform_bluesky_events,
+        ('doi', 'urls', 'timestamp', 'author_did', 'text'), Config.BLUESKY_PARTITIONS_DIR,
+        dedup_key="concat_ws('|', author_did, timestamp, text)",
+        legacy_file=Config.BLUESKY_PROCESSED_FILE
+    ),
+    'bori': EventProcessor(
+        Config.BORI_RAW_DIR, '*.parquet', transform_bori_events, ('labelDOI', 'datePublished'),
+        Config.BORI_PARTITIONS_DIR,
+        legacy_file=Config.BORI_PROCESSED_FILE
+    ),
+}
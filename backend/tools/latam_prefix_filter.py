@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Filtro de prefixes LATAM na coleta do Bluesky
+
+Os prefixes de prefixes_latam*.parquet (baixado do GCS) ficam num frozenset: alguns
+milhares de strings curtas, consulta exata em O(1), sem os falsos positivos de um
+Bloom filter. Os prefixes de um post são extraídos das URLs dos links com a mesma regra
+do processamento (event_processors.transform_bluesky_events: o DOI começa no primeiro
+'/10.' da URL), então um post sem prefix LATAM não geraria nenhum evento da plataforma.
+
+Modos (BLUESKY_LATAM_FILTER):
+- drop (padrão): descarta os posts sem DOI de prefix LATAM (inclusive os sem DOI nas URLs)
+- tag: grava todos os posts, com a coluna latam ('true'/'false')
+- off: sem filtro
+
+Uso como script (mostra o conjunto carregado e classifica URLs de exemplo):
+    python latam_prefix_filter.py https://doi.org/10.1590/abc https://doi.org/10.1038/xyz
+"""
+import logging
+import re
+from pathlib import Path
+from typing import FrozenSet, List, Optional
+import pyarrow.parquet as pq
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'tag', 'drop')
+
+# Primeiro '/10.' da URL até a próxima barra (ou fim, ?, # e separadores)
+PREFIX_PATTERN = re.compile(r'/(10\.[^/?#\s|]+)')
+
+
+def load_latam_prefixes(directory: Optional[Path] = None) -> FrozenSet[str]:
+    """Prefixes do arquivo prefixes_latam*.parquet mais recente do diretório de dados"""
+    directory = Path(directory or Config.LOCAL_DOWNLOAD_PATH)
+    prefix_files = sorted(directory.glob('prefixes_latam*.parquet'))
+    if not prefix_files:
+        raise FileNotFoundError(f"Arquivo de prefixes não encontrado em {directory}")
+
+    column = pq.read_table(prefix_files[-1], columns=['prefix']).column('prefix')
+    return frozenset(p.strip().lower() for p in column.to_pylist() if p)
+
+
+def url_prefixes(urls: str) -> List[str]:
+    """Prefixes dos DOIs das URLs 'url1|url2' (um por URL, como no processamento)"""
+    prefixes = []
+    for url in urls.split('|'):
+        match = PREFIX_PATTERN.search(url)
+        if match:
+            prefixes.append(match.group(1).lower())
+    return prefixes
+
+
+class LatamPrefixFilter:
+    """Marca ou descarta posts cujos DOIs não são de prefixes LATAM"""
+
+    def __init__(self, mode: Optional[str] = None, prefixes: Optional[FrozenSet[str]] = None):
+        mode = (mode or Config.BLUESKY_LATAM_FILTER).lower()
+        if mode not in MODES:
+            raise ValueError(f"BLUESKY_LATAM_FILTER inválido: {mode} (use {', '.join(MODES)})")
+
+        if mode != 'off' and prefixes is None:
+            try:
+                prefixes = load_latam_prefixes()
+            except FileNotFoundError as e:
+                # Sem o conjunto, descartar tudo seria pior que não filtrar
+                logger.warning(f"{e}: filtro LATAM desabilitado")
+                mode = 'off'
+
+        self.mode = mode
+        self.prefixes = prefixes or frozenset()
+        if mode != 'off':
+            logger.info(f"Filtro LATAM ({mode}): {len(self.prefixes):,} prefixes")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def is_latam(self, urls: str) -> bool:
+        return any(prefix in self.prefixes for prefix in url_prefixes(urls))
+
+    def apply(self, post: dict) -> Optional[dict]:
+        """O post (com 'latam' no modo tag) ou None se deve ser descartado"""
+        if not self.enabled:
+            return post
+        latam = self.is_latam(post['urls'])
+        if self.mode == 'drop':
+            return post if latam else None
+        post['latam'] = 'true' if latam else 'false'
+        return post
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    latam_filter = LatamPrefixFilter(mode='tag')
+    for url in sys.argv[1:]:
+        print(f"{url}: {url_prefixes(url) or '-'} -> {'LATAM' if latam_filter.is_latam(url) else 'fora'}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Gravação incremental de parquet: lotes viram row groups de um ParquetWriter aberto
+
+Substitui o ciclo ler o arquivo inteiro + concatenar + regravar a cada lote (I/O
+quadrático até a rotação): o custo de um lote não depende do tamanho do arquivo.
+
+Enquanto aberto, o arquivo fica como <nome>.parquet.partial (sem rodapé, ilegível), fora
+do padrão *.parquet lido pelo processamento. Na rotação (tamanho ou idade) e no
+encerramento o writer é fechado e o arquivo renomeado para <nome>.parquet, já completo.
+
+Como o .partial só é legível depois do rodapé, cada lote também é acrescentado a um
+journal <nome>.parquet.journal (stream Arrow IPC, flush + fsync por lote) e apagado na
+rotação: um processo morto (kill, OOM, queda de energia) perde no máximo o lote em
+gravação, como no ciclo antigo que regravava o arquivo a cada lote. Arquivos .partial de
+uma execução interrompida são tratados por recover_partial_files.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from parquet_layout import parquet_writer_options
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = '.partial'
+JOURNAL_SUFFIX = '.journal'
+
+
+def _partial_path(path: Path) -> Path:
+    return path.with_name(path.name + PARTIAL_SUFFIX)
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + JOURNAL_SUFFIX)
+
+
+def read_journal(journal: Path) -> Optional[pa.Table]:
+    """Lotes completos do journal (o último pode ter sido cortado pelo kill) ou None"""
+    batches = []
+    schema = None
+    try:
+        with pa.ipc.open_stream(pa.OSFile(str(journal))) as reader:
+            schema = reader.schema
+            while True:
+                try:
+                    batches.append(reader.read_next_batch())
+                except StopIteration:
+                    break
+    except (pa.ArrowInvalid, OSError) as e:
+        # Lote cortado no meio: os anteriores já foram lidos
+        logger.debug(f'Fim do journal {journal.name}: {e}')
+    if schema is None:
+        return None
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+class RollingParquetWriter:
+    """ParquetWriter aberto por arquivo de saída, com rotação por tamanho e por idade"""
+
+    def __init__(
+        self,
+        new_file: Callable[[], Path],
+        schema: pa.Schema,
+        rotate_bytes: int,
+        rotate_seconds: float = 0,
+        row_group_rows: int = 10000,
+        layout: str = 'raw',
+        on_rotate: Optional[Callable[[Path], None]] = None
+    ):
+        # new_file() devolve o caminho final (.parquet) do próximo arquivo
+        self.new_file = new_file
+        self.schema = schema
+        self.rotate_bytes = rotate_bytes
+        # 0 = só por tamanho; com idade, os posts chegam ao processamento mesmo com pouco volume
+        self.rotate_seconds = rotate_seconds
+        # Lotes pequenos (ex.: 50 posts) são agrupados antes de virar row group: um row
+        # group por lote multiplica dicionários e metadados (~3x o tamanho do arquivo).
+        # O arquivo aberto não é legível antes do rodapé, então agrupar não reduz a durabilidade.
+        self.row_group_rows = row_group_rows
+        # Compressão e opções de escrita do layout (parquet_layout), as mesmas do coletor Crossref
+        self.writer_options = parquet_writer_options(layout)
+        # Chamado com o arquivo finalizado (ex.: enfileirar upload)
+        self.on_rotate = on_rotate
+
+        self.current_file: Optional[Path] = None
+        self.rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._journal = None
+        self._journal_writer: Optional[pa.ipc.RecordBatchStreamWriter] = None
+        self._opened_at = 0.0
+        self._pending: List[pa.Table] = []
+        self._pending_rows = 0
+        self._pending_bytes = 0
+
+    @property
+    def partial_file(self) -> Optional[Path]:
+        return _partial_path(self.current_file) if self.current_file else None
+
+    def size(self) -> int:
+        """Bytes do arquivo aberto (gravados + estimativa das linhas ainda em memória)"""
+        try:
+            return self._pending_bytes + (os.path.getsize(self.partial_file) if self._writer else 0)
+        except OSError:
+            return self._pending_bytes
+
+    def _write_pending(self):
+        if self._pending:
+            self._writer.write_table(pa.concat_tables(self._pending))
+            self._pending = []
+            self._pending_rows = 0
+            self._pending_bytes = 0
+
+    def _open(self):
+        self.current_file = Path(self.new_file())
+        self._journal = open(_journal_path(self.current_file), 'wb')
+        self._journal_writer = pa.ipc.new_stream(self._journal, self.schema)
+        self._writer = pq.ParquetWriter(str(self.partial_file), self.schema, **self.writer_options)
+        self._opened_at = time.monotonic()
+        self.rows = 0
+
+    def _append_journal(self, table: pa.Table):
+        """Lote durável antes de seguir: o .partial só é legível depois do rodapé"""
+        self._journal_writer.write_table(table)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _close_journal(self):
+        self._journal_writer.close()
+        self._journal.close()
+        self._journal_writer = None
+        self._journal = None
+
+    def write(self, table: pa.Table) -> Optional[Path]:
+        """
+        Acrescenta a tabela ao arquivo aberto (row group a cada row_group_rows linhas)
+
+        Retorna o arquivo finalizado se o lote provocou rotação, senão None.
+        """
+        if self._writer is None:
+            self._open()
+        table = table.select(self.schema.names).cast(self.schema)
+        self._append_journal(table)
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        self._pending_bytes += table.nbytes
+        self.rows += table.num_rows
+        if self._pending_rows >= self.row_group_rows:
+            self._write_pending()
+
+        if self.size() >= self.rotate_bytes or (
+            self.rotate_seconds and time.monotonic() - self._opened_at >= self.rotate_seconds
+        ):
+            return self.rotate()
+        return None
+
+    def rotate(self) -> Optional[Path]:
+        """Fecha o arquivo aberto (grava o rodapé) e o publica como .parquet"""
+        if self._writer is None:
+            return None
+
+        self._write_pending()
+        self._writer.close()
+        self._writer = None
+        self._close_journal()
+        final_file = self.current_file
+        os.replace(_partial_path(final_file), final_file)
+        # Publicado com rodapé: o journal não é mais necessário
+        os.remove(_journal_path(final_file))
+        logger.info(f'Arquivo finalizado: {final_file.name} ({self.rows} linhas, '
+                    f'{os.path.getsize(final_file) / 1024 / 1024:.1f} MB)')
+
+        if self.on_rotate:
+            self.on_rotate(final_file)
+        return final_file
+
+    def close(self) -> Optional[Path]:
+        return self.rotate()
+
+
+def recover_partial_files(directory: Path, layout: str = 'raw') -> List[Path]:
+    """
+    Trata arquivos .partial deixados por uma execução interrompida
+
+    Um arquivo com rodapé válido é publicado como .parquet. Sem rodapé (writer não
+    fechado) os row groups não são legíveis: o arquivo é regravado a partir dos lotes do
+    journal, e o .partial é renomeado para .broken para inspeção. Um journal sem .partial
+    (morto entre a criação dos dois, ou depois do rename da rotação) segue a mesma regra.
+    Arquivos regravados usam as opções de escrita do layout. Retorna os arquivos recuperados.
+    """
+    directory = Path(directory)
+    finals = {p.with_name(p.name[:-len(PARTIAL_SUFFIX)])
+              for p in directory.glob(f'*.parquet{PARTIAL_SUFFIX}')}
+    finals |= {p.with_name(p.name[:-len(JOURNAL_SUFFIX)])
+               for p in directory.glob(f'*.parquet{JOURNAL_SUFFIX}')}
+
+    recovered = []
+    for final_file in sorted(finals):
+        partial, journal = _partial_path(final_file), _journal_path(final_file)
+        if final_file.exists():
+            # Rotação interrompida depois do rename: o arquivo já está completo
+            journal.unlink(missing_ok=True)
+            continue
+
+        if partial.exists():
+            try:
+                pq.ParquetFile(partial)
+                os.replace(partial, final_file)
+                journal.unlink(missing_ok=True)
+                recovered.append(final_file)
+                logger.info(f'Arquivo recuperado: {final_file.name}')
+                continue
+            except Exception as e:
+                broken = final_file.with_name(final_file.name + '.broken')
+                os.replace(partial, broken)
+                logger.warning(f'Arquivo incompleto de execução anterior: {broken.name} ({e})')
+
+        table = read_journal(journal) if journal.exists() else None
+        if table is not None and table.num_rows:
+            tmp = final_file.with_name(final_file.name + '.tmp')
+            pq.write_table(table, tmp, **parquet_writer_options(layout))
+            os.replace(tmp, final_file)
+            recovered.append(final_file)
+            logger.info(f'Arquivo recuperado do journal: {final_file.name} ({table.num_rows} linhas)')
+        journal.unlink(missing_ok=True)
+    return recovered
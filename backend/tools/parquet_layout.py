@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Política de layout de escrita dos parquets gerados pelo ETL
+
+Centraliza ordenação, tamanho de row group, compressão ZSTD e bloom filters para que
+as estatísticas min/max (e os bloom filters do DOI) permitam ao DuckDB pular row groups
+em filtros por source_, year e DOI. Cada tabela usa um layout nomeado em LAYOUTS.
+
+Uso como script (mede quantos row groups um filtro consegue pular):
+    python parquet_layout.py part-20250101T000000.parquet year 2020 2021
+    python parquet_layout.py part-20250101T000000.parquet id https://doi.org/10.1590/xyz
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+from config import Config
+
+# O DuckDB fecha row groups em múltiplos do tamanho de vetor: ROW_GROUP_SIZE 1000 grava
+# row groups de 2048 linhas
+DUCKDB_VECTOR_SIZE = 2048
+
+
+class WriteLayout:
+    """Layout físico de um parquet: ordenação, row groups, compressão e bloom filters"""
+
+    def __init__(
+        self,
+        sort_by: Sequence[str] = (),
+        row_group_size: Optional[int] = None,
+        compression_level: Optional[int] = None,
+        bloom_filter_columns: Sequence[str] = (),
+        varchar_columns: Sequence[str] = ()
+    ):
+        self.sort_by = tuple(sort_by)
+        self.varchar_columns = tuple(varchar_columns)
+        self.row_group_size = row_group_size or Config.PARQUET_ROW_GROUP_SIZE
+        self.compression_level = compression_level or Config.PARQUET_COMPRESSION_LEVEL
+        self.bloom_filter_columns = tuple(bloom_filter_columns) if Config.PARQUET_BLOOM_FILTERS else ()
+
+
+# Layouts por tabela. Eventos são ordenados por fonte, ano e DOI: os filtros da API
+# (source_ = ?, year BETWEEN ?, DOI IN (...)) passam a pular row groups inteiros.
+# ENUMs são gravados como VARCHAR (continuam com dicionário): o DuckDB grava o min/max
+# de uma coluna ENUM a partir do dicionário inteiro, o que impede o pruning.
+LAYOUTS: Dict[str, WriteLayout] = {
+    "events": WriteLayout(
+        sort_by=("source_", "year", "id"),
+        bloom_filter_columns=("id",),
+        varchar_columns=("source_", "prefix")
+    ),
+    "rollups": WriteLayout(sort_by=("period", "source_")),
+    "openalex": WriteLayout(),
+    # Eventos brutos gravados em streaming pelos coletores (um row group por página da API)
+    "raw": WriteLayout(),
+    # Índice de deduplicação: hashes ordenados (min/max por row group)
+    "dedup": WriteLayout(sort_by=("event_hash",)),
+}
+
+
+def copy_options(layout_name: str) -> str:
+    """Opções do COPY ... TO (FORMAT PARQUET, ...) do DuckDB para o layout"""
+    layout = LAYOUTS[layout_name]
+    options = [
+        "FORMAT PARQUET",
+        "COMPRESSION 'ZSTD'",
+        f"COMPRESSION_LEVEL {layout.compression_level}",
+        f"ROW_GROUP_SIZE {layout.row_group_size}",
+    ]
+    if layout.bloom_filter_columns:
+        # O DuckDB só grava bloom filter em coluna com dicionário. DICTIONARY_SIZE_LIMIT
+        # conta entradas (valores distintos no row group), não bytes: com 100 mil DOIs
+        # distintos num row group, o limite 99999 já grava PLAIN e sem bloom filter
+        # (DuckDB 1.2.2 e 1.5). Um row group tem no máximo tantos valores distintos quanto
+        # linhas, e as linhas reais são ROW_GROUP_SIZE arredondado para cima ao tamanho de
+        # vetor: esse é o menor limite que mantém dicionário e bloom filter no DOI de todo
+        # row group. Em bytes, o dicionário do DOI fica em torno de 50 por linha (~6 MB
+        # com o padrão de 122880 linhas).
+        rows = -(-layout.row_group_size // DUCKDB_VECTOR_SIZE) * DUCKDB_VECTOR_SIZE
+        options.append(f"DICTIONARY_SIZE_LIMIT {rows}")
+        options.append(f"BLOOM_FILTER_FALSE_POSITIVE_RATIO {Config.PARQUET_BLOOM_FILTER_FPP}")
+    return ", ".join(options)
+
+
+def parquet_writer_options(layout_name: str) -> Dict:
+    """Argumentos do pyarrow.parquet.ParquetWriter para o layout (escrita incremental)"""
+    layout = LAYOUTS[layout_name]
+    return {
+        "compression": "zstd",
+        "compression_level": layout.compression_level,
+        "use_dictionary": True,
+        "write_statistics": True,
+    }
+
+
+def copy_to_parquet(conn, query: str, output_file: Path, layout_name: str):
+    """Grava o resultado de uma query em parquet seguindo o layout (ordenação + opções)"""
+    layout = LAYOUTS[layout_name]
+    order_by = f" ORDER BY {', '.join(layout.sort_by)}" if layout.sort_by else ""
+    if layout.varchar_columns:
+        casts = ", ".join(f"CAST({c} AS VARCHAR) AS {c}" for c in layout.varchar_columns)
+        query = f"SELECT * REPLACE ({casts}) FROM ({query})"
+
+    conn.execute(f"""
+        COPY ({query}{order_by})
+        TO '{Path(output_file).absolute()}'
+        ({copy_options(layout_name)})
+    """)
+
+
+def row_group_pruning(path: Path, column: str, low, high=None) -> Tuple[int, int]:
+    """
+    Conta quantos row groups um filtro column BETWEEN low AND high (ou = low) pula
+
+    Usa apenas as estatísticas min/max do rodapé, lidas pelo próprio DuckDB
+    (parquet_metadata), como ele faz ao ler o arquivo: o pyarrow não reconhece o
+    min/max de VARCHAR gravado pelo DuckDB 1.2 e contaria zero row groups pulados.
+    Retorna (total de row groups, row groups que podem ser pulados).
+    """
+    import duckdb
+
+    high = low if high is None else high
+    path = Path(path).absolute()
+    conn = duckdb.connect()
+    types = {row[0]: row[1] for row in conn.execute(f"DESCRIBE SELECT * FROM read_parquet('{path}')").fetchall()}
+    if column not in types:
+        raise ValueError(f"Coluna {column} não encontrada em {path}")
+
+    column_type = types[column]
+    total, skipped = conn.execute(f"""
+        SELECT count(*),
+               count(*) FILTER (WHERE TRY_CAST(stats_max_value AS {column_type}) < CAST(? AS {column_type})
+                                   OR TRY_CAST(stats_min_value AS {column_type}) > CAST(? AS {column_type}))
+        FROM parquet_metadata('{path}')
+        WHERE path_in_schema = ?
+    """, [str(low), str(high), column]).fetchone()
+    conn.close()
+    return total, skipped
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Uso: python parquet_layout.py <arquivo.parquet> <coluna> <valor|min> [max]")
+        sys.exit(1)
+
+    file_path, column_name, low_value = Path(sys.argv[1]), sys.argv[2], sys.argv[3]
+    high_value = sys.argv[4] if len(sys.argv) > 4 else None
+    total, skippable = row_group_pruning(file_path, column_name, low_value, high_value)
+    print(f"{file_path.name}: {skippable}/{total} row groups pulados para {column_name} "
+          f"{'= ' + low_value if high_value is None else f'entre {low_value} e {high_value}'}")
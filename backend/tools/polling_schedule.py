@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Agendamento adaptativo da coleta Crossref por atividade do prefix
+
+Cada prefix recebe um intervalo de consulta a partir da sua taxa histórica de eventos
+(event_rate no CollectionStateStore): prefixes ativos são consultados a cada
+CROSSREF_POLL_MIN_DAYS, os dormentes a cada CROSSREF_POLL_MAX_DAYS. Entre os prefixes
+vencidos, os de maior número esperado de eventos novos vêm primeiro, até o orçamento de
+requisições da execução (CROSSREF_REQUEST_BUDGET).
+
+Sem orçamento (CROSSREF_REQUEST_BUDGET=0) não há requisições a economizar: o intervalo
+máximo fica em UNBUDGETED_MAX_DAYS (a cadência diária anterior ao agendamento), e nenhum
+prefix é consultado com menos frequência que antes.
+
+Uso como script (mostra o plano sem coletar):
+    python polling_schedule.py
+"""
+import logging
+import math
+from datetime import date
+from typing import Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Teto do intervalo sem orçamento de requisições: coleta diária, como antes do agendamento
+UNBUDGETED_MAX_DAYS = 1
+
+
+class PollingScheduler:
+    """Escolhe os prefixes da execução pelo intervalo de consulta e pelo orçamento de requisições"""
+
+    def __init__(self, budget: Optional[int] = None, today: Optional[date] = None):
+        self.budget = Config.CROSSREF_REQUEST_BUDGET if budget is None else budget
+        self.today = today or date.today()
+        self.max_days = Config.CROSSREF_POLL_MAX_DAYS
+        if not self.budget:
+            self.max_days = min(self.max_days, UNBUDGETED_MAX_DAYS)
+        self.min_days = min(Config.CROSSREF_POLL_MIN_DAYS, self.max_days)
+
+    def interval_days(self, event_rate: float) -> float:
+        """Dias até a próxima consulta: o tempo para acumular uma página de eventos"""
+        if event_rate <= 0:
+            return self.max_days
+        return min(max(Config.CROSSREF_ROWS_PER_REQUEST / event_rate, self.min_days), self.max_days)
+
+    def expected_requests(self, expected_events: float) -> int:
+        return 1 + int(expected_events // Config.CROSSREF_ROWS_PER_REQUEST)
+
+    def plan(self, prefixes: List[str], states: Dict[str, dict]) -> Dict[str, list]:
+        """
+        Classifica os prefixes: {'selected': [...], 'not_due': [...], 'over_budget': [...]}
+
+        Coletas interrompidas e prefixes sem taxa medida (novos ou importados dos logs CSV)
+        têm prioridade; os demais vencidos seguem o número esperado de eventos novos.
+        """
+        due = []
+        not_due = []
+        for prefix in prefixes:
+            state = states.get(prefix)
+            if not state or state['checkpoint'] or state['event_rate'] is None or not state['last_date']:
+                # Sem histórico: custo desconhecido, estimado como uma requisição
+                due.append((math.inf, 1, prefix))
+                continue
+
+            elapsed = (self.today - date.fromisoformat(state['last_date'])).days
+            if elapsed < self.interval_days(state['event_rate']):
+                not_due.append(prefix)
+                continue
+
+            expected = state['event_rate'] * max(elapsed, 1)
+            due.append((expected, self.expected_requests(expected), prefix))
+
+        due.sort(key=lambda item: item[0], reverse=True)
+
+        selected = []
+        over_budget = []
+        spent = 0
+        for _, cost, prefix in due:
+            if self.budget and spent + cost > self.budget and selected:
+                over_budget.append(prefix)
+                continue
+            selected.append(prefix)
+            spent += cost
+
+        logger.info(
+            f"Agendamento: {len(selected)} prefixes selecionados (~{spent} requisições), "
+            f"{len(not_due)} fora do intervalo, {len(over_budget)} acima do orçamento"
+        )
+        return {'selected': selected, 'not_due': not_due, 'over_budget': over_budget}
+
+
+if __name__ == "__main__":
+    from collect_crossref_events import SOURCE, load_prefixes
+    from collection_state import CollectionStateStore
+
+    logging.basicConfig(level=logging.INFO)
+    with CollectionStateStore() as store:
+        schedule = PollingScheduler().plan(load_prefixes(), store.all(SOURCE))
+    print(f"Selecionados: {len(schedule['selected']):,}")
+    print(f"Fora do intervalo: {len(schedule['not_due']):,}")
+    print(f"Acima do orçamento: {len(schedule['over_budget']):,}")
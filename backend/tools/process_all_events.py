@@ -1,321 +1,614 @@
 #!/usr/bin/env python3
 """
-Processa eventos de TODAS as fontes (Crossref + Bluesky + BORI) e gera arquivo consolidado
+Processa eventos de TODAS as fontes (Crossref + Bluesky + BORI) e publica o consolidado
+
+Cada fonte mantém seus eventos limpos como um conjunto de partições próprio
+(processed/<fonte>/part-*.parquet). O manifesto do consolidado lista as partições de
+todas as fontes e a impressão digital das entradas de cada uma: só as fontes cujos
+arquivos brutos mudaram são refeitas, e a publicação é a troca atômica do manifesto,
+sem copiar os eventos das demais fontes.
+
+Os processadores das fontes (event_processors.py) rodam em paralelo, um processo por
+fonte; só a publicação do manifesto é serial.
+
+Cada manifesto publicado tem uma geração (inteiro crescente) que a API confere para
+recarregar as views. Partições substituídas saem do manifesto mas ficam no disco, listadas
+em "retired", por Config.EVENTS_RETIRED_GRACE_SECONDS: só depois disso são removidas.
 """
+import time
 import duckdb
+import hashlib
+import json
 import logging
+import os
+import pyarrow.parquet as pq
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from config import Config
+from collection_state import CollectionStateStore
+from dedup_index import DedupIndex
+from event_processors import PROCESSORS
+from parquet_layout import copy_to_parquet
 
 logger = logging.getLogger(__name__)
 
+# Granularidades das séries temporais pré-agregadas servidas por /events_timeseries
+ROLLUP_GRANULARITIES = ('year', 'month', 'week', 'day')
+
+# Diretório das partições de eventos limpos de cada fonte
+PARTITION_DIRS = {source: processor.partitions_dir for source, processor in PROCESSORS.items()}
+
+
+def connect_etl():
+    """
+    Conexão DuckDB do ETL com memória limitada (Config.ETL_MEMORY_LIMIT por processo)
+
+    Ordenações, agregações e a deduplicação que passam do limite vão para
+    Config.ETL_TEMP_DIR em vez de estourar a memória. A ordem de inserção não é
+    preservada: as partições são ordenadas pelo layout e os rollups são agregados.
+    Fuso da sessão em UTC: datas sem offset nos arquivos brutos são lidas como UTC.
+    """
+    Config.ETL_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    conn = duckdb.connect(':memory:')
+    conn.execute(f"SET memory_limit = '{Config.ETL_MEMORY_LIMIT}'")
+    conn.execute(f"SET temp_directory = '{Config.ETL_TEMP_DIR.absolute()}'")
+    conn.execute("SET preserve_insertion_order = false")
+    conn.execute("SET TimeZone = 'UTC'")
+    if Config.ETL_THREADS:
+        conn.execute(f"SET threads = {Config.ETL_THREADS}")
+    return conn
+
+
+def create_typed_events_view(conn, view_name: str, source_view: str):
+    """
+    Define a view de eventos no schema consolidado tipado (Config.EVENTS_SCHEMA_VERSION)
+
+    Schema: id VARCHAR, timestamp_ TIMESTAMP, year SMALLINT, source_ ENUM, prefix ENUM.
+    A origem precisa das colunas id, timestamp_, source_ e prefix; timestamp_ pode ser
+    texto ISO 8601 (eventos brutos) ou TIMESTAMP (arquivos já processados). O texto é lido
+    como TIMESTAMPTZ e convertido para UTC: o offset ('-03:00', 'Z') é aplicado em vez de
+    descartado; sem offset vale o fuso da sessão (UTC, ver connect_etl).
+    Eventos sem data ou com data ilegível ficam fora da view; a contagem é registrada no
+    log (uma leitura extra da coluna timestamp_ da origem). Retorna o número descartado.
+    No parquet, source_ e prefix viram colunas texto com dicionário (ver parquet_layout.py);
+    os valores do ENUM ficam em ordem alfabética para que a ordenação coincida com o min/max.
+    Só os tipos ENUM são calculados aqui; os eventos passam em streaming a cada leitura.
+    """
+    conn.execute(f"""
+        DROP VIEW IF EXISTS {view_name};
+        DROP TYPE IF EXISTS {view_name}_source_enum;
+        DROP TYPE IF EXISTS {view_name}_prefix_enum;
+
+        CREATE TYPE {view_name}_source_enum AS ENUM (
+            SELECT DISTINCT CAST(source_ AS VARCHAR) AS v FROM {source_view} WHERE source_ IS NOT NULL ORDER BY v
+        );
+        CREATE TYPE {view_name}_prefix_enum AS ENUM (
+            SELECT DISTINCT CAST(prefix AS VARCHAR) AS v FROM {source_view} WHERE prefix IS NOT NULL ORDER BY v
+        );
+
+        CREATE VIEW {view_name} AS
+        SELECT
+            id,
+            ts AS timestamp_,
+            CAST(year(ts) AS SMALLINT) AS year,
+            CAST(source_ AS {view_name}_source_enum) AS source_,
+            CAST(prefix AS {view_name}_prefix_enum) AS prefix
+        FROM (
+            SELECT id, timezone('UTC', TRY_CAST(timestamp_ AS TIMESTAMPTZ)) AS ts, source_, prefix
+            FROM {source_view}
+        )
+        WHERE ts IS NOT NULL;
+    """)
+
+    missing, invalid, sample = conn.execute(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE timestamp_ IS NULL),
+            COUNT(*) FILTER (WHERE timestamp_ IS NOT NULL AND TRY_CAST(timestamp_ AS TIMESTAMPTZ) IS NULL),
+            ANY_VALUE(CAST(timestamp_ AS VARCHAR)) FILTER (
+                WHERE timestamp_ IS NOT NULL AND TRY_CAST(timestamp_ AS TIMESTAMPTZ) IS NULL
+            )
+        FROM {source_view}
+    """).fetchone()
+    if missing or invalid:
+        logger.warning(f"{view_name}: {missing + invalid:,} eventos descartados "
+                       f"({missing:,} sem data, {invalid:,} com data ilegível, ex.: {sample!r})")
+    return missing + invalid
+
+
+def write_event_rollups(conn, table_name: str, rollups_dir: Optional[Path] = None,
+                        name: str = "events") -> Dict[str, str]:
+    """
+    Gera séries temporais pré-agregadas (período, ano, fonte, eventos) por granularidade
+
+    Grava <rollups_dir>/<name>_<granularidade>.parquet (padrão: rollups/ do consolidado).
+    Retorna {granularidade: caminho relativo ao diretório do consolidado}.
+    """
+    rollups_dir = rollups_dir or Config.ALL_EVENTS_FILE.parent / "rollups"
+    rollups_dir.mkdir(parents=True, exist_ok=True)
+
+    rollups = {}
+    for granularity in ROLLUP_GRANULARITIES:
+        rollup_file = rollups_dir / f"{name}_{granularity}.parquet"
+        copy_to_parquet(conn, f"""
+            SELECT
+                CAST(date_trunc('{granularity}', timestamp_) AS DATE) AS period,
+                year,
+                CAST(source_ AS VARCHAR) AS source_,
+                COUNT(*) AS events
+            FROM {table_name}
+            GROUP BY 1, 2, 3
+        """, rollup_file, 'rollups')
+        rollups[granularity] = manifest_path(rollup_file)
+
+    return rollups
+
+
+def manifest_path(path: Path) -> str:
+    """Caminho relativo ao diretório do manifesto (partições ficam fora de consolidated/)"""
+    return os.path.relpath(Path(path).absolute(), Config.ALL_EVENTS_MANIFEST.parent.absolute())
+
+
+def write_events_manifest(files: List[Path], total_events: int, sources: List[str],
+                          rollups: Dict[str, Union[str, List[str]]], partitions: Optional[Dict[str, dict]] = None,
+                          retired: Optional[List[dict]] = None):
+    """
+    Grava o manifesto dos eventos consolidados (lido pela API)
+
+    A API registra a view de eventos sobre os arquivos listados em "files" (as partições
+    de todas as fontes) e confere schema_version. Cada rollup é um arquivo ou uma lista
+    de arquivos (um por partição) que a API lê em conjunto. "partitions" guarda, por
+    fonte, as partições, o número de eventos e a impressão digital das entradas.
+    "generation" cresce a cada publicação; "retired" lista as partições substituídas
+    ainda no disco (fonte, partição, retired_at em epoch).
+    """
+    manifest = {
+        "schema_version": Config.EVENTS_SCHEMA_VERSION,
+        "generation": read_events_manifest().get("generation", 0) + 1,
+        "files": [manifest_path(f) for f in files],
+        "total_events": total_events,
+        "sources": sources,
+        "rollups": rollups,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+    }
+    if partitions is not None:
+        manifest["partitions"] = partitions
+    if retired:
+        manifest["retired"] = retired
+
+    manifest_file = Config.ALL_EVENTS_MANIFEST
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = manifest_file.with_suffix('.tmp')
+    temp_file.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp_file, manifest_file)
+
+
+def read_events_manifest() -> dict:
+    """Manifesto publicado ({} se ainda não existe)"""
+    if not Config.ALL_EVENTS_MANIFEST.exists():
+        return {}
+    return json.loads(Config.ALL_EVENTS_MANIFEST.read_text())
+
+
+def input_fingerprint(files: List[Path]) -> str:
+    """Impressão digital das entradas de uma fonte (nome, tamanho e mtime de cada arquivo)"""
+    digest = hashlib.sha256()
+    for f in sorted(files):
+        st = f.stat()
+        digest.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def retired_partitions(source: str) -> set:
+    """Partições da fonte fora do manifesto, aguardando o fim do prazo para remoção"""
+    return {entry["partition"] for entry in read_events_manifest().get("retired", [])
+            if entry["source"] == source}
+
+
+def list_partitions(source: str) -> List[Path]:
+    """Partições ativas da fonte (as aposentadas continuam no disco até a coleta)"""
+    retired = retired_partitions(source)
+    return sorted(f for f in PARTITION_DIRS[source].glob('part-*.parquet') if f.name not in retired)
+
+
+def _partition_rollups_dir(source: str) -> Path:
+    return PARTITION_DIRS[source] / "rollups"
+
+
+def dedup_index(source: str) -> DedupIndex:
+    return DedupIndex(PARTITION_DIRS[source])
+
+
+def new_partition_path(source: str) -> Path:
+    """Nome único para a próxima partição da fonte"""
+    directory = PARTITION_DIRS[source]
+    directory.mkdir(parents=True, exist_ok=True)
+
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    partition_file = directory / f"part-{stamp}.parquet"
+    suffix = 1
+    while partition_file.exists():
+        partition_file = directory / f"part-{stamp}-{suffix}.parquet"
+        suffix += 1
+    return partition_file
+
+
+def write_partition(conn, view_name: str, source: str, partition_file: Optional[Path] = None,
+                    dedup_source: Optional[str] = None) -> Optional[Path]:
+    """
+    Grava a view como nova partição da fonte (COPY em streaming), com os seus rollups
+
+    Com dedup_source, os hashes do lote (coluna event_hash) entram no índice de
+    deduplicação da fonte. A partição é gravada como .tmp e renomeada por último, depois
+    de completa; só passa a ser lida pela API quando um manifesto a publicar.
+    Retorna None (sem gravar nada) se a view não tem eventos.
+    """
+    partition_file = partition_file or new_partition_path(source)
+    temp_file = partition_file.with_suffix('.parquet.tmp')
+
+    copy_to_parquet(conn, f"SELECT * FROM {view_name}", temp_file, 'events')
+    if not pq.ParquetFile(temp_file).metadata.num_rows:
+        temp_file.unlink()
+        return None
+    # Rollups a partir da partição gravada (tipada e compacta), sem refazer a transformação
+    write_event_rollups(conn, f"read_parquet('{temp_file.absolute()}')", _partition_rollups_dir(source),
+                        partition_file.stem)
+    if dedup_source:
+        dedup_index(source).write(conn, dedup_source, partition_file)
+    os.replace(temp_file, partition_file)
+    return partition_file
+
+
+def partition_events(partition_file: Path) -> int:
+    return pq.ParquetFile(partition_file).metadata.num_rows
+
+
+def delete_partition(source: str, partition: str):
+    """Remove o arquivo da partição, os seus rollups e o seu índice de deduplicação"""
+    (PARTITION_DIRS[source] / partition).unlink(missing_ok=True)
+    stem = Path(partition).stem
+    for granularity in ROLLUP_GRANULARITIES:
+        (_partition_rollups_dir(source) / f"{stem}_{granularity}.parquet").unlink(missing_ok=True)
+    dedup_index(source).delete(partition)
+
+
+def pending_raw_files(state, source: str, raw_files: List[Path]) -> List[Path]:
+    """
+    Arquivos brutos novos ou alterados desde a marca d'água (processed_files)
+
+    Um arquivo reescrito depois de processado (mesmo nome, outro tamanho/mtime) é lido
+    de novo: os eventos que já estavam publicados são descartados pelo índice de
+    deduplicação. Partições registradas mas ausentes do disco (execução interrompida ou
+    arquivo removido) têm seus arquivos reprocessados.
+    """
+    on_disk = {f.name for f in PARTITION_DIRS[source].glob('part-*.parquet')}
+    processed = state.processed_files(source)
+
+    lost = {entry['partition'] for entry in processed.values()
+            if entry['partition'] and entry['partition'] not in on_disk}
+    if lost:
+        logger.warning(f"{source}: partições ausentes, reprocessando seus arquivos: {sorted(lost)}")
+        state.forget_partitions(source, lost)
+        for partition in lost:
+            delete_partition(source, partition)
+        processed = {name: entry for name, entry in processed.items() if entry['partition'] not in lost}
+    for temp_file in PARTITION_DIRS[source].glob('**/part-*.parquet.tmp'):
+        temp_file.unlink()
+
+    pending = []
+    for raw_file in sorted(raw_files):
+        entry = processed.get(raw_file.name)
+        st = raw_file.stat()
+        if entry is None or (st.st_size, st.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            pending.append(raw_file)
+    return pending
+
+
+def publish_events_manifest(inputs: Optional[Dict[str, str]] = None,
+                            retired: Iterable[Tuple[str, str]] = ()) -> Dict[str, int]:
+    """
+    Publica as partições de todas as fontes num novo manifesto (troca atômica do arquivo)
+
+    inputs traz as impressões digitais das fontes refeitas nesta execução; as demais
+    mantêm as do manifesto anterior. retired lista (fonte, partição) substituídas, que
+    saem do manifesto e entram em "retired". As aposentadas há mais de
+    Config.EVENTS_RETIRED_GRACE_SECONDS são removidas do disco depois da troca.
+    Retorna {fonte: eventos}.
+    """
+    published = read_events_manifest()
+    previous = published.get("partitions", {})
+    inputs = inputs or {}
+    now = time.time()
+
+    # Aposentadas: as anteriores mais as desta execução (com o horário da troca)
+    retired_entries = {(e["source"], e["partition"]): e for e in published.get("retired", [])}
+    for source, partition in retired:
+        retired_entries.setdefault((source, partition), {"source": source, "partition": partition, "retired_at": now})
+    expired = [e for e in retired_entries.values() if now - e["retired_at"] >= Config.EVENTS_RETIRED_GRACE_SECONDS]
+    retired = set(retired_entries)
+
+    files = []
+    partitions = {}
+    rollups = {granularity: [] for granularity in ROLLUP_GRANULARITIES}
+    for source in PARTITION_DIRS:
+        source_files = [f for f in PARTITION_DIRS[source].glob('part-*.parquet') if (source, f.name) not in retired]
+        source_files.sort()
+        if not source_files:
+            continue
+        partitions[source] = {
+            "files": [manifest_path(f) for f in source_files],
+            "events": sum(pq.ParquetFile(f).metadata.num_rows for f in source_files),
+            "inputs": inputs.get(source, previous.get(source, {}).get("inputs")),
+        }
+        files.extend(source_files)
+        for granularity in ROLLUP_GRANULARITIES:
+            rollups[granularity].extend(
+                manifest_path(_partition_rollups_dir(source) / f"{f.stem}_{granularity}.parquet")
+                for f in source_files
+            )
+
+    total_events = sum(p["events"] for p in partitions.values())
+    waiting = [e for e in retired_entries.values() if e not in expired]
+    write_events_manifest(files, total_events, list(partitions), rollups, partitions, waiting)
+
+    # Fora do manifesto há mais que o prazo: nenhum leitor com a geração atual as usa
+    for entry in expired:
+        delete_partition(entry["source"], entry["partition"])
+    if expired:
+        logger.info(f"Partições aposentadas removidas: {len(expired)}")
+    return {source: p["events"] for source, p in partitions.items()}
+
+
+def _read_parquet_sql(files: List[Path]) -> str:
+    file_list = ','.join([f"'{f.absolute()}'" for f in files])
+    return f"read_parquet([{file_list}], union_by_name=true)"
+
+
+def create_raw_view(conn, files: List[Path], view_name: str, columns: Iterable[str]):
+    """
+    View sobre os arquivos brutos projetando só as colunas usadas pelo processador
+
+    Nada é carregado em memória: cada consulta lê as colunas projetadas em streaming.
+    Colunas ausentes de todos os arquivos (schemas antigos) viram NULL.
+    """
+    source_sql = _read_parquet_sql(files)
+    available = {row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source_sql}").fetchall()}
+    projection = ', '.join(f'"{c}"' if c in available else f'NULL AS "{c}"' for c in columns)
+    conn.execute(f"CREATE OR REPLACE VIEW {view_name} AS SELECT {projection} FROM {source_sql};")
+
+
+def create_processed_view(conn, files: List[Path], view_name: str):
+    """Eventos já processados (arquivos *_clean_events.parquet anteriores às partições)"""
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {view_name} AS
+        SELECT id, timestamp_, source_, prefix FROM {_read_parquet_sql(files)};
+    """)
+
+
+def _drop_views(conn, *views: str):
+    for view in views:
+        conn.execute(f"DROP VIEW IF EXISTS {view};")
+
+
+def append_partition(conn, state, source: str, files: List[Path]) -> Tuple[int, Optional[Path]]:
+    """
+    Processa arquivos brutos novos de uma fonte incremental numa nova partição
+
+    As colunas usadas são lidas em streaming, filtradas pelo índice de deduplicação
+    (repetidos no lote e já publicados) num lote intermediário em Config.ETL_TEMP_DIR,
+    transformadas pela view do processador e gravadas por COPY.
+    A marca d'água é registrada antes de a partição ser renomeada: uma interrupção deixa
+    uma partição registrada e ausente, cujos arquivos voltam a ser processados.
+    Retorna (eventos novos, partição ou None se o lote não tinha eventos novos).
+    """
+    processor = PROCESSORS[source]
+    raw_all, raw_view = f"{source}_raw_all", f"{source}_raw"
+    events_view, clean_view = f"{source}_events", f"{source}_clean_events"
+    fingerprints = {f.name: (f.stat().st_size, f.stat().st_mtime_ns) for f in files}
+    batch_file = Config.ETL_TEMP_DIR / f"{source}-batch-{os.getpid()}.parquet"
+
+    try:
+        create_raw_view(conn, files, raw_all, processor.columns)
+        discarded = dedup_index(source).filter_new(conn, raw_all, batch_file, processor.dedup_key)
+        if discarded:
+            logger.info(f"{source}: {discarded:,} duplicados descartados (repetidos no lote ou já publicados)")
+        conn.execute(f"CREATE OR REPLACE VIEW {raw_view} AS SELECT * FROM read_parquet('{batch_file.absolute()}');")
+
+        processor.transform(conn, raw_view, events_view)
+        # Schema tipado: TIMESTAMP, year SMALLINT, source_/prefix como ENUM
+        create_typed_events_view(conn, clean_view, events_view)
+        partition_file = new_partition_path(source)
+        state.record_processed(source, partition_file.name, fingerprints)
+        if write_partition(conn, clean_view, source, partition_file, dedup_source=raw_view) is None:
+            # Registrados sem partição: não são relidos nas próximas execuções
+            state.record_processed(source, '', fingerprints)
+            return 0, None
+        return partition_events(partition_file), partition_file
+    finally:
+        _drop_views(conn, clean_view, events_view, raw_view, raw_all)
+        batch_file.unlink(missing_ok=True)
+
+
+def import_legacy_partition(conn, state, source: str, legacy_file: Path) -> Optional[Path]:
+    """Arquivo *_clean_events.parquet anterior às partições vira a primeira partição da fonte"""
+    create_processed_view(conn, [legacy_file], f'{source}_events')
+    create_typed_events_view(conn, f'{source}_clean_events', f'{source}_events')
+    partition_file = new_partition_path(source)
+    st = legacy_file.stat()
+    state.record_processed(source, partition_file.name, {legacy_file.name: (st.st_size, st.st_mtime_ns)})
+    written = write_partition(conn, f'{source}_clean_events', source, partition_file)
+    _drop_views(conn, f'{source}_clean_events', f'{source}_events')
+    return written
+
+
+def update_incremental_source(conn, state, source: str) -> Optional[str]:
+    """
+    Acrescenta uma partição com os arquivos brutos novos da fonte
+
+    Retorna a impressão digital das entradas, ou None se nada mudou.
+    """
+    processor = PROCESSORS[source]
+    current = list_partitions(source)
+    files = processor.raw_files()
+    legacy_file = processor.legacy_file
+    if not files:
+        if not current and legacy_file and legacy_file.exists():
+            logger.info(f"{source}: carregando arquivo processado legado {legacy_file.name}")
+            import_legacy_partition(conn, state, source, legacy_file)
+            return None
+        logger.info(f"{source}: sem arquivos brutos, {len(current)} partições mantidas")
+        return None
+
+    pending = pending_raw_files(state, source, files)
+    if not pending:
+        logger.info(f"{source}: sem arquivos novos, {len(current)} partições mantidas")
+        return None
+
+    logger.info(f"{source}: processando {len(pending)} arquivos novos ou alterados")
+    count, partition_file = append_partition(conn, state, source, pending)
+    if partition_file:
+        logger.info(f"{source}: {count:,} eventos processados ({partition_file.name})")
+    else:
+        logger.info(f"{source}: nenhum evento novo")
+    return input_fingerprint(files)
+
+
+def rebuild_source(conn, source: str, previous_inputs: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """
+    Refaz as partições da fonte se as entradas mudaram desde o manifesto publicado
+
+    Sem arquivos brutos, as partições existentes são mantidas (ou o arquivo processado
+    legado vira a primeira partição). Retorna (nova impressão digital, partições
+    substituídas), ou (None, []) se nada foi refeito. As partições substituídas só devem
+    sair do disco depois que o novo manifesto for publicado.
+    """
+    processor = PROCESSORS[source]
+    current = list_partitions(source)
+    files = processor.raw_files()
+    legacy_file = processor.legacy_file
+    legacy = False
+    if not files:
+        if current or not (legacy_file and legacy_file.exists()):
+            logger.info(f"{source}: sem arquivos brutos, {len(current)} partições mantidas")
+            return None, []
+        files, legacy = [legacy_file], True
+    
+    fingerprint = input_fingerprint(files)
+    if current and fingerprint == previous_inputs:
+        logger.info(f"{source}: entradas inalteradas, {len(current)} partições mantidas")
+        return None, []
+    
+    logger.info(f"{source}: processando {len(files)} arquivos")
+    if legacy:
+        create_processed_view(conn, files, f"{source}_events")
+    else:
+        create_raw_view(conn, files, f"{source}_raw", processor.columns)
+        processor.transform(conn, f"{source}_raw", f"{source}_events")
+    
+    # Schema tipado: TIMESTAMP, year SMALLINT, source_/prefix como ENUM
+    create_typed_events_view(conn, f'{source}_clean_events', f'{source}_events')
+    partition_file = new_partition_path(source)
+    try:
+        written = write_partition(conn, f'{source}_clean_events', source, partition_file)
+        _drop_views(conn, f'{source}_clean_events', f'{source}_events', f'{source}_raw')
+        if written is None:
+            logger.warning(f"{source}: nenhum evento, partições mantidas")
+            return None, []
+        logger.info(f"{source}: {partition_events(partition_file):,} eventos processados ({partition_file.name})")
+    except Exception:
+        # Partição nova sem as antigas aposentadas: a publicação seguinte (as partições
+        # são listadas do diretório) a somaria às atuais, contando os eventos duas vezes
+        delete_partition(source, partition_file.name)
+        partition_file.with_suffix('.parquet.tmp').unlink(missing_ok=True)
+        raise
+    return fingerprint, [old.name for old in current]
+
+
+def run_processor(source: str, previous_inputs: Optional[str]) -> dict:
+    """
+    Atualiza as partições de uma fonte (roda num processo próprio)
+
+    Cada processo tem sua conexão DuckDB (com o próprio limite de memória) e seu acesso ao estado das coletas, e só grava
+    nas partições da sua fonte. Retorna {'inputs': impressão digital ou None,
+    'superseded': partições substituídas, 'error': mensagem ou None}.
+    """
+    result = {'source': source, 'inputs': None, 'superseded': [], 'error': None}
+    conn = connect_etl()
+    state = CollectionStateStore()
+    try:
+        if PROCESSORS[source].incremental:
+            result['inputs'] = update_incremental_source(conn, state, source)
+        else:
+            result['inputs'], result['superseded'] = rebuild_source(conn, source, previous_inputs)
+    except Exception as e:
+        logger.error(f"{source}: erro ao processar, mantendo as partições publicadas: {e}", exc_info=True)
+        result['error'] = str(e)
+    finally:
+        conn.close()
+        state.close()
+    return result
+
+
+def run_processors(previous: dict, workers: Optional[int] = None) -> List[dict]:
+    """Roda os processadores registrados em paralelo, um processo por fonte"""
+    workers = workers or Config.EVENT_PROCESSING_WORKERS or len(PROCESSORS)
+    if workers == 1:
+        return [run_processor(source, previous.get(source, {}).get("inputs")) for source in PROCESSORS]
+
+    sys.stdout.flush()
+    with ProcessPoolExecutor(max_workers=min(workers, len(PROCESSORS))) as executor:
+        futures = [
+            executor.submit(run_processor, source, previous.get(source, {}).get("inputs"))
+            for source in PROCESSORS
+        ]
+        return [future.result() for future in futures]
+
 
 def process_all_events():
-    """Processa eventos de todas as fontes e consolida"""
+    """Atualiza as partições das fontes alteradas e publica o manifesto consolidado"""
     
     print(f"\n{'='*70}")
     print(f"🔄 PROCESSAMENTO UNIFICADO DE EVENTOS")
     print(f"{'='*70}\n")
     
-    conn = duckdb.connect(':memory:')
+    conn = None
     
     try:
-        sources_loaded = []
+        previous = read_events_manifest().get("partitions", {})
         
-        # 1. Processar Crossref (se houver arquivos brutos)
-        crossref_files = list(Config.CROSSREF_RAW_DIR.glob('p*_*.parquet'))
-        if crossref_files:
-            print(f"📊 Processando Crossref: {len(crossref_files)} arquivos brutos")
-            
-            if len(crossref_files) == 1:
-                crossref_load = f"CREATE TABLE crossref_raw AS SELECT * FROM read_parquet('{crossref_files[0].absolute()}');"
-            else:
-                file_list = ','.join([f"'{f.absolute()}'" for f in crossref_files])
-                crossref_load = f"CREATE TABLE crossref_raw AS SELECT * FROM read_parquet([{file_list}], union_by_name=true);"
-            
-            conn.execute(f"""
-                {crossref_load}
-                
-                -- Transformar para formato limpo
-                -- Estrutura real: source_id contém nome da fonte, obj_id contém URL completa do DOI
-                CREATE TABLE crossref_events AS
-                SELECT 
-                    TRIM(obj_id, '"') AS id,
-                    TRIM(occurred_at, '"') AS timestamp_,
-                    CAST(SUBSTR(TRIM(occurred_at, '"'), 1, 4) AS INTEGER) AS year,
-                    source_id AS source_,
-                    SPLIT_PART(
-                        SUBSTR(TRIM(obj_id, '"'), 17),
-                        '/',
-                        1
-                    ) AS prefix
-                FROM crossref_raw
-                WHERE obj_id IS NOT NULL
-                  AND occurred_at IS NOT NULL
-                  AND source_id IS NOT NULL;
-            """)
-            
-            crossref_count = conn.execute("SELECT COUNT(*) FROM crossref_events").fetchone()[0]
-            print(f"   ✓ {crossref_count:,} eventos processados")
-            sources_loaded.append('crossref')
-        else:
-            # Tentar carregar arquivo processado se existir
-            if Config.CROSSREF_PROCESSED_FILE.exists():
-                print(f"📊 Carregando Crossref processado")
-                conn.execute(f"""
-                    CREATE TABLE crossref_events AS
-                    SELECT * FROM read_parquet('{Config.CROSSREF_PROCESSED_FILE.absolute()}');
-                """)
-                crossref_count = conn.execute("SELECT COUNT(*) FROM crossref_events").fetchone()[0]
-                print(f"   ✓ {crossref_count:,} eventos carregados")
-                sources_loaded.append('crossref')
+        # 1. Fontes em paralelo: cada processo grava só as partições da sua fonte
+        results = run_processors(previous)
+        inputs = {r['source']: r['inputs'] for r in results if r['inputs']}
+        superseded = [(r['source'], partition) for r in results for partition in r['superseded']]
+        # Fontes com erro continuam com as partições já publicadas, mas a execução falha
+        failed = {r['source']: r['error'] for r in results if r['error']}
         
-        # 2. Processar Bluesky (se houver arquivos brutos)
-        bluesky_files = list(Config.BLUESKY_RAW_DIR.glob('scientific_posts_*.parquet'))
-        if bluesky_files:
-            print(f"📊 Processando Bluesky: {len(bluesky_files)} arquivos brutos")
-            
-            try:
-                # Limpar qualquer tabela anterior que possa existir
-                try:
-                    conn.execute("DROP TABLE IF EXISTS bluesky_raw;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_doi;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_with_dois;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_urls;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events;")
-                except:
-                    pass  # Ignorar erros de limpeza
-                
-                # Carregar arquivo bruto (executar separadamente)
-                if len(bluesky_files) == 1:
-                    conn.execute(f"CREATE TABLE bluesky_raw AS SELECT * FROM read_parquet('{bluesky_files[0].absolute()}');")
-                else:
-                    file_list = ','.join([f"'{f.absolute()}'" for f in bluesky_files])
-                    conn.execute(f"CREATE TABLE bluesky_raw AS SELECT * FROM read_parquet([{file_list}], union_by_name=true);")
-                
-                # Verificar se há dados
-                raw_count = conn.execute("SELECT COUNT(*) FROM bluesky_raw").fetchone()[0]
-                
-                if raw_count == 0:
-                    print("   ⚠️ Arquivo Bluesky vazio, pulando processamento")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_raw;")
-                else:
-                    # Executar cada CREATE TABLE separadamente (sem usar IF NOT EXISTS para evitar conflitos)
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_doi;")
-                    conn.execute("""
-                        CREATE TABLE bluesky_events_from_doi AS
-                        SELECT 
-                            'https://doi.org/' || TRIM(doi) AS id,
-                            timestamp AS timestamp_,
-                            CAST(SUBSTR(timestamp, 1, 4) AS INTEGER) AS year,
-                            'bluesky' AS source_,
-                            SPLIT_PART(TRIM(doi), '/', 1) AS prefix
-                        FROM bluesky_raw
-                        WHERE doi IS NOT NULL 
-                          AND doi != ''
-                          AND timestamp IS NOT NULL
-                          AND doi LIKE '10.%';
-                    """)
-                    
-                    conn.execute("DROP TABLE IF EXISTS bluesky_with_dois;")
-                    conn.execute("""
-                        CREATE TABLE bluesky_with_dois AS
-                        SELECT 
-                            timestamp,
-                            UNNEST(SPLIT(urls, '|')) AS url
-                        FROM bluesky_raw
-                        WHERE urls IS NOT NULL 
-                          AND urls != ''
-                          AND timestamp IS NOT NULL;
-                    """)
-                    
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_urls;")
-                    conn.execute("""
-                        CREATE TABLE bluesky_events_from_urls AS
-                        SELECT 
-                            'https://doi.org/' || TRIM(doi_part) AS id,
-                            timestamp AS timestamp_,
-                            CAST(SUBSTR(timestamp, 1, 4) AS INTEGER) AS year,
-                            'bluesky' AS source_,
-                            SPLIT_PART(TRIM(doi_part), '/', 1) AS prefix
-                        FROM (
-                            SELECT 
-                                timestamp,
-                                CASE 
-                                    WHEN url LIKE '%doi.org/10.%' THEN
-                                        SUBSTR(url, POSITION('doi.org/' IN url) + 8)
-                                    WHEN url LIKE '%/10.%' THEN
-                                        SUBSTR(
-                                            url,
-                                            POSITION('/10.' IN url) + 1,
-                                            CASE 
-                                                WHEN POSITION('?' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
-                                                    POSITION('?' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
-                                                WHEN POSITION('#' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
-                                                    POSITION('#' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
-                                                WHEN POSITION(' ' IN SUBSTR(url, POSITION('/10.' IN url))) > 0 THEN
-                                                    POSITION(' ' IN SUBSTR(url, POSITION('/10.' IN url))) - 1
-                                                ELSE LENGTH(url) - POSITION('/10.' IN url)
-                                            END
-                                        )
-                                    ELSE NULL
-                                END AS doi_part
-                            FROM bluesky_with_dois
-                            WHERE url LIKE '%/10.%'
-                        )
-                        WHERE doi_part IS NOT NULL
-                          AND doi_part LIKE '10.%'
-                          AND LENGTH(doi_part) > 5;
-                    """)
-                    
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events;")
-                    conn.execute("""
-                        CREATE TABLE bluesky_events AS
-                        SELECT DISTINCT
-                            id,
-                            timestamp_,
-                            year,
-                            source_,
-                            prefix
-                        FROM (
-                            SELECT * FROM bluesky_events_from_doi
-                            UNION ALL
-                            SELECT * FROM bluesky_events_from_urls
-                        );
-                    """)
-                    
-                    bluesky_count = conn.execute("SELECT COUNT(*) FROM bluesky_events").fetchone()[0]
-                    print(f"   ✓ {bluesky_count:,} eventos processados")
-                    sources_loaded.append('bluesky')
-                    
-                    # Limpar tabelas temporárias
-                    conn.execute("DROP TABLE IF EXISTS bluesky_raw;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_doi;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_with_dois;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_urls;")
-                    
-            except Exception as e:
-                print(f"   ⚠️ Erro ao processar Bluesky: {e}")
-                print(f"   Pulando Bluesky e continuando apenas com Crossref")
-                logger.warning(f"Erro ao processar Bluesky: {e}", exc_info=True)
-                # Limpar qualquer tabela parcial
-                try:
-                    conn.execute("DROP TABLE IF EXISTS bluesky_raw;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_doi;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_with_dois;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events_from_urls;")
-                    conn.execute("DROP TABLE IF EXISTS bluesky_events;")
-                except:
-                    pass
-        else:
-            # Tentar carregar arquivo processado se existir
-            if Config.BLUESKY_PROCESSED_FILE.exists():
-                print(f"📊 Carregando Bluesky processado")
-                conn.execute(f"""
-                    CREATE TABLE bluesky_events AS
-                    SELECT * FROM read_parquet('{Config.BLUESKY_PROCESSED_FILE.absolute()}');
-                """)
-                bluesky_count = conn.execute("SELECT COUNT(*) FROM bluesky_events").fetchone()[0]
-                print(f"   ✓ {bluesky_count:,} eventos carregados")
-                sources_loaded.append('bluesky')
-        
-        # 3. Processar BORI (se houver arquivos brutos)
-        bori_files = list(Config.BORI_RAW_DIR.glob('*.parquet'))
-        if bori_files:
-            print(f"📊 Processando BORI: {len(bori_files)} arquivos brutos")
-            
-            try:
-                # Carregar arquivo bruto
-                if len(bori_files) == 1:
-                    conn.execute(f"CREATE TABLE bori_raw AS SELECT * FROM read_parquet('{bori_files[0].absolute()}');")
-                else:
-                    file_list = ','.join([f"'{f.absolute()}'" for f in bori_files])
-                    conn.execute(f"CREATE TABLE bori_raw AS SELECT * FROM read_parquet([{file_list}], union_by_name=true);")
-                
-                # Verificar se há dados
-                raw_count = conn.execute("SELECT COUNT(*) FROM bori_raw").fetchone()[0]
-                
-                if raw_count == 0:
-                    print("   ⚠️ Arquivo BORI vazio, pulando processamento")
-                    conn.execute("DROP TABLE IF EXISTS bori_raw;")
-                else:
-                    # Criar eventos a partir da coluna 'labelDOI'
-                    conn.execute("""
-                        CREATE TABLE bori_events AS
-                        SELECT 
-                            'https://doi.org/' || TRIM("labelDOI") AS id,
-                            "datePublished" AS timestamp_,
-                            CAST(SUBSTR("datePublished", 1, 4) AS INTEGER) AS year,
-                            'bori' AS source_,
-                            SPLIT_PART(TRIM("labelDOI"), '/', 1) AS prefix
-                        FROM bori_raw
-                        WHERE "labelDOI" IS NOT NULL 
-                          AND "labelDOI" != ''
-                          AND "datePublished" IS NOT NULL
-                          AND "labelDOI" LIKE '10.%'
-                          AND LENGTH(TRIM("labelDOI")) > 5;
-                    """)
-                    
-                    bori_count = conn.execute("SELECT COUNT(*) FROM bori_events").fetchone()[0]
-                    print(f"   ✓ {bori_count:,} eventos processados")
-                    sources_loaded.append('bori')
-                    
-                    # Limpar tabela temporária
-                    conn.execute("DROP TABLE IF EXISTS bori_raw;")
-                    
-            except Exception as e:
-                print(f"   ⚠️ Erro ao processar BORI: {e}")
-                logger.warning(f"Erro ao processar BORI: {e}", exc_info=True)
-                # Limpar qualquer tabela parcial
-                try:
-                    conn.execute("DROP TABLE IF EXISTS bori_raw;")
-                    conn.execute("DROP TABLE IF EXISTS bori_events;")
-                except:
-                    pass
-        else:
-            # Tentar carregar arquivo processado se existir
-            if Config.BORI_PROCESSED_FILE.exists():
-                print(f"📊 Carregando BORI processado")
-                conn.execute(f"""
-                    CREATE TABLE bori_events AS
-                    SELECT * FROM read_parquet('{Config.BORI_PROCESSED_FILE.absolute()}');
-                """)
-                bori_count = conn.execute("SELECT COUNT(*) FROM bori_events").fetchone()[0]
-                print(f"   ✓ {bori_count:,} eventos carregados")
-                sources_loaded.append('bori')
+        # 2. Publicar (único passo serial): troca do manifesto (as partições não são copiadas)
+        print(f"\n🔄 Publicando manifesto...")
+        # As substituídas só saem do disco depois do prazo (leitores com o manifesto anterior)
+        events_by_source = publish_events_manifest(inputs, superseded)
         
-        if not sources_loaded:
+        if not events_by_source:
             print("⚠️ Nenhuma fonte de eventos encontrada")
             return False
         
-        # 4. Consolidar tudo
-        print(f"\n🔄 Consolidando eventos de {len(sources_loaded)} fonte(s)...")
-        
-        # UNION de todas as fontes disponíveis
-        union_parts = []
-        if 'crossref' in sources_loaded:
-            union_parts.append("SELECT * FROM crossref_events")
-        if 'bluesky' in sources_loaded:
-            union_parts.append("SELECT * FROM bluesky_events")
-        if 'bori' in sources_loaded:
-            union_parts.append("SELECT * FROM bori_events")
+        total = sum(events_by_source.values())
+        manifest = read_events_manifest()
         
-        union_query = " UNION ALL ".join(union_parts)
-        
-        conn.execute(f"""
-            CREATE TABLE all_events AS
-            {union_query};
-        """)
-        
-        # Estatísticas por fonte
-        stats = conn.execute("""
+        # Estatísticas por fonte a partir dos rollups anuais (sem reler os eventos);
+        # a conexão só é aberta depois dos processos das fontes
+        conn = connect_etl()
+        manifest_dir = Config.ALL_EVENTS_MANIFEST.parent
+        year_rollups = [str((manifest_dir / f).resolve()) for f in manifest["rollups"]["year"]]
+        stats = conn.execute(f"""
             SELECT 
                 source_,
-                COUNT(*) as total,
-                COUNT(DISTINCT prefix) as prefixes,
+                SUM(events) as total,
                 MIN(year) as min_year,
                 MAX(year) as max_year
-            FROM all_events
+            FROM read_parquet({year_rollups})
             GROUP BY source_
             ORDER BY total DESC
         """).df()
@@ -323,42 +616,23 @@ def process_all_events():
         print("\n📊 Estatísticas por fonte:")
         print(stats.to_string(index=False))
         
-        # Salvar arquivo consolidado
-        output_file = Config.ALL_EVENTS_FILE
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        print("\n💾 Salvando arquivo consolidado...")
-        
-        conn.execute(f"""
-            COPY all_events 
-            TO '{output_file.absolute()}' 
-            (FORMAT PARQUET, COMPRESSION 'SNAPPY')
-        """)
-        
-        total = conn.execute("SELECT COUNT(*) FROM all_events").fetchone()[0]
-        file_size_mb = output_file.stat().st_size / (1024 * 1024)
-        
-        # Criar link simbólico para compatibilidade com backend
-        compat_file = Path(Config.LOCAL_DOWNLOAD_PATH) / "crossref_clean_events.parquet"
-        try:
-            if compat_file.exists() or compat_file.is_symlink():
-                compat_file.unlink()
-            compat_file.symlink_to(output_file.relative_to(Config.LOCAL_DOWNLOAD_PATH))
-            print(f"✓ Link de compatibilidade criado: {compat_file.name}")
-        except Exception as e:
-            logger.warning(f"Erro ao criar link simbólico: {e}")
-        
         print(f"\n{'='*70}")
-        print(f"✓ CONSOLIDAÇÃO CONCLUÍDA")
+        print(f"✗ CONSOLIDAÇÃO INCOMPLETA" if failed else f"✓ CONSOLIDAÇÃO CONCLUÍDA")
         print(f"{'='*70}")
-        print(f"Arquivo gerado: {output_file.name}")
-        print(f"Tamanho: {file_size_mb:.2f} MB")
+        print(f"Manifesto: {Config.ALL_EVENTS_MANIFEST}")
+        print(f"Partições: {len(manifest['files'])}")
+        print(f"Fontes refeitas: {', '.join(sorted(inputs)) or 'nenhuma'}")
         print(f"Total de eventos: {total:,}")
-        print(f"Fontes: {', '.join(sources_loaded)}")
+        print(f"Fontes: {', '.join(events_by_source)}")
+        for source, error in failed.items():
+            print(f"✗ {source}: {error} (partições anteriores mantidas)")
         print(f"{'='*70}\n")
         
-        logger.info(f"Arquivo consolidado gerado: {output_file}")
+        logger.info(f"Manifesto publicado: {Config.ALL_EVENTS_MANIFEST}")
         logger.info(f"Total de eventos: {total:,}")
+        if failed:
+            logger.error(f"Fontes com erro (partições desatualizadas): {', '.join(failed)}")
+            return False
         
         return True
         
@@ -367,10 +641,10 @@ def process_all_events():
         logger.error(f"Erro ao processar eventos: {e}", exc_info=True)
         return False
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    process_all_events()
-
+    sys.exit(0 if process_all_events() else 1)
@@ -3,10 +3,14 @@
 Processa arquivos Parquet do BORI e gera eventos no schema padrão
 Extrai DOIs do campo labelDOI e cria eventos no formato esperado
 """
-import duckdb
 import logging
+from datetime import datetime
 from pathlib import Path
 from config import Config
+from collection_state import CollectionStateStore
+from parquet_layout import copy_to_parquet
+from event_processors import PROCESSORS
+from process_all_events import connect_etl, create_raw_view, create_typed_events_view
 
 logger = logging.getLogger(__name__)
 
@@ -34,39 +38,15 @@ def process_bori_raw_files():
     
     logger.info(f"Processando {len(raw_files)} arquivos brutos do BORI...")
     
-    conn = duckdb.connect(':memory:')
+    conn = connect_etl()
     
     try:
-        # Carregar todos os arquivos do BORI
-        if len(raw_files) == 1:
-            file_pattern = f"'{raw_files[0].absolute()}'"
-        else:
-            file_list = ','.join([f"'{f.absolute()}'" for f in raw_files])
-            file_pattern = f"[{file_list}]"
-        
-        query = f"""
-            -- Carregar arquivos brutos do BORI
-            CREATE TABLE bori_raw AS
-            SELECT * FROM read_parquet({file_pattern}, union_by_name=true);
-            
-            -- Criar eventos a partir da coluna 'labelDOI'
-            -- labelDOI contém DOI no formato "10.xxxx/xxxx" (sem https://doi.org/)
-            CREATE TABLE bori_events AS
-            SELECT 
-                'https://doi.org/' || TRIM("labelDOI") AS id,
-                "datePublished" AS timestamp_,
-                CAST(SUBSTR("datePublished", 1, 4) AS INTEGER) AS year,
-                'bori' AS source_,
-                SPLIT_PART(TRIM("labelDOI"), '/', 1) AS prefix
-            FROM bori_raw
-            WHERE "labelDOI" IS NOT NULL 
-              AND "labelDOI" != ''
-              AND "datePublished" IS NOT NULL
-              AND "labelDOI" LIKE '10.%'
-              AND LENGTH(TRIM("labelDOI")) > 5;
-        """
-        
-        conn.execute(query)
+        # Arquivos brutos lidos em streaming (só as colunas usadas), com a transformação
+        # registrada do BORI: eventos a partir da coluna 'labelDOI'
+        processor = PROCESSORS['bori']
+        create_raw_view(conn, raw_files, 'bori_raw', processor.columns)
+        processor.transform(conn, 'bori_raw', 'bori_untyped_events')
+        create_typed_events_view(conn, 'bori_events', 'bori_untyped_events')
         
         # Verificar resultado
         stats = conn.execute("SELECT COUNT(*) as total FROM bori_events").fetchone()
@@ -99,11 +79,7 @@ def process_bori_raw_files():
         output_file = Config.BORI_PROCESSED_FILE
         output_file.parent.mkdir(parents=True, exist_ok=True)
         
-        conn.execute(f"""
-            COPY bori_events 
-            TO '{output_file.absolute()}' 
-            (FORMAT PARQUET, COMPRESSION 'SNAPPY')
-        """)
+        copy_to_parquet(conn, "SELECT * FROM bori_events", output_file, 'events')
         
         file_size_mb = output_file.stat().st_size / (1024 * 1024)
         
@@ -121,6 +97,10 @@ def process_bori_raw_files():
         logger.info(f"Arquivo processado gerado: {output_file}")
         logger.info(f"Total de eventos: {total_events:,}")
         
+        # BORI não tem coleta via API: registra a ingestão dos arquivos enviados
+        with CollectionStateStore() as state:
+            state.record_collection('bori', 'uploads', datetime.today().strftime('%Y-%m-%d'), total_events)
+        
         return True
         
     except Exception as e:
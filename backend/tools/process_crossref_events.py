@@ -1,150 +1,130 @@
 #!/usr/bin/env python3
 """
-Processa eventos brutos do Crossref e gera crossref_clean_events.parquet
+Processa eventos brutos do Crossref e gera as partições de eventos limpos
 Replica a lógica SQL do BigQuery usando DuckDB
+
+Processamento incremental: a marca d'água (processed_files no CollectionStateStore)
+registra cada arquivo bruto já transformado. Cada execução lê só os arquivos novos
+(ou alterados) e grava uma nova partição em CROSSREF_PARTITIONS_DIR; o manifesto do
+consolidado passa a listar as partições, sem reescrever o histórico nem as outras fontes.
+
+Eventos já publicados (arquivos brutos reescritos, coletas sobrepostas) são descartados
+pelo índice de deduplicação (dedup_index.py), pelo id do evento.
 """
-import duckdb
 import logging
-from pathlib import Path
 from config import Config
+from collection_state import CollectionStateStore
+from event_processors import PROCESSORS
+from process_all_events import (
+    append_partition, connect_etl, input_fingerprint, list_partitions, pending_raw_files, publish_events_manifest
+)
 
 logger = logging.getLogger(__name__)
 
+SOURCE = 'crossref'
+
+
+def publish_partitions() -> int:
+    """Publica as partições no manifesto do consolidado (mantendo as das outras fontes)"""
+    raw_files = PROCESSORS[SOURCE].raw_files()
+    events_by_source = publish_events_manifest({SOURCE: input_fingerprint(raw_files)})
+    return events_by_source.get(SOURCE, 0)
 
-def process_raw_events():
-    """Processa todos os arquivos brutos e gera tabela limpa"""
+
+def process_raw_events(publish: bool = True):
+    """
+    Processa os arquivos brutos novos e grava uma nova partição de eventos limpos
     
-    raw_files = list(Config.CROSSREF_RAW_DIR.glob('p*_*.parquet'))
+    Com publish=False o manifesto não é regravado (process_all_events publica uma vez
+    ao fim, junto com as outras fontes).
+    """
     
-    if not raw_files:
+    Config.CROSSREF_PARTITIONS_DIR.mkdir(parents=True, exist_ok=True)
+    Config.ALL_EVENTS_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    all_raw_files = PROCESSORS[SOURCE].raw_files()
+    raw_count = len(all_raw_files)
+    
+    if not raw_count:
         print(f"\n⚠️ Nenhum arquivo bruto encontrado em {Config.CROSSREF_RAW_DIR}")
         logger.error(f"Nenhum arquivo bruto encontrado em {Config.CROSSREF_RAW_DIR}")
         return False
     
+    state = CollectionStateStore()
+    raw_files = pending_raw_files(state, SOURCE, all_raw_files)
+    
     print(f"\n{'='*70}")
     print(f"🔄 PROCESSAMENTO DE EVENTOS CROSSREF")
     print(f"{'='*70}")
-    print(f"Arquivos brutos encontrados: {len(raw_files)}")
+    print(f"Arquivos brutos encontrados: {raw_count}")
+    print(f"Arquivos novos ou alterados: {len(raw_files)}")
     print(f"Diretório: {Config.CROSSREF_RAW_DIR}")
-    print(f"Arquivo processado: {Config.CROSSREF_PROCESSED_FILE}")
-    print(f"Arquivo consolidado: {Config.ALL_EVENTS_FILE}")
+    print(f"Partições: {Config.CROSSREF_PARTITIONS_DIR}")
+    print(f"Manifesto: {Config.ALL_EVENTS_MANIFEST}")
     print(f"{'='*70}\n")
     
+    if not raw_files:
+        state.close()
+        if publish:
+            total_events = publish_partitions()
+            print(f"✓ Nenhum arquivo novo; manifesto publicado com {total_events:,} eventos")
+        else:
+            print(f"✓ Nenhum arquivo novo")
+        return True
+    
     logger.info(f"Processando {len(raw_files)} arquivos brutos...")
     
-    conn = duckdb.connect(':memory:')
+    conn = connect_etl()
     
     try:
-        print("📊 Carregando arquivos brutos...")
-        # Ler todos os arquivos brutos
-        # pd.json_normalize cria colunas como "obj.@id", "source.@id", etc
-        if len(raw_files) == 1:
-            file_pattern = f"'{raw_files[0].absolute()}'"
-        else:
-            file_list = ','.join([f"'{f.absolute()}'" for f in raw_files])
-            file_pattern = f"[{file_list}]"
-        
-        # SQL que replica a lógica do BigQuery
-        # Adaptado para estrutura normalizada do pandas
-        # Usa union_by_name para lidar com schemas diferentes entre arquivos
-        if len(raw_files) == 1:
-            # Arquivo único - sem necessidade de union
-            load_query = f"CREATE TABLE raw_events AS SELECT * FROM read_parquet('{raw_files[0].absolute()}');"
-        else:
-            # Múltiplos arquivos - usar union_by_name para schemas diferentes
-            file_list = ','.join([f"'{f.absolute()}'" for f in raw_files])
-            load_query = f"CREATE TABLE raw_events AS SELECT * FROM read_parquet([{file_list}], union_by_name=true);"
-        
-        query = f"""
-            {load_query}
-            
-            -- Transformar para formato limpo
-            -- Estrutura real: source_id contém nome da fonte, obj_id contém URL completa do DOI
-            CREATE TABLE crossref_clean_events AS
-            SELECT 
-                TRIM(obj_id, '"') AS id,
-                TRIM(occurred_at, '"') AS timestamp_,
-                CAST(SUBSTR(TRIM(occurred_at, '"'), 1, 4) AS INTEGER) AS year,
-                source_id AS source_,
-                SPLIT_PART(
-                    SUBSTR(TRIM(obj_id, '"'), 17),
-                    '/',
-                    1
-                ) AS prefix
-            FROM raw_events
-            WHERE obj_id IS NOT NULL
-              AND occurred_at IS NOT NULL
-              AND source_id IS NOT NULL;
-        """
-        
-        conn.execute(query)
-        
-        # Verificar resultado
-        stats = conn.execute("SELECT COUNT(*) as total FROM crossref_clean_events").fetchone()
-        total_events = stats[0]
-        
-        print(f"✓ Eventos processados: {total_events:,}")
-        logger.info(f"Eventos processados: {total_events:,}")
-        
-        if total_events == 0:
-            print("⚠️ Nenhum evento válido encontrado após processamento")
-            logger.warning("Nenhum evento válido encontrado após processamento")
+        print("📊 Carregando arquivos brutos novos...")
+        # Eventos repetidos (no lote ou já publicados) são descartados pelo índice de
+        # deduplicação antes da transformação; a partição grava só os eventos inéditos
+        new_events, partition_file = append_partition(conn, state, SOURCE, raw_files)
+        
+        print(f"✓ Eventos processados: {new_events:,}")
+        logger.info(f"Eventos processados: {new_events:,}")
+        
+        if partition_file is None:
+            print("⚠️ Nenhum evento novo encontrado nos arquivos novos")
+            logger.warning("Nenhum evento novo encontrado nos arquivos novos")
+            if publish:
+                publish_partitions()
             return False
         
-        # Estatísticas adicionais
-        sources_stats = conn.execute("SELECT COUNT(DISTINCT source_) FROM crossref_clean_events").fetchone()[0]
-        years_stats = conn.execute("SELECT MIN(year), MAX(year) FROM crossref_clean_events").fetchone()
-        prefixes_stats = conn.execute("SELECT COUNT(DISTINCT prefix) FROM crossref_clean_events").fetchone()[0]
+        # Estatísticas adicionais (lidas da partição gravada)
+        partition_sql = f"read_parquet('{partition_file.absolute()}')"
+        sources_stats = conn.execute(f"SELECT COUNT(DISTINCT source_) FROM {partition_sql}").fetchone()[0]
+        years_stats = conn.execute(f"SELECT MIN(year), MAX(year) FROM {partition_sql}").fetchone()
+        prefixes_stats = conn.execute(f"SELECT COUNT(DISTINCT prefix) FROM {partition_sql}").fetchone()[0]
         
         print(f"✓ Sources únicos: {sources_stats}")
         print(f"✓ Prefixes únicos: {prefixes_stats}")
         if years_stats[0]:
             print(f"✓ Período: {years_stats[0]} - {years_stats[1]}")
         
-        print("\n💾 Salvando arquivos...")
-        
-        # 1. Salvar arquivo processado (por fonte)
-        processed_file = Config.CROSSREF_PROCESSED_FILE
-        processed_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        conn.execute(f"""
-            COPY crossref_clean_events 
-            TO '{processed_file.absolute()}' 
-            (FORMAT PARQUET, COMPRESSION 'SNAPPY')
-        """)
-        
-        file_size_mb = processed_file.stat().st_size / (1024 * 1024)
-        print(f"✓ Arquivo processado: {processed_file.name} ({file_size_mb:.2f} MB)")
-        
-        # 2. Salvar também no arquivo consolidado (para backend)
-        consolidated_file = Config.ALL_EVENTS_FILE
-        consolidated_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        conn.execute(f"""
-            COPY crossref_clean_events 
-            TO '{consolidated_file.absolute()}' 
-            (FORMAT PARQUET, COMPRESSION 'SNAPPY')
-        """)
+        file_size_mb = partition_file.stat().st_size / (1024 * 1024)
+        print(f"✓ Partição: {partition_file.name} ({file_size_mb:.2f} MB)")
         
-        consolidated_size_mb = consolidated_file.stat().st_size / (1024 * 1024)
-        print(f"✓ Arquivo consolidado: {consolidated_file.name} ({consolidated_size_mb:.2f} MB)")
+        if publish:
+            total_events = publish_partitions()
+            print(f"✓ Manifesto publicado: {len(list_partitions(SOURCE))} partições, {total_events:,} eventos")
         
         print(f"\n{'='*70}")
         print(f"✓ PROCESSAMENTO CONCLUÍDO")
         print(f"{'='*70}")
-        print(f"Total de eventos: {total_events:,}")
+        print(f"Eventos novos: {new_events:,}")
+        if publish:
+            print(f"Total de eventos publicados: {total_events:,}")
         print(f"Sources únicos: {sources_stats}")
         print(f"Prefixes únicos: {prefixes_stats}")
         if years_stats[0]:
             print(f"Período: {years_stats[0]} - {years_stats[1]}")
         print(f"{'='*70}\n")
         
-        logger.info(f"Tabela limpa gerada: {processed_file}")
-        logger.info(f"Arquivo consolidado: {consolidated_file}")
-        logger.info(f"Total de eventos: {total_events:,}")
+        logger.info(f"Partição gerada: {partition_file}")
         
         # Mostrar amostra
-        sample = conn.execute("SELECT * FROM crossref_clean_events LIMIT 5").df()
+        sample = conn.execute(f"SELECT * FROM {partition_sql} LIMIT 5").df()
         logger.info(f"\nAmostra dos dados:\n{sample.to_string()}")
         
         return True
@@ -155,6 +135,7 @@ def process_raw_events():
         return False
     finally:
         conn.close()
+        state.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Script Não-Interativo para Sincronização Incremental de Dados OpenAlex LATAM
-Baixa apenas arquivos novos do GCS (sincronização incremental)
+Baixa apenas arquivos novos ou alterados do GCS (sincronização incremental via manifesto)
 
 Autor: Portal de Altmetria - Ibict
 Versão: 1.1 Incremental Sync
@@ -15,7 +15,9 @@ from typing import Dict, List, Set, Tuple
 
 # Importações locais
 try:
-    from collect_data_gcp import GCSDownloader, LocalFileManager
+    from collect_data_gcp import (
+        GCSDownloader, LocalFileManager, DuckDBProcessor, SyncManifest, ParquetFooterValidator
+    )
     from config import Config, EXPECTED_TABLES
 except ImportError as e:
     print(f"Erro ao importar módulos: {e}")
@@ -71,42 +73,111 @@ def get_local_files_set(download_path: Path) -> Set[str]:
     return local_files
 
 
-def calculate_sync_stats(gcs_files: List[str], local_files: Set[str]) -> Tuple[Set[str], int, int]:
+def calculate_sync_stats(
+    gcs_files: List[Dict],
+    local_files: Set[str],
+    manifest: SyncManifest
+) -> Tuple[List[Dict], List[str], int, int]:
     """
     Calcula estatísticas de sincronização
 
+    Um objeto é baixado se não existe localmente ou se generation/md5/size diferem do
+    manifesto. Arquivos locais anteriores ao manifesto são adotados sem novo download.
+
     Args:
-        gcs_files: Lista de arquivos no GCS
+        gcs_files: Lista de objetos no GCS (metadados da listagem)
         local_files: Set de arquivos locais
+        manifest: Manifesto da última sincronização
 
     Returns:
-        Tupla (files_to_download, total_gcs, total_local)
+        Tupla (files_to_download, files_to_prune, total_gcs, total_local)
     """
-    gcs_files_set = {Path(f['name']).name for f in gcs_files}
-    files_to_download = gcs_files_set - local_files
+    gcs_names = {SyncManifest.local_name(f) for f in gcs_files}
+    new_files, changed_files, adopted = [], [], 0
+
+    for file_info in gcs_files:
+        name = SyncManifest.local_name(file_info)
+        if name not in local_files:
+            new_files.append(file_info)
+        elif name not in manifest.entries:
+            manifest.record(file_info)
+            adopted += 1
+        elif not manifest.is_current(file_info):
+            changed_files.append(file_info)
+
+    # Só remove arquivos que vieram do bucket (registrados no manifesto)
+    files_to_prune = sorted(name for name in manifest.entries if name not in gcs_names)
+    files_to_download = new_files + changed_files
 
     logger.info("=" * 70)
     logger.info("ESTATÍSTICAS DE SINCRONIZAÇÃO")
     logger.info("=" * 70)
-    logger.info(f"Total de arquivos no GCS: {len(gcs_files_set)}")
+    logger.info(f"Total de arquivos no GCS: {len(gcs_names)}")
     logger.info(f"Total de arquivos locais: {len(local_files)}")
-    logger.info(f"Arquivos novos a baixar: {len(files_to_download)}")
+    logger.info(f"Arquivos novos a baixar: {len(new_files)}")
+    logger.info(f"Arquivos alterados no GCS: {len(changed_files)}")
+    logger.info(f"Arquivos removidos do GCS: {len(files_to_prune)}")
+    if adopted:
+        logger.info(f"Arquivos locais registrados no manifesto: {adopted}")
 
-    if len(local_files) > len(gcs_files_set):
-        extra_local = len(local_files) - len(gcs_files_set)
-        logger.warning(f"⚠️  {extra_local} arquivos locais a mais que no GCS (não serão deletados)")
-
-    if len(files_to_download) == 0:
+    if not files_to_download and not files_to_prune:
         logger.info("✓ Todos os arquivos já estão atualizados. Nada a baixar.")
 
-    return files_to_download, len(gcs_files_set), len(local_files)
+    return files_to_download, files_to_prune, len(gcs_names), len(local_files)
+
+
+def prune_removed_files(download_path: Path, files_to_prune: List[str], manifest: SyncManifest) -> int:
+    """Remove arquivos locais cujos objetos não existem mais no GCS"""
+    removed = 0
+    for name in files_to_prune:
+        local_path = download_path / name
+        if local_path.exists():
+            local_path.unlink()
+            removed += 1
+            logger.info(f"Removido (não existe mais no GCS): {name}")
+        manifest.remove(name)
+    return removed
 
 
 # ========================================
 # Validação de Dados
 # ========================================
 
-def validate_downloaded_files(files_by_table: Dict[str, List[Path]]) -> bool:
+def apply_footer_validation(validator: ParquetFooterValidator, manifest: SyncManifest) -> List[Path]:
+    """
+    Coleta o resultado da validação de rodapé
+
+    Downloads são validados ainda como .part, antes do rename: os reprovados já estão na
+    quarentena, não substituíram o arquivo anterior e não foram registrados no manifesto.
+    Arquivos locais ainda não validados são conferidos em paralelo com os downloads; os
+    inválidos vão para a quarentena e saem do manifesto. Em ambos os casos o arquivo é
+    baixado novamente na próxima execução. Válidos têm linhas/row groups registrados.
+
+    Returns:
+        Lista de arquivos colocados em quarentena
+    """
+    valid, invalid = validator.wait()
+
+    for file_path, footer in valid.items():
+        manifest.record_validation(file_path.name, footer)
+
+    quarantined = []
+    for file_path, (target, reason) in validator.rejected_parts().items():
+        logger.error(f"Parquet inválido (não publicado): {file_path.name} ({reason})")
+        quarantined.append(target)
+
+    for file_path, reason in invalid.items():
+        logger.error(f"Parquet inválido: {file_path.name} ({reason})")
+        target = ParquetFooterValidator.quarantine(file_path)
+        manifest.remove(file_path.name)
+        quarantined.append(target)
+
+    total_rows = sum(footer['num_rows'] for footer in valid.values())
+    logger.info(f"✓ Rodapés validados: {len(valid)} arquivo(s), {total_rows:,} linhas | Quarentena: {len(quarantined)}")
+    return quarantined
+
+
+def validate_downloaded_files(files_by_table: Dict[str, List[Path]], quarantined: List[Path] = None) -> bool:
     """
     Valida arquivos baixados contra tabelas esperadas
 
@@ -115,6 +186,11 @@ def validate_downloaded_files(files_by_table: Dict[str, List[Path]]) -> bool:
     """
     logger.info("Validando arquivos baixados...")
 
+    # Parquets reprovados na leitura do rodapé (já movidos para a quarentena)
+    if quarantined:
+        logger.error(f"{len(quarantined)} arquivo(s) em quarentena: {', '.join(p.name for p in quarantined)}")
+        return False
+
     downloaded_tables = set(files_by_table.keys())
     expected_tables = set(EXPECTED_TABLES)
 
@@ -206,29 +282,42 @@ def main():
         logger.info("ETAPA 3: Cálculo de Sincronização")
         logger.info("=" * 70)
 
-        files_to_download, total_gcs, total_local = calculate_sync_stats(gcs_files, local_files)
-
-        # 5. Baixar apenas arquivos novos
-        if len(files_to_download) > 0:
+        manifest = SyncManifest()
+        files_to_download, files_to_prune, total_gcs, total_local = calculate_sync_stats(
+            gcs_files, local_files, manifest
+        )
+
+        # Downloads: rodapé do .part conferido antes do rename; arquivos locais ainda não
+        # validados são conferidos em paralelo com os downloads
+        validator = ParquetFooterValidator()
+        names_to_download = {SyncManifest.local_name(f) for f in files_to_download}
+        for name in manifest.unvalidated():
+            if name not in names_to_download and (download_path / name).exists():
+                validator.submit(download_path / name)
+
+        # 5. Baixar apenas arquivos novos ou alterados e remover os excluídos do GCS
+        if files_to_download or files_to_prune:
             logger.info("\n" + "=" * 70)
-            logger.info("ETAPA 4: Download de Arquivos Novos")
+            logger.info("ETAPA 4: Download de Arquivos Novos/Alterados")
             logger.info("=" * 70)
 
-            # Filtrar apenas arquivos que precisam ser baixados
-            files_to_download_list = [f for f in gcs_files if Path(f['name']).name in files_to_download]
+            downloaded, _ = downloader.download_many(files_to_download, force=True, validator=validator)
 
-            downloaded_count = 0
-            for file_info in files_to_download_list:
-                try:
-                    downloader.download_file(file_info['name'], show_progress=True)
-                    downloaded_count += 1
-                except Exception as e:
-                    logger.error(f"Erro ao baixar {file_info['name']}: {e}")
+            # Registrar no manifesto apenas o que foi baixado (falhas são refeitas na próxima execução)
+            downloaded_names = {p.name for p in downloaded}
+            for file_info in files_to_download:
+                if SyncManifest.local_name(file_info) in downloaded_names:
+                    manifest.record(file_info)
 
-            logger.info(f"✓ Download concluído: {downloaded_count} arquivo(s) baixado(s)")
+            removed = prune_removed_files(download_path, files_to_prune, manifest)
+
+            logger.info(f"✓ Download concluído: {len(downloaded)} arquivo(s) baixado(s), {removed} removido(s)")
         else:
             logger.info("\n⏭️  Nenhum arquivo novo para baixar. Sistema já está sincronizado.")
 
+        quarantined = apply_footer_validation(validator, manifest)
+        manifest.save()
+
         # 6. Validação dos dados locais
         logger.info("\n" + "=" * 70)
         logger.info("ETAPA 5: Validação de Dados")
@@ -237,13 +326,20 @@ def main():
         file_manager = LocalFileManager()
         files_by_table = file_manager.list_local_files()
 
-        if not validate_downloaded_files(files_by_table):
+        if not validate_downloaded_files(files_by_table, quarantined):
             logger.error("Validação de dados falhou")
             return 3
 
-        # 7. Resumo final
+        # 7. Chaves substitutas int64 para joins entre tabelas OpenAlex
+        logger.info("\n" + "=" * 70)
+        logger.info("ETAPA 6: Chaves Substitutas (int64)")
+        logger.info("=" * 70)
+
+        DuckDBProcessor().add_surrogate_keys_all(files_by_table)
+
+        # 8. Resumo final
         logger.info("\n" + "=" * 70)
-        logger.info("ETAPA 6: Resumo Final")
+        logger.info("ETAPA 7: Resumo Final")
         logger.info("=" * 70)
 
         logger.info("Arquivos locais prontos para uso:")
@@ -251,12 +347,12 @@ def main():
             size_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
             logger.info(f"  {table_name}: {len(files)} arquivo(s), {size_mb:.2f} MB")
 
-        # 8. Sucesso
+        # 9. Sucesso
         elapsed = time.time() - start_time
         logger.info("\n" + "=" * 70)
         logger.info(f"✓ SINCRONIZAÇÃO CONCLUÍDA COM SUCESSO")
         logger.info(f"✓ Tempo decorrido: {elapsed:.2f} segundos")
-        logger.info(f"✓ Total GCS: {total_gcs} | Local: {len(files_by_table)} tabelas | Novos: {len(files_to_download)}")
+        logger.info(f"✓ Total GCS: {total_gcs} | Local: {len(files_by_table)} tabelas | Novos/alterados: {len(files_to_download)}")
         logger.info("=" * 70)
 
         return 0